@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -30,6 +31,10 @@ ALLOWED_HOSTS = []
 
 # Application definition
 
+# "Login with Google" (allauth.socialaccount). Set SOCIAL_LOGIN_ENABLED=0 to leave the social
+# stack out: username/password accounts keep working and workers start faster.
+SOCIAL_LOGIN_ENABLED = os.environ.get('SOCIAL_LOGIN_ENABLED', '1') == '1'
+
 INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
@@ -40,15 +45,17 @@ INSTALLED_APPS = [
     "django.contrib.sites",
     "allauth",
     "allauth.account",
-    "allauth.socialaccount",
-    "allauth.socialaccount.providers.google",
+    *(["allauth.socialaccount", "allauth.socialaccount.providers.google"] if SOCIAL_LOGIN_ENABLED else []),
     "shop",  # app name for ecommerce
 ]
 
 SITE_ID = 1
 
+AUTH_USER_MODEL = 'shop.User'
+
 
 MIDDLEWARE = [
+    'shop.perf.PerfMiddleware',  # no-op unless PERF_METRICS_ENABLED
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,20 +63,33 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'allauth.account.middleware.AccountMiddleware',
 ]
 
 ROOT_URLCONF = 'Teamone.urls'
 
+# Templates are always compiled once per process by the cached loader; runserver's autoreloader
+# resets it when a template changes. TEMPLATE_DEBUG (defaults to DEBUG) records the source positions
+# the debug error page needs; leave it off in production.
+TEMPLATE_DEBUG = os.environ.get('TEMPLATE_DEBUG', str(DEBUG)).lower() in ('1', 'true')
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'debug': TEMPLATE_DEBUG,
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'shop.context_processors.integrations',
             ],
         },
     },
@@ -80,14 +100,78 @@ WSGI_APPLICATION = 'Teamone.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# DATABASE_PROFILE picks one of DATABASE_PROFILES: 'sqlite' (default) or 'postgres' (needs psycopg).
+# Connections are kept open for DATABASE_CONN_MAX_AGE seconds between requests and checked
+# before reuse; 0 (the default) opens one per request. Persistent connections are per thread, so
+# only raise it (e.g. to 60) under WSGI: under ASGI the async views (checkout, webhooks) run their
+# ORM calls on short-lived executor threads and each would leave an idle connection behind.
+
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'sqlite')
+DATABASE_CONN_MAX_AGE = int(os.environ.get('DATABASE_CONN_MAX_AGE', 0))
+
+DATABASE_PROFILES = {
+    'sqlite': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('DATABASE_NAME') or BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # take the write lock when a transaction starts, so a transaction that reads and then
+            # writes waits for the lock (busy_timeout) instead of failing with "database is locked"
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+    },
+    'postgres': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('DATABASE_NAME', 'teamone'),
+        'USER': os.environ.get('DATABASE_USER', ''),
+        'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+        'HOST': os.environ.get('DATABASE_HOST', ''),
+        'PORT': os.environ.get('DATABASE_PORT', ''),
+        'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        # QuerySet.iterator() (metric exports, rollup rebuilds, index builds) streams through
+        # server-side cursors; turn them off behind a transaction-pooling PgBouncer
+        'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DATABASE_DISABLE_SERVER_SIDE_CURSORS') == '1',
+    },
+}
+
+if DATABASE_PROFILE not in DATABASE_PROFILES:
+    from django.core.exceptions import ImproperlyConfigured
+
+    raise ImproperlyConfigured(f"DATABASE_PROFILE must be one of {', '.join(DATABASE_PROFILES)}")
 
 DATABASES = {
+    'default': DATABASE_PROFILES[DATABASE_PROFILE],
+}
+
+# Applied to every new SQLite connection (shop.db). WAL lets reads run alongside the writer;
+# synchronous=NORMAL only risks the last commits on power loss in WAL mode; busy_timeout (ms)
+# makes a blocked writer wait; mmap_size (bytes) serves reads from the OS page cache.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'mmap_size': 256 * 1024 * 1024,
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory is per process; point CACHE_BACKEND/CACHE_LOCATION at a shared cache
+# (e.g. Redis or Memcached) in production so invalidations reach every worker.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'bluewave'),
     }
 }
 
+# Seconds a rendered catalogue page (product list/detail) stays cached
+CATALOGUE_CACHE_TIMEOUT = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -125,7 +209,91 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Uploaded files (product images and their thumbnails)
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', BASE_DIR / 'media')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Subscription API keys (JWT)
+
+JWT_API_SECRET = os.environ.get('JWT_API_SECRET', SECRET_KEY)
+JWT_API_ALGORITHM = 'HS256'
+# Earlier JWT_API_SECRET values (comma-separated in the environment): keys they signed still verify.
+# After changing the secret, re-issue keys with `manage.py rotate_api_keys`; the keys it replaces
+# keep working for JWT_API_ROTATION_GRACE_HOURS
+JWT_API_SECRET_FALLBACKS = [s for s in os.environ.get('JWT_API_SECRET_FALLBACKS', '').split(',') if s]
+JWT_API_ROTATION_GRACE_HOURS = 24
+
+# Verified-token cache used by shop.api_auth (entries per process, seconds); revocation is
+# signalled through the default cache, so it needs a shared backend when running several workers
+API_TOKEN_CACHE_SIZE = 1024
+API_TOKEN_CACHE_TTL = 60
+
+# Stripe credentials and the Stripe Price id for each subscription tier (STRIPE_PRICE_BASIC, ...).
+# Left empty, checkout answers 400 and webhooks are accepted unsigned.
+STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY', '')
+STRIPE_PUBLISHABLE_KEY = os.environ.get('STRIPE_PUBLISHABLE_KEY', '')
+STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET', '')
+STRIPE_PRICE_MAP = {
+    tier: os.environ.get(f'STRIPE_PRICE_{tier.upper()}', '') for tier in ('basic', 'pro', 'research')
+}
+
+# Stripe webhook processing (see shop.webhooks): "thread", "db" or "sync"
+STRIPE_WEBHOOK_QUEUE = os.environ.get('STRIPE_WEBHOOK_QUEUE', 'thread')
+STRIPE_WEBHOOK_WORKERS = 2
+
+# Seconds stock stays reserved for a cart checkout (Stripe requires at least 30 minutes)
+STOCK_RESERVATION_TTL = 60 * 60
+
+# Request instrumentation (shop.perf); when enabled, metrics are served at /internal/metrics/ to
+# staff users and to scrapers sending "Authorization: Bearer $PERF_METRICS_TOKEN"
+PERF_METRICS_ENABLED = os.environ.get('PERF_METRICS_ENABLED', '') == '1'
+PERF_METRICS_TOKEN = os.environ.get('PERF_METRICS_TOKEN', '')
+PERF_DUPLICATE_QUERY_THRESHOLD = 5
+
+# User dashboard (shop.dashboard): orders shown and per-user summary cache lifetime (seconds)
+DASHBOARD_RECENT_ORDERS = 5
+DASHBOARD_CACHE_TIMEOUT = 300
+
+# Stripe API calls from async views (shop.payments): per-worker connection pool and limits
+STRIPE_API_BASE = os.environ.get('STRIPE_API_BASE') or None
+STRIPE_TIMEOUT = 10
+STRIPE_MAX_CONNECTIONS = 20
+STRIPE_MAX_CONCURRENCY = 50
+STRIPE_QUEUE_TIMEOUT = 5
+
+# Subscription tiers: monthly price and API rate limit (requests per window, in seconds)
+SUBSCRIPTION_TIERS = {
+    'basic': {'price': 10.0, 'rate_limit': {'requests': 60, 'window': 60}},
+    'pro': {'price': 50.0, 'rate_limit': {'requests': 600, 'window': 60}},
+    'research': {'price': 200.0, 'rate_limit': {'requests': 3000, 'window': 60}},
+}
+
+# Rate limit store (shop.ratelimit): "memory" (per process) or "cache" (shared, via API_RATE_LIMIT_CACHE)
+API_RATE_LIMIT_BACKEND = os.environ.get('API_RATE_LIMIT_BACKEND', 'memory')
+API_RATE_LIMIT_CACHE = 'default'
+
+# Storefront search page (shop.search): at most this many ranked results
+SEARCH_RESULTS_LIMIT = 48
+
+# Product image derivatives (shop.images): bounding box per size in pixels, encoder quality.
+# Files under MEDIA_URL + 'thumbs/' are content-hashed; serve them with a long max-age and immutable
+THUMBNAIL_SIZES = {'small': 320, 'medium': 640, 'large': 1280}
+THUMBNAIL_QUALITY = 82
+
+# Anomaly detection over environmental readings (shop.anomalies, manage.py detect_anomalies):
+# rolling window length and z-score threshold, EWMA smoothing and threshold, readings per query
+ANOMALY_WINDOW = 48
+ANOMALY_MIN_PERIODS = 12
+ANOMALY_ZSCORE_THRESHOLD = 4.0
+ANOMALY_EWMA_ALPHA = 0.1
+ANOMALY_EWMA_THRESHOLD = 4.0
+ANOMALY_CHUNK_SIZE = 20000
+
+# Admin changelists (shop.admin): rows counted before falling back to an estimate
+ADMIN_COUNT_LIMIT = 10000
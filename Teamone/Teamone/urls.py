@@ -20,6 +20,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from shop import images, views as shop_views
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("accounts/", include("allauth.urls")),
@@ -27,4 +29,8 @@ urlpatterns = [
 ]
 
 if settings.DEBUG:
+    # thumbnails first: they get long-lived cache headers, other uploads don't
+    urlpatterns += [
+        path(f"{settings.MEDIA_URL.lstrip('/')}{images.VARIANTS_DIR}/<path:path>", shop_views.media_thumbnail),
+    ]
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -0,0 +1,6 @@
+"""
+Standalone micro-benchmarks for the shop app.
+
+Run from the project directory, e.g. ``python -m benchmarks.api_auth``.
+Each benchmark works against a throwaway test database.
+"""
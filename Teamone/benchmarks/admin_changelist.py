@@ -0,0 +1,91 @@
+"""
+Admin changelist latency for EnvironmentalMetric as the table grows: the first page and a page
+half way down, through shop.admin's keyset changelist and through a stock ModelAdmin configured
+as it was before (COUNT(*)s, OFFSET pages, a date list filter).
+
+    python -m benchmarks.admin_changelist --sizes 20000,200000,1000000
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.harness import measure, report, setup_django, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Admin changelist latency by table size.")
+    parser.add_argument("--sizes", default="20000,200000,1000000", help="Comma-separated reading counts.")
+    parser.add_argument("--number", type=int, default=20, help="Requests per timing round.")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib import admin
+    from django.contrib.messages.storage.fallback import FallbackStorage
+    from django.db import connection
+    from django.test import RequestFactory
+
+    from shop.models import EnvironmentalMetric, Product, User
+
+    start = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    rng = random.Random(0)
+    with test_database():
+        superuser = User.objects.create_superuser(username="bench-admin", password="pw")
+        products = [Product.objects.create(name=f"Unit {i}", slug=f"bench-admin-{i}", price=1) for i in range(20)]
+        fast = admin.site._registry[EnvironmentalMetric]
+        # configured as before shop.admin's high-volume changes
+        stock = type("StockMetricAdmin", (admin.ModelAdmin,), {
+            "list_display": ("product", "recorded_at", "salinity", "ph", "pollutant_index"),
+            "list_filter": ("recorded_at",),
+        })(EnvironmentalMetric, admin.site)
+
+        def page(name, model_admin, params=None):
+            """Whole changelist time, and the part of it spent in the database."""
+            spent = []
+
+            def timed(execute, sql, params, many, context):
+                started = time.perf_counter()
+                try:
+                    return execute(sql, params, many, context)
+                finally:
+                    spent[-1] += time.perf_counter() - started
+
+            def get():
+                request = RequestFactory().get("/", params or {})
+                request.user = superuser
+                request.session = {}
+                request._messages = FallbackStorage(request)
+                spent.append(0.0)
+                with connection.execute_wrapper(timed):
+                    response = model_admin.changelist_view(request)
+                    response.render()
+                assert response.status_code == 200, response.status_code
+
+            rounds = measure(get, args.number, 3)
+            report(name, rounds, "ms")
+            print(f"{'  of which queries':<40} median {statistics.median(spent) * 1e3:10.2f} ms")
+
+        created = 0
+        for size in sorted(int(s) for s in args.sizes.split(",")):
+            EnvironmentalMetric.objects.bulk_create(
+                (
+                    EnvironmentalMetric(
+                        product=rng.choice(products), recorded_at=start + timedelta(minutes=i), salinity=35.0,
+                    )
+                    for i in range(created, size)
+                ),
+                batch_size=5000,
+            )
+            created = size
+            print(f"--- {size} readings")
+
+            deep = EnvironmentalMetric.objects.order_by("-recorded_at", "-pk")[size // 2]
+            page("keyset admin, first page", fast)
+            page("keyset admin, half way", fast, {"cursor": f"{deep.recorded_at.isoformat()}_{deep.pk}"})
+            page("stock admin, first page", stock)
+            page("stock admin, half way", stock, {"p": size // 200})
+
+
+if __name__ == "__main__":
+    main()
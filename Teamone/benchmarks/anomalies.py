@@ -0,0 +1,101 @@
+"""
+Anomaly detection throughput: the chunked NumPy scoring in shop.anomalies against a per-row
+Python loop over the same readings, end to end (reading rows from the database) and for the
+scoring alone.
+
+    python -m benchmarks.anomalies --readings 200000
+"""
+import argparse
+import math
+import random
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.harness import setup_django, test_database
+
+
+def naive(readings, options):
+    """Score one field reading by reading, keeping the window in a deque; returns the flag count."""
+    window = deque(maxlen=options["window"])
+    ewma, ewvar, seen, flagged = None, 0.0, 0, 0
+    alpha = options["alpha"]
+    for x in readings:
+        if x is None:
+            continue
+        ready = seen >= options["min_periods"]
+        if window:
+            mean = sum(window) / len(window)
+            std = math.sqrt(sum((v - mean) ** 2 for v in window) / len(window))
+        ewma = x if ewma is None else ewma
+        deviation = x - ewma
+        if ready and std > 0 and ewvar > 0:
+            if abs(x - mean) / std > options["zscore_threshold"] and abs(deviation) / math.sqrt(ewvar) > options["ewma_threshold"]:
+                flagged += 1
+        ewma += alpha * deviation
+        ewvar = (1 - alpha) * (ewvar + alpha * deviation ** 2)
+        window.append(x)
+        seen += 1
+    return flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Anomaly detection rows per second.")
+    parser.add_argument("--readings", type=int, default=200_000)
+    args = parser.parse_args()
+
+    setup_django()
+    import numpy as np
+
+    from shop.anomalies import detect, detection_options, score
+    from shop.metrics import METRIC_FIELDS
+    from shop.models import EnvironmentalMetric, Product
+
+    rng = random.Random(0)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    options = detection_options()
+
+    def reading(product, i):
+        spike = 6 if rng.random() < 0.001 else 0
+        return EnvironmentalMetric(
+            product=product,
+            recorded_at=start + timedelta(minutes=10 * i),
+            salinity=35 + math.sin(i / 50) + rng.gauss(0, 0.3) + spike,
+            ph=7.8 + rng.gauss(0, 0.05),
+            pollutant_index=None if i % 7 == 0 else 20 + rng.gauss(0, 2) + spike * 3,
+        )
+
+    def rate(name, rows, elapsed):
+        print(f"{name:<48} {rows / elapsed:12.0f} rows/s   ({elapsed:.2f}s)")
+
+    with test_database():
+        product = Product.objects.create(name="Bench unit", slug="bench-anomalies", price=1)
+        EnvironmentalMetric.objects.bulk_create((reading(product, i) for i in range(args.readings)), batch_size=5000)
+        print(f"{args.readings} readings, window {options['window']}, alpha {options['alpha']}")
+
+        started = time.perf_counter()
+        scored, found = detect(product.id, full=True)
+        rate(f"detect(), chunked NumPy ({found} found)", scored, time.perf_counter() - started)
+
+        started = time.perf_counter()
+        columns = {field: [] for field in METRIC_FIELDS}
+        for metric in EnvironmentalMetric.objects.filter(product=product).order_by("recorded_at", "id").iterator(chunk_size=2000):
+            for field in METRIC_FIELDS:
+                columns[field].append(getattr(metric, field))
+        found = sum(naive(values, options) for values in columns.values())
+        rate(f"per-row loop over model instances ({found} found)", args.readings, time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for values in columns.values():
+            array = np.array(values, dtype=float)
+            score(array[~np.isnan(array)], {}, options)
+        rate("scoring only, NumPy", args.readings, time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for values in columns.values():
+            naive(values, options)
+        rate("scoring only, per-row loop", args.readings, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Per-request cost of API key authentication with a cold and a warm token cache."""
+from datetime import timedelta
+
+from benchmarks.harness import measure, report, setup_django, test_database
+
+
+def main():
+    setup_django()
+    from django.test import RequestFactory
+    from django.utils import timezone
+
+    from shop.api_auth import token_cache, verify_api_token, get_request_token
+    from shop.jwt_utils import generate_subscription_jwt
+    from shop.models import Subscription, User
+
+    with test_database():
+        user = User.objects.create_user(username="bench", email="bench@example.com", password="pw")
+        sub = Subscription.objects.create(
+            user=user, tier="research", active=True, end_date=timezone.now() + timedelta(days=30),
+        )
+        sub.api_key = generate_subscription_jwt(sub)
+        sub.save()
+        request = RequestFactory().get("/api/metrics/x/timeseries/", HTTP_AUTHORIZATION=f"Bearer {sub.api_key}")
+
+        def authenticate():
+            verify_api_token(get_request_token(request))
+
+        report("auth, cold cache (verify + lookup)", measure(authenticate, number=500, setup=token_cache.clear))
+        token_cache.clear()
+        authenticate()
+        report("auth, warm cache", measure(authenticate, number=20000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+The in-process catalogue snapshot: memory per product, load time, and lookup latency against
+the queries it replaces (a product by slug, a cart's lines with their products).
+
+    python -m benchmarks.catalogue_snapshot --products 20000
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from decimal import Decimal
+
+from benchmarks.harness import measure, report, setup_django, test_database
+
+
+def _allocated(build):
+    """Bytes still allocated by what ``build()`` returns."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Catalogue snapshot memory and lookup latency.")
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--cart-lines", type=int, default=8)
+    parser.add_argument("--number", type=int, default=2000, help="Lookups per timing round.")
+    args = parser.parse_args()
+
+    setup_django()
+    from shop.carts import add_item, cart_lines, get_open_cart
+    from shop.catalogue import catalogue_version
+    from shop.models import Product, User
+    from shop.snapshot import CatalogueSnapshot, get_snapshot
+
+    rng = random.Random(0)
+    with test_database():
+        Product.objects.bulk_create(
+            [
+                Product(
+                    name=f"Bench unit {i}", slug=f"bench-snapshot-{i}", price=Decimal(rng.randint(100, 99999)) / 100,
+                    description="Compact solar desalination unit. " * rng.randint(1, 6),
+                )
+                for i in range(args.products)
+            ],
+            batch_size=5000,
+        )
+        started = time.perf_counter()
+        snapshot, snapshot_bytes = _allocated(lambda: CatalogueSnapshot.load(catalogue_version()))
+        print(f"{args.products} products, snapshot loaded in {time.perf_counter() - started:.2f}s (traced)")
+        _, models_bytes = _allocated(lambda: list(Product.objects.all()))
+        print(f"{'snapshot, per product':<40} {snapshot_bytes / args.products:10.0f} bytes")
+        print(f"{'Product instances, per product':<40} {models_bytes / args.products:10.0f} bytes")
+        del snapshot
+
+        slugs = [f"bench-snapshot-{rng.randrange(args.products)}" for _ in range(args.number)]
+        state = {"i": 0}
+
+        def slug():
+            state["i"] = (state["i"] + 1) % len(slugs)
+            return slugs[state["i"]]
+
+        get_snapshot()
+        report("snapshot by slug (with version check)", measure(lambda: get_snapshot().by_slug(slug()), args.number))
+        report("Product.objects.get(slug=...)", measure(lambda: Product.objects.get(slug=slug()), args.number // 10))
+
+        user = User.objects.create_user(username="bench-snapshot", password="pw")
+        cart = get_open_cart(user)
+        for product_id in rng.sample(range(1, args.products + 1), args.cart_lines):
+            add_item(cart, product_id)
+        get_snapshot()
+        report(f"cart_lines ({args.cart_lines} lines)", measure(lambda: cart_lines(cart), args.number // 10))
+        report(
+            "select_related('product') lines",
+            measure(lambda: list(cart.items.select_related("product").with_subtotals()), args.number // 10),
+        )
+
+
+if __name__ == "__main__":
+    main()
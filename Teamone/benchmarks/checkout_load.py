@@ -0,0 +1,134 @@
+"""
+Checkout-session throughput of one worker against a fake Stripe API with realistic latency.
+
+The same subscription checkout endpoint is driven two ways:
+
+* through the WSGI handler, one request at a time, which is all a sync worker can do while
+  it waits on Stripe;
+* through the ASGI handler with many requests in flight on one event loop, where the view
+  awaits Stripe over the pooled aiohttp client.
+
+    python -m benchmarks.checkout_load --requests 200 --concurrency 50 --latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.harness import setup_django, test_database
+
+CSRF_TOKEN = "benchcsrftokenbenchcsrftoken0123"  # a 32-character unmasked CSRF secret
+
+
+def _asgi_scope(path, cookie):
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"testserver"),
+            (b"content-type", b"application/json"),
+            (b"cookie", cookie.encode()),
+            (b"x-csrftoken", CSRF_TOKEN.encode()),
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+
+
+async def _asgi_request(app, scope, body):
+    sent = False
+    statuses = []
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.Future()  # no disconnect; Django cancels this once the response is sent
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    await app(scope, receive, send)
+    return statuses[0]
+
+
+async def _run_asgi(app, scope, body, total, concurrency):
+    from shop import payments
+
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with slots:
+            return await _asgi_request(app, scope, body)
+
+    try:
+        return await asyncio.gather(*(one() for _ in range(total)))
+    finally:
+        await payments.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checkout-session throughput, sync vs async.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake Stripe response time in seconds.")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.handlers.asgi import ASGIHandler
+    from django.db import connection
+    from django.test import Client, override_settings
+
+    from benchmarks.fake_stripe import FakeStripe
+    from shop.models import User
+
+    if connection.vendor == "sqlite":
+        # ASGI runs each request's sync code on its own thread; the default in-memory shared-cache
+        # test database raises "table is locked" under that instead of waiting, a file does not
+        connection.settings_dict["TEST"]["NAME"] = os.path.join(tempfile.gettempdir(), "bench_checkout.sqlite3")
+
+    body = json.dumps({"tier": "pro", "months": 1}).encode()
+    with test_database(), FakeStripe(latency=args.latency) as fake, override_settings(
+        STRIPE_API_BASE=fake.url,
+        STRIPE_SECRET_KEY="sk_test_bench",
+        STRIPE_PRICE_MAP={"pro": "price_pro"},
+        STRIPE_MAX_CONCURRENCY=args.concurrency,
+        PERF_METRICS_ENABLED=False,
+    ):
+        client = Client()
+        client.force_login(User.objects.create(username="bench"))
+        cookie = f"sessionid={client.cookies['sessionid'].value}; csrftoken={CSRF_TOKEN}"
+
+        sync_total = max(1, args.requests // 5)  # sequential requests are slow; sample fewer
+        started = time.perf_counter()
+        for _ in range(sync_total):
+            response = client.post("/create-checkout-session/", body, content_type="application/json")
+            assert response.status_code == 200, response.status_code
+        sync_elapsed = time.perf_counter() - started
+
+        app = ASGIHandler()
+        scope = _asgi_scope("/create-checkout-session/", cookie)
+        started = time.perf_counter()
+        statuses = asyncio.run(_run_asgi(app, scope, body, args.requests, args.concurrency))
+        async_elapsed = time.perf_counter() - started
+        assert set(statuses) == {200}, statuses
+
+        print(f"fake Stripe latency {args.latency * 1e3:.0f} ms")
+        print(f"{'WSGI worker, sequential':<40} {sync_total / sync_elapsed:8.1f} req/s")
+        print(f"{f'ASGI worker, {args.concurrency} in flight':<40} {args.requests / async_elapsed:8.1f} req/s")
+        print(f"connections opened to Stripe: {len(fake.connections)}")
+
+
+if __name__ == "__main__":
+    main()
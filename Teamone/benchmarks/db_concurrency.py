@@ -0,0 +1,108 @@
+"""
+Cart API throughput with several worker threads sharing one database, under the stock
+connection settings (a new connection per request, rollback journal, deferred transactions)
+and under the active DATABASE_PROFILE's (persistent connections, and for SQLite WAL,
+synchronous=NORMAL, busy_timeout, mmap and immediate transactions).
+
+Each thread plays a logged-in shopper reading and updating their cart, closing stale
+connections around every request the way the request_started/finished signals do.
+
+    python -m benchmarks.db_concurrency --threads 8 --seconds 5
+    DATABASE_PROFILE=postgres python -m benchmarks.db_concurrency
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+
+from benchmarks.harness import setup_django, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cart API requests per second by connection profile.")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0, help="Run time per profile.")
+    parser.add_argument("--writes", type=float, default=0.3, help="Share of requests that update the cart.")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.db import OperationalError, close_old_connections, connection
+    from django.test import Client, override_settings
+
+    from shop.models import Product, User
+
+    if connection.vendor == "sqlite":
+        # threads need a database file they can all open; the default test database is in memory
+        connection.settings_dict["TEST"]["NAME"] = os.path.join(tempfile.gettempdir(), "bench_db_concurrency.sqlite3")
+
+    # the worker threads model a threaded WSGI server, where persistent connections are safe
+    tuned = {**settings.DATABASES["default"]}
+    tuned["CONN_MAX_AGE"] = tuned["CONN_MAX_AGE"] or 60
+    stock = {**tuned, "CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False, "OPTIONS": {}}
+    profiles = [
+        ("stock", stock, {}),
+        (f"{settings.DATABASE_PROFILE} profile", dict(tuned), settings.SQLITE_PRAGMAS),
+    ]
+
+    # failed requests are counted below; don't print each traceback
+    logging.getLogger("django.request").setLevel(logging.CRITICAL)
+    with test_database(), override_settings(PERF_METRICS_ENABLED=False):
+        product_ids = [Product.objects.create(name=f"Unit {i}", slug=f"bench-db-{i}", price=1).id for i in range(20)]
+        clients = []
+        for i in range(args.threads):
+            client = Client()
+            client.force_login(User.objects.create(username=f"bench-db-{i}"))
+            clients.append(client)
+        test_name = settings.DATABASES["default"]["NAME"]
+
+        for name, database, pragmas in profiles:
+            settings.DATABASES["default"] = {**database, "NAME": test_name}
+            connection.close()
+            if connection.vendor == "sqlite":
+                # the journal mode is stored in the file; switch it while nothing else has it open
+                with connection.cursor() as cursor:
+                    cursor.execute(f"PRAGMA journal_mode = {pragmas.get('journal_mode', 'DELETE')}")
+                connection.close()
+            done, errors = [0] * args.threads, [0] * args.threads
+            deadline = time.perf_counter() + args.seconds
+
+            def shop(n):
+                from django.db import connection as thread_connection
+
+                rng = random.Random(n)
+                client = clients[n]
+                while time.perf_counter() < deadline:
+                    close_old_connections()
+                    try:
+                        if rng.random() < args.writes:
+                            items = [{"product_id": pid, "quantity": rng.randint(0, 3)} for pid in rng.sample(product_ids, 3)]
+                            response = client.post("/api/cart/", json.dumps({"items": items}), content_type="application/json")
+                        else:
+                            response = client.get("/api/cart/")
+                        assert response.status_code == 200, response.status_code
+                        done[n] += 1
+                    except OperationalError:
+                        errors[n] += 1
+                    close_old_connections()
+                thread_connection.close()
+
+            started = time.perf_counter()
+            threads = [threading.Thread(target=shop, args=(n,)) for n in range(args.threads)]
+            with override_settings(SQLITE_PRAGMAS=pragmas):
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            elapsed = time.perf_counter() - started
+            print(f"{name:<40} {sum(done) / elapsed:8.1f} req/s   {sum(errors)} failed (database locked)")
+
+        settings.DATABASES["default"] = {**tuned, "NAME": test_name}
+
+
+if __name__ == "__main__":
+    main()
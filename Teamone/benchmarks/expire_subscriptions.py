@@ -0,0 +1,45 @@
+"""Time to expire a large backlog of lapsed subscriptions with shop.subscriptions.expire_due."""
+import os
+import time
+from datetime import timedelta
+
+from benchmarks.harness import setup_django, test_database
+
+TOTAL = int(os.environ.get("BENCH_TOTAL", 300_000))
+DUE_FRACTION = 0.5
+
+
+def main():
+    setup_django()
+    from django.utils import timezone
+
+    from shop.models import Subscription, User
+    from shop.subscriptions import expire_due
+
+    with test_database():
+        users = User.objects.bulk_create(User(username=f"u{i}") for i in range(1000))
+        now = timezone.now()
+        due = int(TOTAL * DUE_FRACTION)
+        Subscription.objects.bulk_create(
+            (
+                Subscription(
+                    user=users[i % len(users)], tier="basic", active=True, price=10, api_key=f"key-{i}",
+                    end_date=now - timedelta(minutes=i + 1) if i < due else now + timedelta(minutes=i),
+                )
+                for i in range(TOTAL)
+            ),
+            batch_size=5000,
+        )
+
+        started = time.perf_counter()
+        expired = expire_due(now=now)
+        elapsed = time.perf_counter() - started
+        print(f"expired {expired} of {TOTAL} subscriptions in {elapsed:.2f}s ({expired / elapsed:,.0f}/s)")
+
+        started = time.perf_counter()
+        expire_due(now=now)
+        print(f"idle sweep (nothing due) {(time.perf_counter() - started) * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
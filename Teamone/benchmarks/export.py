@@ -0,0 +1,58 @@
+"""Time to first byte and peak Python memory of the streaming metrics export at two dataset sizes."""
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.harness import setup_django, test_database
+
+
+def main(sizes=(20_000, 200_000)):
+    setup_django()
+    from django.test import Client
+    from django.urls import reverse
+    from django.utils import timezone as dj_timezone
+
+    from shop.jwt_utils import generate_subscription_jwt
+    from shop.models import EnvironmentalMetric, Product, Subscription, User
+
+    with test_database():
+        user = User.objects.create_user(username="bench", password="pw")
+        sub = Subscription.objects.create(
+            user=user, tier="research", active=True, end_date=dj_timezone.now() + timedelta(days=30),
+        )
+        sub.api_key = generate_subscription_jwt(sub)
+        sub.save()
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {sub.api_key}")
+        start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        Product.objects.create(name="Warmup", slug="warmup", price=1)
+        b"".join(client.get(reverse("metrics_export", args=["warmup"])).streaming_content)
+
+        for size in sizes:
+            product = Product.objects.create(name=f"Unit {size}", slug=f"unit-{size}", price=1)
+            EnvironmentalMetric.objects.bulk_create(
+                (
+                    EnvironmentalMetric(product=product, recorded_at=start + timedelta(seconds=i), salinity=1.0, ph=7.0)
+                    for i in range(size)
+                ),
+                batch_size=5000,
+            )
+            for fmt in ("csv", "bwm"):
+                tracemalloc.start()
+                began = time.perf_counter()
+                response = client.get(reverse("metrics_export", args=[product.slug]), {"format": fmt})
+                chunks = iter(response.streaming_content)
+                total = len(next(chunks))
+                first_byte = time.perf_counter() - began
+                for chunk in chunks:
+                    total += len(chunk)
+                elapsed = time.perf_counter() - began
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                print(
+                    f"{fmt:<4} {size:>8} rows  ttfb {first_byte * 1e3:7.2f} ms  total {elapsed:6.2f} s"
+                    f"  {total / 1e6:7.2f} MB out  peak py mem {peak / 1e6:6.2f} MB"
+                )
+
+
+if __name__ == "__main__":
+    main()
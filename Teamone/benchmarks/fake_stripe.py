@@ -0,0 +1,86 @@
+"""
+A local stand-in for the Stripe API, for tests and load tests of the payment views.
+
+    with FakeStripe(latency=0.05) as fake:
+        with override_settings(STRIPE_API_BASE=fake.url):
+            ...
+        fake.requests  # form bodies received, in order
+
+It runs an aiohttp server on a background thread with its own event loop and answers
+``POST /v1/checkout/sessions`` like Stripe does, after ``latency`` seconds. Setting
+``fail_with`` to an HTTP status makes it return a Stripe-style error instead.
+"""
+import asyncio
+import itertools
+import threading
+
+from aiohttp import web
+
+
+class FakeStripe:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.fail_with = None
+        self.requests = []
+        self.connections = set()
+        self._ids = itertools.count(1)
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self.url = None
+
+    async def _create_session(self, request):
+        self.connections.add(request.transport.get_extra_info("peername"))
+        form = dict(await request.post())
+        self.requests.append(form)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.fail_with:
+            return web.json_response(
+                {"error": {"type": "api_error", "message": "Fake Stripe failure"}}, status=self.fail_with,
+            )
+        session_id = f"cs_test_{next(self._ids)}"
+        metadata = {key[9:-1]: value for key, value in form.items() if key.startswith("metadata[")}
+        return web.json_response({
+            "id": session_id,
+            "object": "checkout.session",
+            "url": f"https://checkout.stripe.test/{session_id}",
+            "metadata": metadata,
+        })
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_post("/v1/checkout/sessions", self._create_session)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}"
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self._start())
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
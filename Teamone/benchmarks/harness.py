@@ -0,0 +1,70 @@
+import os
+import statistics
+import time
+from contextlib import contextmanager
+
+
+def setup_django():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "Teamone.settings")
+    import django
+
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    """Create (and afterwards destroy) a migrated test database, like the test runner does."""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def measure(func, number=1000, repeat=5, setup=None):
+    """
+    Time ``func`` ``number`` times per round and return per-call seconds for each round.
+    ``setup`` runs before every call and is excluded from the timing.
+    """
+    rounds = []
+    for _ in range(repeat):
+        elapsed = 0.0
+        for _ in range(number):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            func()
+            elapsed += time.perf_counter() - start
+        rounds.append(elapsed / number)
+    return rounds
+
+
+def report(name, rounds, unit="us"):
+    scale = {"s": 1, "ms": 1e3, "us": 1e6}[unit]
+    print(
+        f"{name:<40} median {statistics.median(rounds) * scale:10.2f} {unit}"
+        f"   min {min(rounds) * scale:10.2f} {unit}"
+    )
+
+
+def retry_if_locked(func, *args, **kwargs):
+    """
+    Call ``func``, retrying while SQLite's shared-cache test database reports
+    "table is locked" (it raises instead of waiting; the statement did not run).
+    """
+    from django.db import OperationalError
+
+    delay = 0.0005
+    while True:
+        try:
+            return func(*args, **kwargs)
+        except OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            time.sleep(delay)
+            delay = min(delay * 2, 0.01)
@@ -0,0 +1,63 @@
+"""
+API key rotation throughput: re-issuing every active subscription's key after a secret change,
+signing in this process and in a process pool, against the one-save()-per-key loop it replaces.
+
+    python -m benchmarks.key_rotation --subscriptions 20000 --workers 4
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.harness import setup_django, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API key rotation throughput.")
+    parser.add_argument("--subscriptions", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+    from django.test import override_settings
+
+    from shop.jwt_utils import generate_subscription_jwt
+    from shop.models import Subscription
+    from shop.subscriptions import reissue_api_keys
+
+    def rotate(secret, **kwargs):
+        with override_settings(JWT_API_SECRET=secret, JWT_API_SECRET_FALLBACKS=["bench-0"]):
+            started = time.perf_counter()
+            count = reissue_api_keys(batch_size=args.batch_size, **kwargs)
+            return count, time.perf_counter() - started
+
+    def report(name, count, elapsed):
+        print(f"{name:<40} {count:8d} keys {elapsed:8.2f}s {count / elapsed:10.0f} tokens/s")
+
+    with test_database(), override_settings(JWT_API_SECRET="bench-0"):
+        # every seeded subscription is active and keyed
+        call_command(
+            "seed_bench", users=max(1, args.subscriptions // 3), products=1, carts=0, metrics=0,
+            subscriptions=args.subscriptions, verbosity=0,
+        )
+        Subscription.objects.update(active=True)
+        active = Subscription.objects.filter(active=True, api_key__isnull=False).count()
+        print(f"{active} active subscriptions")
+
+        report("bulk, signing in-process", *rotate("bench-1"))
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            report(f"bulk, signing in a pool of {args.workers}", *rotate("bench-2", executor=pool))
+
+        sample = list(Subscription.objects.filter(active=True).order_by("pk")[:min(active, 2000)])
+        with override_settings(JWT_API_SECRET="bench-3"):
+            started = time.perf_counter()
+            for sub in sample:
+                sub.api_key = generate_subscription_jwt(sub)
+                sub.save()
+            report("one save() per key (sample)", len(sample), time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""Per-request overhead of PerfMiddleware around a view that runs a few queries and renders a template."""
+from benchmarks.harness import measure, report, setup_django, test_database
+
+
+def main():
+    setup_django()
+    from django.http import HttpResponse
+    from django.template import engines
+    from django.test import RequestFactory, override_settings
+
+    from shop import perf
+    from shop.models import Product
+
+    with test_database():
+        Product.objects.bulk_create(Product(name=f"P{i}", slug=f"p{i}", price=i) for i in range(20))
+        template = engines["django"].from_string("{% for p in products %}{{ p.name }} {{ p.price }}\n{% endfor %}")
+        request = RequestFactory().get("/products/")
+
+        def view(request):
+            for _ in range(4):
+                Product.objects.filter(price__gte=0).count()
+            return HttpResponse(template.render({"products": Product.objects.all()}, request))
+
+        with override_settings(PERF_METRICS_ENABLED=True):
+            instrumented = perf.PerfMiddleware(view)
+
+        report("view, no middleware", measure(lambda: view(request), number=2000))
+        report("view, PerfMiddleware", measure(lambda: instrumented(request), number=2000))
+        perf.reset()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""Per-request cost of the rate limit check for each store."""
+from benchmarks.harness import measure, report, setup_django
+
+
+def main():
+    setup_django()
+    from django.test import override_settings
+
+    from shop.ratelimit import CacheBucketStore, MemoryBucketStore
+
+    memory = MemoryBucketStore()
+    keys = [f"sub:{i}" for i in range(1000)]
+    state = {"i": 0}
+
+    def next_key():
+        state["i"] = (state["i"] + 1) % len(keys)
+        return keys[state["i"]]
+
+    report("memory token bucket, one key", measure(lambda: memory.hit("sub:1", 10**9, 60), number=50000))
+    report("memory token bucket, 1000 keys", measure(lambda: memory.hit(next_key(), 10**9, 60), number=50000))
+
+    locmem = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    with override_settings(CACHES=locmem):
+        cache_store = CacheBucketStore()
+        report("cache sliding window (locmem)", measure(lambda: cache_store.hit(next_key(), 10**9, 60), number=20000))
+
+
+if __name__ == "__main__":
+    main()
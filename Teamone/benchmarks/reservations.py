@@ -0,0 +1,74 @@
+"""
+Concurrent checkouts against a few hot SKUs: reservations per second and an oversell check.
+
+SQLite serialises writers, so extra threads add contention rather than throughput there;
+run against a server database to see how the conditional UPDATEs scale.
+Usage: python -m benchmarks.reservations [threads]
+"""
+import sys
+import threading
+import time
+
+from benchmarks.harness import retry_if_locked, setup_django, test_database
+
+
+def main(checkouts=2000, threads=8, hot_products=3, stock_per_product=400):
+    setup_django()
+    from django.db import close_old_connections, connection
+
+    from shop.inventory import InsufficientStock, reserve_cart
+    from shop.models import Cart, CartItem, Product, StockReservation, User
+
+    with test_database():
+        products = [
+            Product.objects.create(name=f"Hot {i}", slug=f"hot-{i}", price=1, stock=stock_per_product)
+            for i in range(hot_products)
+        ]
+        users = User.objects.bulk_create([User(username=f"bench{i}") for i in range(checkouts)])
+        carts = Cart.objects.bulk_create([Cart(user=user) for user in users])
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, product=products[i % hot_products], quantity=1 + i % 2)
+            for i, cart in enumerate(carts)
+        ])
+
+        results = {"reserved": 0, "rejected": 0}
+        lock = threading.Lock()
+        barrier = threading.Barrier(threads + 1)
+
+        def worker(batch):
+            barrier.wait()
+            reserved = rejected = 0
+            for cart in batch:
+                try:
+                    retry_if_locked(reserve_cart, cart)
+                    reserved += 1
+                except InsufficientStock:
+                    rejected += 1
+            with lock:
+                results["reserved"] += reserved
+                results["rejected"] += rejected
+            close_old_connections()
+            connection.close()
+
+        pool = [threading.Thread(target=worker, args=(carts[i::threads],)) for i in range(threads)]
+        for thread in pool:
+            thread.start()
+        barrier.wait()
+        began = time.perf_counter()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - began
+
+        held = sum(StockReservation.objects.filter(status="held").values_list("quantity", flat=True))
+        remaining = sum(Product.objects.values_list("stock", flat=True))
+        assert min(Product.objects.values_list("stock", flat=True)) >= 0, "stock went negative"
+        assert held + remaining == hot_products * stock_per_product, "units were created or lost"
+
+        print(f"checkouts           {checkouts} over {threads} threads, {hot_products} hot SKUs")
+        print(f"reserved/rejected   {results['reserved']}/{results['rejected']}")
+        print(f"throughput          {checkouts / elapsed:,.0f} checkout attempts/s")
+        print(f"units held          {held}, remaining {remaining}: no oversell")
+
+
+if __name__ == "__main__":
+    main(threads=int(sys.argv[1]) if len(sys.argv) > 1 else 8)
@@ -0,0 +1,107 @@
+"""
+Product search latency on a large synthetic catalogue, for the FTS5 index, the in-process
+fallback and the ``icontains`` scan the admin uses.
+
+    python -m benchmarks.search --products 100000
+"""
+import argparse
+import random
+import time
+from decimal import Decimal
+from itertools import accumulate
+from unittest import mock
+
+from benchmarks.harness import measure, report, setup_django, test_database
+
+ADJECTIVES = (
+    "solar compact portable marine industrial coastal rugged modular silent hybrid "
+    "graphene ceramic titanium smart rapid eco offshore deep wireless stainless"
+).split()
+NOUNS = (
+    "desalinator pump membrane filter sensor probe valve tank controller meter "
+    "panel cartridge housing manifold gauge logger buoy skimmer purifier kit"
+).split()
+COMMON = (
+    "water system flow unit pressure salinity brine output energy litres daily "
+    "seawater freshwater maintenance efficient reverse osmosis monitoring battery install"
+).split()
+SYLLABLES = "ka ri to mel an sur vo lex qua dor pin tra ze bel nor ost fyn gal hul ice".split()
+
+# typical storefront queries, plus one word that is in most descriptions ("water")
+QUERIES = ["aquavolt", "membrane filter", "marine pu", "titanium valve", "kamel", "osmosis", "gra", "water"]
+PREFIXES = ["so", "mem", "titanium va", "off", "ceramic p", "hy", "ka"]
+
+
+def _words(rng, count):
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    return sorted(words)
+
+
+def _catalogue(count, rng):
+    """Names from brands, series and product types; descriptions Zipf-distributed over ~5000 words."""
+    from shop.models import Product
+
+    brands = ["Aquavolt"] + [w.title() for w in _words(rng, 300)]
+    series = [w.title() for w in _words(rng, 2000)]
+    vocabulary = COMMON + NOUNS + ADJECTIVES + _words(rng, 5000)
+    cum_weights = list(accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+    for i in range(count):
+        name = f"{rng.choice(brands)} {rng.choice(series)} {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}"
+        description = " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(15, 60)))
+        yield Product(name=name, slug=f"bench-search-{i}", description=description, price=Decimal("99"))
+
+
+def _cycle(items):
+    state = {"i": 0}
+
+    def next_item():
+        state["i"] = (state["i"] + 1) % len(items)
+        return items[state["i"]]
+
+    return next_item
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search latency on a synthetic catalogue.")
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--number", type=int, default=200, help="Queries per timing round.")
+    args = parser.parse_args()
+
+    setup_django()
+    from shop import search
+    from shop.models import Product
+
+    with test_database():
+        started = time.perf_counter()
+        Product.objects.bulk_create(_catalogue(args.products, random.Random(0)), batch_size=5000)
+        print(f"created {args.products} products in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        search.Fts5Index().rebuild()
+        print(f"FTS5 index built in {time.perf_counter() - started:.1f}s")
+        fallback = search.InvertedIndex()
+        started = time.perf_counter()
+        fallback.rebuild()
+        print(f"in-process index built in {time.perf_counter() - started:.1f}s")
+
+        query, prefix = _cycle(QUERIES), _cycle(PREFIXES)
+        report("FTS5 search (top 20, with rows)", measure(lambda: search.search_products(query()), args.number), "ms")
+        report("FTS5 autocomplete", measure(lambda: search.autocomplete(prefix()), args.number), "ms")
+        with mock.patch("shop.search.fts5_available", return_value=False), mock.patch("shop.search._fallback", fallback):
+            report("in-process search (top 20, with rows)", measure(lambda: search.search_products(query()), args.number), "ms")
+            report("in-process autocomplete", measure(lambda: search.autocomplete(prefix()), args.number), "ms")
+
+        def icontains():
+            words = query().split()
+            products = Product.objects.all()
+            for word in words:
+                products = products.filter(name__icontains=word)
+            return list(products[:20])
+
+        report("icontains scan on name (top 20)", measure(icontains, max(1, args.number // 10), repeat=3), "ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+End-to-end request benchmarks against a database filled by ``manage.py seed_bench``.
+
+    python -m benchmarks.suite --scale small --output results.json
+    python -m benchmarks.suite --scale small --baseline results.json --tolerance 0.2
+
+Every scenario goes through the Django test client, so middleware, templates and the
+cache are included. Results are written as JSON; with ``--baseline`` the run is compared
+against a previous results file and exits with status 1 if any scenario's median got
+slower than the tolerance allows. Only compare runs from the same machine and scale.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import platform
+import statistics
+import sys
+import time
+import uuid
+
+from benchmarks.harness import measure, setup_django, test_database
+
+SCALES = {
+    "small": {"users": 50, "products": 30, "carts": 200, "subscriptions": 80, "metrics": 20_000},
+    "medium": {"users": 500, "products": 200, "carts": 3_000, "subscriptions": 800, "metrics": 500_000},
+    "large": {"users": 5_000, "products": 1_000, "carts": 30_000, "subscriptions": 8_000, "metrics": 5_000_000},
+}
+
+WEBHOOK_SECRET = "whsec_bench"
+
+
+def build_scenarios():
+    """name -> (func, setup or None); runs inside the seeded test database."""
+    from django.contrib.sites.models import Site
+    from django.core.cache import cache
+    from django.test import Client
+    from django.urls import reverse
+    from django.utils import timezone
+
+    from allauth.socialaccount.models import SocialApp
+    from shop.carts import add_item, get_open_cart
+    from shop.inventory import reserve_cart
+    from shop.models import Product, User
+
+    # base.html renders a Google login link for anonymous visitors
+    if not SocialApp.objects.filter(provider="google").exists():
+        app = SocialApp.objects.create(provider="google", name="Google", client_id="bench", secret="bench")
+        app.sites.add(Site.objects.get_current())
+
+    anonymous = Client()
+    shopper = Client()
+    shopper.force_login(User.objects.filter(username="bench-user-0").get())
+    buyer = User.objects.get(username="bench-user-1")
+    product = Product.objects.filter(slug__startswith="bench-").order_by("id").first()
+    detail_url = reverse("product_detail", args=[product.slug])
+    add_url = reverse("add_to_cart", args=[product.id])
+    webhook = Client()
+    pending = []
+
+    def get(client, url):
+        def run():
+            response = client.get(url)
+            assert response.status_code == 200, (url, response.status_code)
+        return run
+
+    def prepare_checkout():
+        cart = get_open_cart(buyer)
+        add_item(cart, product.id)
+        expires_at = reserve_cart(cart)
+        event = {
+            "id": f"evt_{uuid.uuid4().hex}",
+            "type": "checkout.session.completed",
+            "data": {"object": {
+                "id": f"cs_{uuid.uuid4().hex}",
+                "metadata": {"cart_id": str(cart.id), "user_id": str(buyer.id)},
+                "expires_at": int(expires_at.timestamp()),
+            }},
+        }
+        payload = json.dumps(event)
+        timestamp = int(time.time())
+        signature = hmac.new(WEBHOOK_SECRET.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+        pending.append((payload, f"t={timestamp},v1={signature}"))
+
+    def post_webhook():
+        payload, signature = pending.pop()
+        response = webhook.post(
+            reverse("stripe_webhook"), payload, content_type="application/json", HTTP_STRIPE_SIGNATURE=signature,
+        )
+        assert response.status_code == 200, response.status_code
+
+    def add_to_cart():
+        response = shopper.post(add_url)
+        assert response.status_code == 302, response.status_code
+
+    return {
+        "product_list (anonymous, cold cache)": (get(anonymous, reverse("product_list")), cache.clear),
+        "product_list (anonymous, warm cache)": (get(anonymous, reverse("product_list")), None),
+        "product_list (logged in)": (get(shopper, reverse("product_list")), None),
+        "product_detail (anonymous, cold cache)": (get(anonymous, detail_url), cache.clear),
+        "product_detail (logged in)": (get(shopper, detail_url), None),
+        "search api": (get(anonymous, reverse("search_api") + "?q=sensor+kit"), None),
+        "search autocomplete": (get(anonymous, reverse("search_autocomplete") + "?q=sensor+k"), None),
+        "dashboard": (get(shopper, reverse("dashboard")), None),
+        "my_orders": (get(shopper, reverse("my_orders")), None),
+        "view_cart": (get(shopper, reverse("view_cart")), None),
+        "add_to_cart": (add_to_cart, None),
+        "stripe webhook (cart checkout)": (post_webhook, prepare_checkout),
+    }
+
+
+def run(scale, number, repeat, only=None):
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test.utils import override_settings
+
+    import django
+
+    results = {}
+    with test_database(), override_settings(
+        STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET, STRIPE_WEBHOOK_QUEUE="sync", PERF_METRICS_ENABLED=False,
+    ):
+        started = time.perf_counter()
+        call_command("seed_bench", verbosity=0, **SCALES[scale])
+        print(f"seeded {scale} dataset in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+        for name, (func, setup) in build_scenarios().items():
+            if only and not any(part in name for part in only):
+                continue
+            func() if setup is None else (setup(), func())  # warm up
+            rounds = measure(func, number=number, repeat=repeat, setup=setup)
+            results[name] = {"median": statistics.median(rounds), "min": min(rounds), "rounds": rounds}
+            print(f"{name:<42} median {results[name]['median'] * 1e3:9.3f} ms   min {results[name]['min'] * 1e3:9.3f} ms")
+        vendor = connection.vendor
+
+    return {
+        "meta": {
+            "scale": scale,
+            "number": number,
+            "repeat": repeat,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": vendor,
+            "machine": platform.node(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Return the scenarios whose median exceeds the baseline's by more than ``tolerance``."""
+    if current["meta"]["scale"] != baseline["meta"]["scale"]:
+        print(f"warning: comparing scale {current['meta']['scale']} against {baseline['meta']['scale']}", file=sys.stderr)
+    regressions = []
+    print(f"\n{'scenario':<42} {'baseline':>11} {'current':>11} {'change':>8}")
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:<42} {'-':>11} {result['median'] * 1e3:9.3f}ms {'new':>8}")
+            continue
+        change = result["median"] / base["median"] - 1
+        flag = ""
+        if change > tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<42} {base['median'] * 1e3:9.3f}ms {result['median'] * 1e3:9.3f}ms {change:+8.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--number", type=int, default=20, help="Calls per round.")
+    parser.add_argument("--repeat", type=int, default=5, help="Rounds per scenario.")
+    parser.add_argument("--only", action="append", help="Run scenarios whose name contains this (repeatable).")
+    parser.add_argument("--output", help="Write the results JSON here.")
+    parser.add_argument("--baseline", help="Compare against this results JSON.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed median slowdown, as a fraction.")
+    args = parser.parse_args(argv)
+
+    setup_django()
+    current = run(args.scale, args.number, args.repeat, args.only)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(current, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
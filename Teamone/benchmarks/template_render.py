@@ -0,0 +1,72 @@
+"""
+Render time of the signed-in product list, product detail and dashboard pages (which aren't
+cached whole): with the uncached template loaders, with the cached loader, and with the cached
+loader plus the versioned {% cache %} fragments.
+
+    python -m benchmarks.template_render --products 12 --number 200
+"""
+import argparse
+from datetime import timedelta
+
+from benchmarks.harness import measure, report, setup_django, test_database
+
+UNCACHED_LOADERS = [
+    "django.template.loaders.filesystem.Loader",
+    "django.template.loaders.app_directories.Loader",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Signed-in page render time by template setup.")
+    parser.add_argument("--products", type=int, default=12, help="Products on the list page.")
+    parser.add_argument("--number", type=int, default=200, help="Requests per timing round.")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.test import Client, override_settings
+    from django.utils import timezone
+
+    from shop.models import EnvironmentalMetric, Product, User
+
+    cached_templates = settings.TEMPLATES
+    uncached_templates = [{**cached_templates[0], "OPTIONS": {**cached_templates[0]["OPTIONS"], "loaders": UNCACHED_LOADERS}}]
+    # the {% cache %} tag uses a "template_fragments" cache when one is configured
+    no_fragments = {**settings.CACHES, "template_fragments": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+    setups = [
+        ("uncached loaders", {"TEMPLATES": uncached_templates, "CACHES": no_fragments}),
+        ("cached loader", {"CACHES": no_fragments}),
+        ("cached loader + fragments", {}),
+    ]
+
+    with test_database(), override_settings(PERF_METRICS_ENABLED=False):
+        products = [
+            Product.objects.create(name=f"Unit {i}", slug=f"bench-render-{i}", price=100 + i, description="Solar desalination unit. " * 10)
+            for i in range(args.products)
+        ]
+        now = timezone.now()
+        EnvironmentalMetric.objects.bulk_create(
+            EnvironmentalMetric(product=products[0], recorded_at=now - timedelta(hours=i), salinity=35.0, ph=7.8, pollutant_index=20.0, notes="routine")
+            for i in range(50)
+        )
+        client = Client()
+        client.force_login(User.objects.create(username="bench-render"))
+        pages = [("list", "/"), ("detail", f"/product/{products[0].slug}/"), ("dashboard", "/dashboard/")]
+
+        for name, overrides in setups:
+            with override_settings(**overrides):
+                print(f"--- {name}")
+                for page, url in pages:
+                    cache.clear()
+
+                    def get():
+                        response = client.get(url)
+                        assert response.status_code == 200, response.status_code
+
+                    get()  # warm: compile templates (if cached) and fill fragments
+                    report(page, measure(get, args.number, 3), "ms")
+
+
+if __name__ == "__main__":
+    main()
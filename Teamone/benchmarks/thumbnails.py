@@ -0,0 +1,63 @@
+"""
+Thumbnail rendering throughput, one process vs a process pool, and the bytes a catalogue
+page saves by shipping a derivative instead of the upload.
+
+    python -m benchmarks.thumbnails --images 32 --workers 4
+"""
+import argparse
+import io
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.harness import setup_django
+
+
+def _photo(seed, size):
+    """A noisy gradient, which compresses about as badly as a real photo."""
+    from PIL import Image, ImageChops
+
+    gradient = Image.linear_gradient("L").resize(size).rotate(seed * 37 % 360)
+    noise = Image.effect_noise(size, 40 + seed % 20)
+    image = Image.merge("RGB", (gradient, ImageChops.add(gradient, noise, 2), noise))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=92)
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Thumbnail rendering throughput.")
+    parser.add_argument("--images", type=int, default=32)
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    setup_django()
+    from shop.images import render_options, render_variants
+
+    options = render_options()
+    photos = [_photo(i, (args.width, args.height)) for i in range(args.images)]
+
+    started = time.perf_counter()
+    rendered = [render_variants(photo, options) for photo in photos]
+    serial = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        list(pool.map(render_variants, photos, [options] * len(photos)))
+    pooled = time.perf_counter() - started
+
+    print(f"{args.images} uploads of {args.width}x{args.height}, sizes {options['sizes']}")
+    print(f"{'one process':<40} {args.images / serial:8.1f} images/s")
+    print(f"{f'pool of {args.workers}':<40} {args.images / pooled:8.1f} images/s")
+    print(f"{'upload (median)':<40} {statistics.median(len(p) for p in photos) / 1024:8.0f} KiB")
+    for name in options["sizes"]:
+        for fmt in ("jpg", "webp"):
+            size = statistics.median(len(r[name][fmt]) for r in rendered)
+            print(f"{f'{name} {fmt} (median)':<40} {size / 1024:8.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Replay thousands of duplicated, shuffled Stripe webhook deliveries against the local
+webhook endpoint (standing in for Stripe) and check every checkout is applied exactly once.
+
+Reports acknowledgement latency for the endpoint and throughput of the ledger worker.
+"""
+import json
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from benchmarks.harness import setup_django, test_database
+
+
+def main(checkouts=1000, duplicates=3, seed=7):
+    setup_django()
+    from django.test import Client, override_settings
+    from django.urls import reverse
+    from django.utils import timezone
+
+    from shop.models import Cart, StripeEvent, Subscription, User
+    from shop.webhooks import process_pending_events
+
+    rng = random.Random(seed)
+    with test_database(), override_settings(STRIPE_WEBHOOK_SECRET=None, STRIPE_WEBHOOK_QUEUE="db"):
+        user = User.objects.create_user(username="bench", password="pw")
+        events = []
+        for i in range(checkouts):
+            if i % 2:
+                Subscription.objects.create(
+                    user=user, tier="pro", end_date=timezone.now() + timedelta(days=30),
+                    stripe_checkout_session=f"cs_sub_{i}",
+                )
+                metadata = {"user_id": str(user.id), "tier": "pro", "months": "1"}
+                session = f"cs_sub_{i}"
+            else:
+                cart = Cart.objects.create(user=user)
+                metadata = {"user_id": str(user.id), "cart_id": str(cart.id)}
+                session = f"cs_cart_{i}"
+            events.append({
+                "id": f"evt_{i}",
+                "type": "checkout.session.completed",
+                "data": {"object": {"id": session, "metadata": metadata}},
+            })
+            events.append({"id": f"evt_noise_{i}", "type": "payment_intent.created", "data": {"object": {}}})
+
+        deliveries = [json.dumps(e) for e in events for _ in range(duplicates)]
+        rng.shuffle(deliveries)
+        half = len(deliveries) // 2
+
+        client = Client()
+        url = reverse("stripe_webhook")
+        latencies = []
+
+        def deliver(batch):
+            for body in batch:
+                began = time.perf_counter()
+                response = client.post(url, body, content_type="application/json")
+                latencies.append(time.perf_counter() - began)
+                assert response.status_code == 200
+
+        work = 0.0
+        processed = 0
+
+        def drain():
+            nonlocal work, processed
+            began = time.perf_counter()
+            while batch := process_pending_events(limit=500):
+                processed += batch
+            work += time.perf_counter() - began
+
+        # first half, drain, then the rest: duplicates arrive both before and after processing
+        deliver(deliveries[:half])
+        drain()
+        deliver(deliveries[half:])
+        drain()
+
+        assert StripeEvent.objects.count() == len(events), "duplicate deliveries reached the ledger"
+        assert processed == len(events), "an event was processed more than once"
+        assert not StripeEvent.objects.exclude(status="processed").exists()
+        assert Subscription.objects.filter(active=True).count() == checkouts // 2
+        assert Cart.objects.filter(checked_out=True).count() == checkouts - checkouts // 2
+
+        latencies.sort()
+        print(f"deliveries          {len(deliveries)} ({len(events)} unique events)")
+        print(f"ack latency p50     {statistics.median(latencies) * 1e3:.2f} ms")
+        print(f"ack latency p99     {latencies[int(len(latencies) * 0.99)] * 1e3:.2f} ms")
+        print(f"worker throughput   {processed / work:,.0f} events/s")
+        print("all checkouts applied exactly once")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,195 @@
+from django.conf import settings
 from django.contrib import admin
-from .models import User, Product, Cart, CartItem, EnvironmentalMetric, Subscription
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .models import User, Product, Cart, CartItem, EnvironmentalMetric, MetricAnomaly, Subscription, StripeEvent
+
+CURSOR_VAR = "cursor"
+
+
+def estimated_row_count(model, using="default"):
+    """The database's own estimate of a table's row count, or None where it keeps none."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        elif connection.vendor == "sqlite":
+            # only there once ANALYZE has run; the first number is the row count
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute("SELECT CAST(stat AS INTEGER) FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    return row[0] if row and row[0] and row[0] > 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Counts at most ``ADMIN_COUNT_LIMIT`` rows, or through the requested page if that is further
+    (``COUNT(*)`` over a ``LIMIT`` subquery), so a changelist over millions of rows doesn't scan
+    them all. Past that, an unfiltered list reports the database's estimate where there is one;
+    otherwise the count runs one page past the rows seen, so the next page stays reachable, and
+    ``count_label`` shows the capped number ("10000+").
+    """
+
+    def __init__(self, *args, page=1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.page_hint = page
+
+    @cached_property
+    def count(self):
+        limit = max(getattr(settings, "ADMIN_COUNT_LIMIT", 10000), self.page_hint * self.per_page)
+        queryset = self.object_list
+        count = queryset.order_by().values("pk")[:limit + 1].count()
+        self.count_label = count
+        if count <= limit:
+            return count
+        self.count_label = f"{limit}+"
+        paged = limit + self.per_page
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate and estimate > paged:
+                self.count_label = estimate
+                return estimate
+        return paged
+
+
+class HighVolumeAdmin(admin.ModelAdmin):
+    """Changelists that stay fast on large tables: capped counts and no second full count."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        page = request.GET.get(PAGE_VAR, "")
+        return self.paginator(
+            queryset, per_page, orphans, allow_empty_first_page, page=int(page) if page.isdigit() else 1,
+        )
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Pages newest first through ``model_admin.keyset_field`` (a datetime, pk as the tie-breaker)
+    by seeking past the last row shown instead of using OFFSET, so every page costs the same
+    index range scan, and never counts.
+    """
+
+    def get_results(self, request):
+        field = self.model_admin.keyset_field
+        queryset = self.queryset.order_by(f"-{field}", "-pk")
+        self.cursor = getattr(request, "keyset_cursor", "")
+        if self.cursor:
+            value, _, pk = self.cursor.rpartition("_")
+            value = parse_datetime(value)
+            if value is None or not pk.isdigit():
+                raise IncorrectLookupParameters
+            # (field, pk) < (value, pk), spelled so the field's index serves it as one range scan
+            queryset = queryset.filter(Q(**{f"{field}__lte": value}), Q(**{f"{field}__lt": value}) | Q(pk__lt=int(pk)))
+
+        rows = list(queryset[:self.list_per_page + 1])
+        self.result_list = rows[:self.list_per_page]
+        self.result_count = len(self.result_list)
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.can_show_all = False
+        self.multi_page = bool(self.cursor) or len(rows) > self.list_per_page
+        self.paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.first_page_url = self.get_query_string(remove=[CURSOR_VAR]) if self.cursor else None
+        self.next_page_url = None
+        if len(rows) > self.list_per_page:
+            last = self.result_list[-1]
+            cursor = f"{getattr(last, field).isoformat()}_{last.pk}"
+            self.next_page_url = self.get_query_string({CURSOR_VAR: cursor})
+
+
+class KeysetAdmin(HighVolumeAdmin):
+    keyset_field = None
+    # column sorting would break the seek order
+    sortable_by = ()
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def changelist_view(self, request, extra_context=None):
+        # the cursor isn't a field lookup, so keep it away from the changelist's filters
+        if CURSOR_VAR in request.GET:
+            request.GET = request.GET.copy()
+            request.keyset_cursor = request.GET.pop(CURSOR_VAR)[-1]
+        return super().changelist_view(request, extra_context)
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(HighVolumeAdmin):
     list_display = ("username", "email", "phone_number", "is_staff", "is_active")
     search_fields = ("username", "email")
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(HighVolumeAdmin):
     list_display = ("name", "price", "stock", "created_at")
     prepopulated_fields = {"slug": ("name",)}
     search_fields = ("name",)
 
 
 @admin.register(Cart)
-class CartAdmin(admin.ModelAdmin):
+class CartAdmin(HighVolumeAdmin):
     list_display = ("id", "user", "created_at", "checked_out")
     list_filter = ("checked_out",)
+    list_select_related = ("user",)
 
 
 @admin.register(CartItem)
-class CartItemAdmin(admin.ModelAdmin):
+class CartItemAdmin(HighVolumeAdmin):
     list_display = ("id", "cart", "product", "quantity", "subtotal")
+    # Cart.__str__ shows its user
+    list_select_related = ("cart__user", "product")
+    raw_id_fields = ("cart", "product")
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_subtotals()
 
 
 @admin.register(EnvironmentalMetric)
-class EnvironmentalMetricAdmin(admin.ModelAdmin):
+class EnvironmentalMetricAdmin(KeysetAdmin):
     list_display = ("product", "recorded_at", "salinity", "ph", "pollutant_index")
-    list_filter = ("recorded_at",)
+    list_select_related = ("product",)
+    list_filter = ("product",)
+    date_hierarchy = "recorded_at"
+    keyset_field = "recorded_at"
+    raw_id_fields = ("product",)
+
+
+@admin.register(MetricAnomaly)
+class MetricAnomalyAdmin(HighVolumeAdmin):
+    list_display = ("product", "field", "recorded_at", "value", "rolling_mean", "zscore", "ewma_zscore")
+    list_filter = ("field",)
+    list_select_related = ("product",)
+    raw_id_fields = ("product", "metric")
 
 
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(HighVolumeAdmin):
     list_display = ("user", "tier", "months", "start_date", "end_date", "active")
     list_filter = ("tier", "active")
+    list_select_related = ("user",)
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(HighVolumeAdmin):
+    list_display = ("event_id", "type", "status", "attempts", "received_at", "processed_at")
+    list_filter = ("status", "type")
+    search_fields = ("event_id",)
+
+    def get_queryset(self, request):
+        # the list never shows the payload; the change form loads it on access
+        return super().get_queryset(request).defer("payload")
@@ -0,0 +1,205 @@
+"""
+Anomaly detection over a product's EnvironmentalMetric readings.
+
+Readings are read in (recorded_at, id) order, ``ANOMALY_CHUNK_SIZE`` at a time, into NumPy
+arrays, and each metric field is scored against the readings before it:
+
+* rolling z-score: distance from the mean of the previous ``ANOMALY_WINDOW`` readings, in
+  standard deviations of that window (windowed sums from cumulative sums, so no per-row loop);
+* EWMA deviation: distance from the exponentially weighted mean of everything before, in
+  exponentially weighted standard deviations (the recursion is evaluated in closed form per
+  block of readings).
+
+A reading is flagged on a field when both scores exceed their thresholds, once at least
+``ANOMALY_MIN_PERIODS`` earlier readings exist: a short window alone is easily surprised by
+noise, and the EWMA alone by a slow drift. Null readings are skipped per field. Flags are
+stored as MetricAnomaly rows.
+
+MetricAnomalyState keeps the watermark (the last reading processed) together with the window
+tail and EWMA state, so an incremental run only reads newer readings and scores them exactly as
+a full run would. Readings inserted behind the watermark, or edited after they were scored, are
+only picked up by a full run.
+"""
+import math
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .catalogue import invalidate_product
+from .metrics import METRIC_FIELDS
+from .models import EnvironmentalMetric, MetricAnomaly, MetricAnomalyState
+
+# Standard deviations are floored at this fraction of the level (an absolute amount for levels
+# below 1): a flat history has none, and a spike after it must still score, not divide by zero.
+STD_FLOOR = 1e-6
+
+
+def detection_options():
+    options = {
+        "window": getattr(settings, "ANOMALY_WINDOW", 48),
+        "min_periods": getattr(settings, "ANOMALY_MIN_PERIODS", 12),
+        "zscore_threshold": getattr(settings, "ANOMALY_ZSCORE_THRESHOLD", 4.0),
+        "alpha": getattr(settings, "ANOMALY_EWMA_ALPHA", 0.1),
+        "ewma_threshold": getattr(settings, "ANOMALY_EWMA_THRESHOLD", 4.0),
+    }
+    if not 0 < options["alpha"] < 1:
+        raise ValueError("ANOMALY_EWMA_ALPHA must be between 0 and 1")
+    return options
+
+
+def ewma(values, alpha, start):
+    """
+    ``y[i] = (1 - alpha) * y[i-1] + alpha * values[i]`` with ``y[-1] = start``, vectorised.
+
+    Unrolled, ``y[i] = d**(i+1) * (start + alpha * sum(values[k] / d**(k+1) for k <= i))`` with
+    ``d = 1 - alpha``, which is a cumulative sum. ``d**-(k+1)`` grows without bound, so the sum
+    is restarted every block of readings, before it reaches 1e9.
+    """
+    decay = 1.0 - alpha
+    out = np.empty(len(values))
+    block = max(1, int(math.log(1e-9) / math.log(decay)))
+    for begin in range(0, len(values), block):
+        chunk = values[begin:begin + block]
+        powers = decay ** np.arange(1, len(chunk) + 1)
+        out[begin:begin + len(chunk)] = powers * (start + alpha * np.cumsum(chunk / powers))
+        start = out[begin + len(chunk) - 1]
+    return out
+
+
+def score(values, state, options):
+    """
+    Score one field's non-null readings ``values`` (in order) against ``state``, the field's
+    ``{"tail", "count", "ewma", "ewvar"}`` from the readings before; a new state is returned.
+
+    Returns ``(scores, state)`` where scores holds per-reading arrays: ``mean``/``std`` of the
+    previous window, ``zscore``, ``ewma`` (before the reading), ``ewma_zscore`` and ``flagged``.
+    Scores are NaN until ``min_periods`` readings precede. Deviations are measured in standard
+    deviations of at least ``STD_FLOOR`` times the level, so a spike after a flat run is flagged.
+    """
+    window, alpha = options["window"], options["alpha"]
+    tail = np.asarray(state.get("tail", []), dtype=float)
+    seen = state.get("count", 0)
+    n = len(values)
+
+    # rolling window over the readings before each one: windowed sums of (x - shift) and its
+    # square from cumulative sums; the shift keeps the sums small, which keeps them accurate
+    history = np.concatenate([tail, values])
+    shift = history.mean() if len(history) else 0.0
+    shifted = history - shift
+    sums = np.concatenate([[0.0], np.cumsum(shifted)])
+    squares = np.concatenate([[0.0], np.cumsum(shifted * shifted)])
+    end = np.arange(len(tail), len(tail) + n)
+    begin = np.maximum(end - window, 0)
+    counts = end - begin
+    preceding = seen + np.arange(n)
+    ready = preceding >= options["min_periods"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        window_mean = (sums[end] - sums[begin]) / counts
+        variance = np.maximum((squares[end] - squares[begin]) / counts - window_mean ** 2, 0.0)
+        mean = window_mean + shift
+        std = np.sqrt(variance)
+        zscore = np.where(ready, (values - mean) / np.maximum(std, STD_FLOOR * np.maximum(np.abs(mean), 1.0)), np.nan)
+
+    # EWMA and exponentially weighted variance of the deviations from it (West's recursion:
+    # var[i] = (1 - alpha) * (var[i-1] + alpha * dev[i]**2), itself an EWMA)
+    start = state.get("ewma")
+    if start is None:
+        start = values[0] if n else 0.0
+    averages = ewma(values, alpha, start)
+    before = np.concatenate([[start], averages[:-1]])
+    deviation = values - before
+    variances = ewma((1.0 - alpha) * deviation ** 2, alpha, state.get("ewvar", 0.0))
+    variance_before = np.concatenate([[state.get("ewvar", 0.0)], variances[:-1]])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ewma_std = np.maximum(np.sqrt(variance_before), STD_FLOOR * np.maximum(np.abs(before), 1.0))
+        ewma_zscore = np.where(ready, deviation / ewma_std, np.nan)
+
+    flagged = (np.abs(np.nan_to_num(zscore)) > options["zscore_threshold"]) & (
+        np.abs(np.nan_to_num(ewma_zscore)) > options["ewma_threshold"]
+    )
+    new_state = {
+        "tail": history[-window:].tolist(),
+        "count": seen + n,
+        "ewma": float(averages[-1]) if n else state.get("ewma"),
+        "ewvar": float(variances[-1]) if n else state.get("ewvar", 0.0),
+    }
+    scores = {"mean": mean, "std": std, "zscore": zscore, "ewma": before, "ewma_zscore": ewma_zscore, "flagged": flagged}
+    return scores, new_state
+
+
+def _float_or_none(value):
+    return None if math.isnan(value) else float(value)
+
+
+def _anomalies(product_id, ids, recorded_at, columns, states, options):
+    """Score one chunk of readings; returns the MetricAnomaly rows to create."""
+    anomalies = []
+    for field, values in zip(METRIC_FIELDS, columns):
+        present = ~np.isnan(values)
+        positions = np.flatnonzero(present)
+        if not len(positions):
+            continue
+        scores, states[field] = score(values[present], states.get(field, {}), options)
+        for i in np.flatnonzero(scores["flagged"]):
+            row = positions[i]
+            anomalies.append(MetricAnomaly(
+                product_id=product_id,
+                metric_id=int(ids[row]),
+                field=field,
+                recorded_at=recorded_at[row],
+                value=float(values[row]),
+                rolling_mean=float(scores["mean"][i]),
+                rolling_std=float(scores["std"][i]),
+                zscore=_float_or_none(scores["zscore"][i]),
+                ewma=float(scores["ewma"][i]),
+                ewma_zscore=_float_or_none(scores["ewma_zscore"][i]),
+            ))
+    return anomalies
+
+
+def detect(product_id, full=False, chunk_size=None, options=None):
+    """
+    Score a product's readings newer than its watermark (all of them with ``full=True``, which
+    also drops its earlier anomalies) and store the anomalies found.
+    Returns ``(readings_scored, anomalies_found)``.
+    """
+    options = options or detection_options()
+    chunk_size = chunk_size or getattr(settings, "ANOMALY_CHUNK_SIZE", 20000)
+    with transaction.atomic():
+        tracker, _ = MetricAnomalyState.objects.select_for_update().get_or_create(product_id=product_id)
+        if full:
+            MetricAnomaly.objects.filter(product_id=product_id).delete()
+            tracker.last_recorded_at, tracker.last_metric_id, tracker.state = None, 0, {}
+            tracker.save()
+
+    scored = found = 0
+    while True:
+        readings = EnvironmentalMetric.objects.filter(product_id=product_id).order_by("recorded_at", "id")
+        if tracker.last_recorded_at is not None:
+            readings = readings.filter(
+                Q(recorded_at__gt=tracker.last_recorded_at)
+                | Q(recorded_at=tracker.last_recorded_at, id__gt=tracker.last_metric_id)
+            )
+        rows = list(readings.values_list("id", "recorded_at", *METRIC_FIELDS)[:chunk_size])
+        if not rows:
+            break
+        ids, recorded_at, *values = zip(*rows)
+        # None -> NaN on conversion
+        columns = [np.array(column, dtype=float) for column in values]
+        states = dict(tracker.state)
+        anomalies = _anomalies(product_id, ids, recorded_at, columns, states, options)
+
+        with transaction.atomic():
+            MetricAnomaly.objects.bulk_create(anomalies, ignore_conflicts=True)
+            tracker.last_recorded_at, tracker.last_metric_id, tracker.state = recorded_at[-1], ids[-1], states
+            tracker.save(update_fields=["last_recorded_at", "last_metric_id", "state", "updated_at"])
+        scored += len(rows)
+        found += len(anomalies)
+        if len(rows) < chunk_size:
+            break
+
+    if found or full:
+        invalidate_product(product_id)
+    return scored, found
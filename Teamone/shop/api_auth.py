@@ -0,0 +1,189 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+import jwt
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.http import JsonResponse
+from django.utils import timezone
+
+from . import ratelimit
+from .jwt_utils import decode_subscription_jwt
+from .models import Subscription
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of verified token claims with a TTL.
+
+    Entries live in this process, but each one records its subscription's revocation version,
+    a counter in the shared Django cache, and a hit whose version has moved on is a miss.
+    Invalidating a subscription bumps that counter, so revocation reaches every worker on its
+    next request rather than after the TTL. Entries never outlive the token's own ``exp``.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # token -> (expires_at, version, claims)
+        self._by_subscription = {}  # sub_id -> set of tokens
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            expires_at, version, claims = entry
+            if expires_at <= now:
+                self._discard(token)
+                return None
+        # read outside the lock: with a shared backend this is a network round trip
+        if cache.get(_version_key(claims.get("sub_id"))) != version:
+            with self._lock:
+                if self._entries.get(token) is entry:
+                    self._discard(token)
+            return None
+        with self._lock:
+            if token in self._entries:
+                self._entries.move_to_end(token)
+        return claims
+
+    def version(self, sub_id):
+        """
+        The subscription's current revocation version. Read it before checking the database
+        and pass it to set(), so a revocation in between leaves the entry already stale.
+        """
+        key = _version_key(sub_id)
+        # seeded with a timestamp rather than 1 so an evicted counter can't collide with old entries
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        return cache.get(key)
+
+    def set(self, token, claims, version=None):
+        sub_id = claims.get("sub_id")
+        if version is None:
+            version = self.version(sub_id)
+        expires_at = min(time.time() + self.ttl, claims.get("exp", float("inf")))
+        with self._lock:
+            if token in self._entries:
+                self._discard(token)
+            self._entries[token] = (expires_at, version, claims)
+            self._by_subscription.setdefault(sub_id, set()).add(token)
+            while len(self._entries) > self.maxsize:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate_subscription(self, sub_id):
+        self.invalidate_subscriptions([sub_id])
+
+    def invalidate_subscriptions(self, sub_ids):
+        sub_ids = [str(sub_id) for sub_id in sub_ids]
+        # deleting the counters is the bump: version() re-seeds them with a newer timestamp, and
+        # one delete_many per batch beats an incr per subscription when expiry sweeps thousands
+        cache.delete_many([_version_key(sub_id) for sub_id in sub_ids])
+        with self._lock:
+            for sub_id in sub_ids:
+                for token in self._by_subscription.pop(sub_id, ()):
+                    self._entries.pop(token, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_subscription.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _discard(self, token):
+        _, _, claims = self._entries.pop(token)
+        tokens = self._by_subscription.get(claims.get("sub_id"))
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._by_subscription[claims.get("sub_id")]
+
+
+def _version_key(sub_id):
+    return f"api_auth:subscription:{sub_id}:version"
+
+
+token_cache = TokenCache(
+    maxsize=getattr(settings, "API_TOKEN_CACHE_SIZE", 1024),
+    ttl=getattr(settings, "API_TOKEN_CACHE_TTL", 60),
+)
+
+
+class APIAuthError(Exception):
+    pass
+
+
+def get_request_token(request):
+    """Read the API key from ``Authorization: Bearer <token>`` or ``X-API-Key``."""
+    header = request.META.get("HTTP_AUTHORIZATION", "")
+    if header[:7].lower() == "bearer ":
+        return header[7:].strip()
+    return request.META.get("HTTP_X_API_KEY", "").strip()
+
+
+def verify_api_token(token):
+    """
+    Return the claims of a valid, unrevoked subscription token.
+    Checks the signature and ``exp``, then that the subscription is still active
+    and still holds this exact token (cancel_subscription clears it), or held it
+    until a rotation less than JWT_API_ROTATION_GRACE_HOURS ago.
+    """
+    claims = token_cache.get(token)
+    if claims is not None:
+        return claims
+
+    try:
+        claims = decode_subscription_jwt(token)
+    except jwt.InvalidTokenError as e:
+        raise APIAuthError(str(e))
+
+    # a re-issued key replaces api_key; the one it replaced keeps working until its grace period ends
+    version = token_cache.version(claims["sub_id"])
+    current = Q(api_key=token) | Q(previous_api_key=token, previous_api_key_expires__gt=timezone.now())
+    if not Subscription.objects.filter(current, id=claims["sub_id"], active=True).exists():
+        raise APIAuthError("API key has been revoked")
+
+    token_cache.set(token, claims, version)
+    return claims
+
+
+def api_key_required(view_func):
+    """
+    Require a valid subscription API key; the claims are exposed as ``request.api_claims``.
+    Requests also count against the subscription tier's rate limit (see shop.ratelimit).
+    """
+
+    @wraps(view_func)
+    def _wrapped(request, *args, **kwargs):
+        token = get_request_token(request)
+        if not token:
+            return _unauthorized("API key required")
+        try:
+            request.api_claims = verify_api_token(token)
+        except APIAuthError as e:
+            return _unauthorized(str(e))
+
+        decision = ratelimit.check(request.api_claims)
+        if decision is not None and not decision.allowed:
+            response = JsonResponse({"error": "Rate limit exceeded"}, status=429)
+        else:
+            response = view_func(request, *args, **kwargs)
+        if decision is not None:
+            for header, value in decision.headers().items():
+                response[header] = value
+        return response
+
+    return _wrapped
+
+
+def _unauthorized(message):
+    response = JsonResponse({"error": message}, status=401)
+    response["WWW-Authenticate"] = 'Bearer realm="api"'
+    return response
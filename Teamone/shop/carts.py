@@ -0,0 +1,87 @@
+"""
+Cart mutations built from single-statement updates.
+
+Quantities are only ever changed with ``UPDATE ... SET quantity = quantity + n`` or an
+``INSERT ... ON CONFLICT`` upsert, and the one-open-cart-per-user / one-line-per-product
+constraints make concurrent creation safe, so no row is read-modified-written in Python.
+
+Reading a cart for display or checkout resolves its products from the in-process catalogue
+snapshot (shop.snapshot), so only the cart lines themselves are queried.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .dashboard import invalidate_summary
+from .models import Cart, CartItem
+from .snapshot import resolve
+
+
+class CartLine:
+    """A cart line with its product resolved from the catalogue snapshot."""
+
+    __slots__ = ("id", "product", "quantity")
+
+    def __init__(self, id, product, quantity):
+        self.id = id
+        self.product = product
+        self.quantity = quantity
+
+    @property
+    def product_id(self):
+        return self.product.id
+
+    @property
+    def subtotal(self) -> Decimal:
+        return Decimal(self.quantity) * self.product.price
+
+
+def cart_lines(cart):
+    """The cart's lines in the order they were added, at the cost of one query."""
+    if cart is None:
+        return []
+    rows = list(CartItem.objects.filter(cart=cart).order_by("id").values_list("id", "product_id", "quantity"))
+    products = resolve({product_id for _, product_id, _ in rows})
+    return [CartLine(line_id, products[product_id], quantity) for line_id, product_id, quantity in rows]
+
+
+def get_open_cart(user):
+    """The user's open cart, created if needed (safe under concurrent first adds)."""
+    cart, _ = Cart.objects.get_or_create(user=user, checked_out=False)
+    return cart
+
+
+def add_item(cart, product_id, quantity=1):
+    """Atomically add ``quantity`` of a product to the cart."""
+    lines = CartItem.objects.filter(cart=cart, product_id=product_id)
+    if lines.update(quantity=F("quantity") + quantity):
+        invalidate_summary(cart.user_id)
+        return
+    try:
+        with transaction.atomic():
+            CartItem.objects.create(cart=cart, product_id=product_id, quantity=quantity)
+    except IntegrityError:
+        # a concurrent request inserted the line first; add on top of it
+        lines.update(quantity=F("quantity") + quantity)
+        invalidate_summary(cart.user_id)
+
+
+def set_quantities(cart, quantities):
+    """
+    Set absolute quantities for several products at once: ``{product_id: quantity}``.
+    Zero removes the line. Costs one DELETE and one upsert regardless of the number of lines.
+    """
+    keep = {pid: qty for pid, qty in quantities.items() if qty > 0}
+    drop = [pid for pid, qty in quantities.items() if qty <= 0]
+    with transaction.atomic():
+        if drop:
+            CartItem.objects.filter(cart=cart, product_id__in=drop).delete()
+        if keep:
+            CartItem.objects.bulk_create(
+                [CartItem(cart=cart, product_id=pid, quantity=qty) for pid, qty in keep.items()],
+                update_conflicts=True,
+                unique_fields=["cart", "product"],
+                update_fields=["quantity"],
+            )
+    invalidate_summary(cart.user_id)
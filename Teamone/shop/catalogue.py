@@ -0,0 +1,94 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .models import Product
+
+CATALOGUE_VERSION_KEY = "catalogue:version"
+
+
+def _version(key):
+    # seed with a timestamp rather than 1 so an evicted counter can't collide with old entries
+    cache.add(key, int(time.time() * 1000), timeout=None)
+    return cache.get(key)
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), timeout=None)
+
+
+def catalogue_version():
+    return _version(CATALOGUE_VERSION_KEY)
+
+
+def product_version(product_id):
+    return _version(f"catalogue:product:{product_id}:version")
+
+
+def invalidate_catalogue():
+    """Product rows changed: every list page and detail page is stale."""
+    _bump(CATALOGUE_VERSION_KEY)
+
+
+def invalidate_product(product_id):
+    """A product's metrics changed: only its detail page is stale."""
+    _bump(f"catalogue:product:{product_id}:version")
+
+
+def list_page_key(page_number):
+    return f"catalogue:list:{catalogue_version()}:{page_number}"
+
+
+def detail_page_key(slug):
+    """Cache key for a detail page, or None when the slug is unknown."""
+    version = catalogue_version()
+    slug_key = f"catalogue:slug:{version}:{slug}"
+    product_id = cache.get(slug_key)
+    if product_id is None:
+        product_id = Product.objects.filter(slug=slug).values_list("id", flat=True).first()
+        if product_id is None:
+            return None
+        cache.set(slug_key, product_id, _timeout())
+    return f"catalogue:product:{version}:{product_id}:{product_version(product_id)}"
+
+
+def _timeout():
+    return getattr(settings, "CATALOGUE_CACHE_TIMEOUT", 300)
+
+
+def cached_page(request, key, render_page):
+    """
+    Serve an anonymous catalogue page from the cache, answering conditional GETs with 304.
+
+    ``render_page()`` is only called on a miss and must return ``(response, last_modified)``.
+    The ETag is a hash of the rendered body, so it is stable across workers.
+    """
+    entry = cache.get(key) if key else None
+    if entry is None:
+        response, last_modified = render_page()
+        if response.status_code != 200 or not key:
+            return response
+        entry = {
+            "content": response.content,
+            "content_type": response["Content-Type"],
+            "etag": f'"{hashlib.md5(response.content).hexdigest()}"',
+            "last_modified": int(last_modified.timestamp()) if last_modified else None,
+        }
+        cache.set(key, entry, _timeout())
+
+    response = get_conditional_response(
+        request, etag=entry["etag"], last_modified=entry["last_modified"]
+    ) or HttpResponse(entry["content"], content_type=entry["content_type"])
+    response["ETag"] = entry["etag"]
+    if entry["last_modified"]:
+        response["Last-Modified"] = http_date(entry["last_modified"])
+    patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+    return response
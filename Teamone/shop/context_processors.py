@@ -0,0 +1,6 @@
+from django.conf import settings
+
+
+def integrations(request):
+    """Which optional integrations templates may link to."""
+    return {"social_login_enabled": getattr(settings, "SOCIAL_LOGIN_ENABLED", False)}
@@ -0,0 +1,72 @@
+"""
+Data for the user dashboard.
+
+The per-user summary (subscriptions, active tier and API token, open cart lines, count and
+total) is built with two queries and cached per user. It is dropped by invalidate_summary()
+whenever the user's carts or subscriptions change, and an entry built against an older
+catalogue version (product names or prices changed) is rebuilt on read.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .catalogue import catalogue_version
+from .models import Cart, CartItem
+
+
+def summary_key(user_id):
+    return f"dashboard:summary:{user_id}"
+
+
+def invalidate_summary(user_id):
+    if user_id is not None:
+        invalidate_summaries([user_id])
+
+
+def invalidate_summaries(user_ids):
+    keys = [summary_key(user_id) for user_id in user_ids]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    # and again once the change is visible, in case a concurrent load re-cached the old state
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def build_summary(user):
+    subscriptions = list(user.subscriptions.all())
+    latest = max(subscriptions, key=lambda s: s.end_date, default=None)
+    active = [s for s in subscriptions if s.active]
+    current = max(active, key=lambda s: s.end_date, default=None)
+
+    cart_items = list(
+        CartItem.objects.filter(cart__user=user, cart__checked_out=False)
+        .select_related("product")
+        .with_subtotals()
+        .order_by("id")
+    )
+    return {
+        "subscriptions": subscriptions,
+        "active_tier": current.tier if current else None,
+        "api_token": latest.api_key if latest and latest.active else None,
+        "cart_items": cart_items,
+        "cart_count": sum(item.quantity for item in cart_items),
+        "cart_total": sum((item.subtotal for item in cart_items), Decimal("0.00")),
+    }
+
+
+def get_summary(user):
+    key = summary_key(user.pk)
+    version = catalogue_version()
+    entry = cache.get(key)
+    if entry is None or entry["catalogue_version"] != version:
+        entry = {"catalogue_version": version, "summary": build_summary(user)}
+        cache.set(key, entry, getattr(settings, "DASHBOARD_CACHE_TIMEOUT", 300))
+    return entry["summary"]
+
+
+def recent_orders(user):
+    """The user's latest checked-out carts with totals and lines (two queries)."""
+    limit = getattr(settings, "DASHBOARD_RECENT_ORDERS", 5)
+    return list(Cart.objects.order_history(user)[:limit])
@@ -0,0 +1,22 @@
+"""
+Per-connection database setup.
+
+Most SQLite tuning lives on the connection rather than in the database file, so
+``settings.SQLITE_PRAGMAS`` is applied to every connection as it is opened. With persistent
+connections (CONN_MAX_AGE) that happens once per worker thread rather than once per request.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    pragmas = getattr(settings, "SQLITE_PRAGMAS", {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
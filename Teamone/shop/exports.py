@@ -0,0 +1,120 @@
+"""
+Streaming encoders for EnvironmentalMetric exports.
+
+Both encoders consume an iterator of ``(recorded_at, salinity, ph, pollutant_index, notes)``
+tuples and yield byte chunks, so an export never holds more than one chunk in memory.
+
+The columnar format ("BWM1") is a header followed by blocks of up to ``chunk_size`` rows:
+
+    header: b"BWM1" | uint16 column count | per column: uint8 name length, name (ascii)
+    block:  uint32 row count | int64[n] recorded_at (microseconds since epoch, UTC)
+            | float64[n] per metric column (NaN for missing readings)
+
+All integers and floats are little-endian. Notes are only included in the CSV export.
+"""
+import csv
+import io
+import math
+import struct
+import sys
+from array import array
+from datetime import datetime, timezone
+
+from .metrics import METRIC_FIELDS
+
+CSV_COLUMNS = ("recorded_at",) + METRIC_FIELDS + ("notes",)
+COLUMNAR_MAGIC = b"BWM1"
+COLUMNAR_COLUMNS = ("recorded_at",) + METRIC_FIELDS
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_NAN = float("nan")
+
+
+def _csv_rows(rows):
+    for recorded_at, *values, notes in rows:
+        yield [recorded_at.isoformat(), *("" if v is None else v for v in values), notes]
+
+
+def csv_chunks(rows, chunk_size=2000):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    yield buffer.getvalue().encode("utf-8")  # header goes out before the first DB fetch
+
+    pending = 0
+    buffer.seek(0)
+    buffer.truncate()
+    for row in _csv_rows(rows):
+        writer.writerow(row)
+        pending += 1
+        if pending >= chunk_size:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _le_bytes(values):
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+
+def _encode_block(block):
+    timestamps = array("q", (_to_micros(row[0]) for row in block))
+    parts = [struct.pack("<I", len(block)), _le_bytes(timestamps)]
+    for i in range(1, len(COLUMNAR_COLUMNS)):
+        column = array("d", (_NAN if row[i] is None else row[i] for row in block))
+        parts.append(_le_bytes(column))
+    return b"".join(parts)
+
+
+def _to_micros(value):
+    delta = value - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def columnar_chunks(rows, chunk_size=8192):
+    header = [COLUMNAR_MAGIC, struct.pack("<H", len(COLUMNAR_COLUMNS))]
+    for name in COLUMNAR_COLUMNS:
+        header.append(struct.pack("<B", len(name)) + name.encode("ascii"))
+    yield b"".join(header)
+
+    block = []
+    for row in rows:
+        block.append(row)
+        if len(block) >= chunk_size:
+            yield _encode_block(block)
+            block = []
+    if block:
+        yield _encode_block(block)
+
+
+def read_columnar(stream):
+    """Decode a BWM1 stream into a dict of column name -> list (None for missing values)."""
+    if stream.read(4) != COLUMNAR_MAGIC:
+        raise ValueError("Not a BWM1 stream")
+    (ncols,) = struct.unpack("<H", stream.read(2))
+    names = []
+    for _ in range(ncols):
+        (length,) = struct.unpack("<B", stream.read(1))
+        names.append(stream.read(length).decode("ascii"))
+
+    columns = {name: [] for name in names}
+    while True:
+        head = stream.read(4)
+        if not head:
+            break
+        (n,) = struct.unpack("<I", head)
+        for i, name in enumerate(names):
+            values = array("q" if i == 0 else "d")
+            values.frombytes(stream.read(8 * n))
+            if sys.byteorder == "big":
+                values.byteswap()
+            if i == 0:
+                columns[name].extend(values)
+            else:
+                columns[name].extend(None if math.isnan(v) else v for v in values)
+    return columns
@@ -0,0 +1,155 @@
+"""
+Resized derivatives of product images.
+
+Each product image is rendered at every size in settings.THUMBNAIL_SIZES (a bounding box in
+pixels, never upscaled), once as JPEG (PNG when the image has transparency) and once as WebP.
+File names carry a hash of the source bytes and the render options, so the content behind a
+URL never changes and can be cached for good (``Cache-Control: immutable``); a new upload or
+new options produce new names.
+
+Product.image_variants records what was built:
+
+    {"source": "products/pump.jpg", "digest": "3f9c...", "options": {...},
+     "sizes": {"small": {"width": 320, "height": 213, "src": "thumbs/3f/3f9c...-small.jpg",
+                         "webp": "thumbs/3f/3f9c...-small.webp"}, ...}}
+
+render_variants() only takes and returns bytes, so it can run in a process pool, which is
+how ``manage.py build_thumbnails`` backfills. Saving a product with a new image builds its
+variants once the transaction commits.
+"""
+import hashlib
+import io
+import json
+import logging
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = "thumbs"
+RENDER_VERSION = 1  # bump when render_variants() output changes, so every file gets a new name
+DEFAULT_SIZES = {"small": 320, "medium": 640, "large": 1280}
+
+
+def render_options():
+    return {
+        "sizes": dict(getattr(settings, "THUMBNAIL_SIZES", DEFAULT_SIZES)),
+        "quality": getattr(settings, "THUMBNAIL_QUALITY", 82),
+        "version": RENDER_VERSION,
+    }
+
+
+def variants_digest(data, options):
+    digest = hashlib.sha256(data)
+    digest.update(json.dumps(options, sort_keys=True).encode())
+    return digest.hexdigest()[:24]
+
+
+def _encode(image, fmt, quality):
+    buffer = io.BytesIO()
+    if fmt == "jpg":
+        image.save(buffer, "JPEG", quality=quality, optimize=True, progressive=True)
+    elif fmt == "png":
+        image.save(buffer, "PNG", optimize=True)
+    else:
+        image.save(buffer, "WEBP", quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def render_variants(data, options):
+    """
+    Render the image in ``data`` at every size in ``options``.
+    Returns ``{size name: {"width", "height", "jpg" or "png": bytes, "webp": bytes}}``.
+    """
+    # Pillow is only needed where thumbnails are built, not by every web worker
+    from PIL import Image, ImageOps
+
+    sizes = sorted(options["sizes"].items(), key=lambda item: item[1], reverse=True)
+    with Image.open(io.BytesIO(data)) as image:
+        # JPEGs can be decoded at 1/2, 1/4 or 1/8 scale, far cheaper than full size
+        image.draft(None, (sizes[0][1], sizes[0][1]))
+        image = ImageOps.exif_transpose(image)
+        transparent = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+        image = image.convert("RGBA" if transparent else "RGB")
+
+    rendered = {}
+    # largest first, each size resized from the previous one
+    for name, bound in sizes:
+        image.thumbnail((bound, bound), Image.Resampling.LANCZOS)
+        rendered[name] = {
+            "width": image.width,
+            "height": image.height,
+            "png" if transparent else "jpg": _encode(image, "png" if transparent else "jpg", options["quality"]),
+            "webp": _encode(image, "webp", options["quality"]),
+        }
+    return rendered
+
+
+def variants_are_current(product):
+    variants = product.image_variants or {}
+    if not product.image:
+        return not variants
+    return variants.get("source") == product.image.name and variants.get("options") == render_options()
+
+
+def read_source(product):
+    with product.image.open("rb") as f:
+        return f.read()
+
+
+def save_variants(product, digest, options, rendered):
+    """Store rendered files and record them on the product (without firing its save signals)."""
+    # imported here so process-pool workers can import this module without Django set up
+    from django.utils import timezone
+
+    from .catalogue import invalidate_catalogue
+    from .models import Product
+
+    storage = product.image.storage
+    sizes = {}
+    for name, variant in rendered.items():
+        entry = {"width": variant["width"], "height": variant["height"]}
+        for fmt in ("jpg", "png", "webp"):
+            if fmt not in variant:
+                continue
+            path = f"{VARIANTS_DIR}/{digest[:2]}/{digest}-{name}.{fmt}"
+            if not storage.exists(path):  # same digest, same bytes
+                path = storage.save(path, ContentFile(variant[fmt]))
+            entry["webp" if fmt == "webp" else "src"] = path
+        sizes[name] = entry
+
+    variants = {"source": product.image.name, "digest": digest, "options": options, "sizes": sizes}
+    # a new updated_at also retires the cached product card fragments
+    product.updated_at = timezone.now()
+    Product.objects.filter(pk=product.pk).update(image_variants=variants, updated_at=product.updated_at)
+    product.image_variants = variants
+    invalidate_catalogue()  # cached list and detail pages still point at the full-size image
+    return variants
+
+
+def build_variants(product, force=False):
+    """Build the product's variants in this process; returns False when they were already current."""
+    from .models import Product
+
+    if not force and variants_are_current(product):
+        return False
+    if not product.image:
+        Product.objects.filter(pk=product.pk).update(image_variants={})
+        product.image_variants = {}
+        return True
+    data = read_source(product)
+    options = render_options()
+    save_variants(product, variants_digest(data, options), options, render_variants(data, options))
+    return True
+
+
+def build_variants_on_commit(product):
+    from PIL import Image
+
+    try:
+        build_variants(product)
+    # unreadable, not an image, or too many pixels to decode safely; pages keep using the original
+    except (OSError, Image.DecompressionBombError):
+        logger.warning("Could not build image variants for product %s", product.pk, exc_info=True)
+
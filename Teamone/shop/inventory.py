@@ -0,0 +1,109 @@
+"""
+Stock reservations.
+
+Stock is taken with conditional single-statement updates
+(``UPDATE product SET stock = stock - n WHERE id = ? AND stock >= n``), so the database
+arbitrates contention on hot products and stock can never go negative. A checkout either
+reserves every line or none (the surrounding transaction rolls back partial decrements).
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CartItem, Product, StockReservation
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_ids):
+        self.product_ids = product_ids
+        super().__init__(f"Insufficient stock for products {product_ids}")
+
+
+def reservation_ttl():
+    return timedelta(seconds=getattr(settings, "STOCK_RESERVATION_TTL", 60 * 60))
+
+
+def _take(product_id, quantity):
+    return Product.objects.filter(id=product_id, stock__gte=quantity).update(stock=F("stock") - quantity)
+
+
+def _restore(quantities):
+    # always in product id order so concurrent restores/takes can't deadlock
+    for product_id in sorted(quantities):
+        Product.objects.filter(id=product_id).update(stock=F("stock") + quantities[product_id])
+
+
+def reserve_cart(cart, ttl=None):
+    """
+    Hold stock for every line in ``cart``; any previous holds for the cart are released first.
+    Returns the expiry time. Raises InsufficientStock (reserving nothing) if a line can't be met.
+    """
+    lines = list(
+        CartItem.objects.filter(cart=cart).order_by("product_id").values_list("product_id", "quantity")
+    )
+    expires_at = timezone.now() + (ttl or reservation_ttl())
+    with transaction.atomic():
+        release_cart(cart.id)
+        short = [product_id for product_id, quantity in lines if not _take(product_id, quantity)]
+        if short:
+            raise InsufficientStock(short)  # leaving the atomic block undoes the partial takes
+        StockReservation.objects.bulk_create([
+            StockReservation(cart=cart, product_id=product_id, quantity=quantity, expires_at=expires_at)
+            for product_id, quantity in lines
+        ])
+    return expires_at
+
+
+def commit_cart(cart_id):
+    """Payment succeeded: make the cart's held stock permanent."""
+    with transaction.atomic():
+        committed = StockReservation.objects.filter(cart_id=cart_id, status="held").update(status="committed")
+        if not committed and StockReservation.objects.filter(cart_id=cart_id, status="released").exists():
+            # paid after the hold lapsed; take the stock again if it is still there
+            lines = CartItem.objects.filter(cart_id=cart_id).order_by("product_id").values_list("product_id", "quantity")
+            short = [product_id for product_id, quantity in lines if not _take(product_id, quantity)]
+            if short:
+                logger.warning("Cart %s was paid after its reservation expired; short on %s", cart_id, short)
+            StockReservation.objects.filter(cart_id=cart_id, status="released").update(status="committed")
+    return committed
+
+
+def release_cart(cart_id):
+    """Give back any stock still held for a cart (checkout abandoned or re-started)."""
+    return _release(StockReservation.objects.filter(cart_id=cart_id, status="held"))
+
+
+def release_expired(now=None, batch_size=500):
+    """Sweeper: release holds whose expiry has passed. Returns the number released."""
+    now = now or timezone.now()
+    released = 0
+    while True:
+        ids = list(
+            StockReservation.objects.filter(status="held", expires_at__lte=now)
+            .order_by("expires_at")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return released
+        released += _release(StockReservation.objects.filter(id__in=ids, status="held"))
+
+
+def _release(reservations):
+    with transaction.atomic():
+        rows = list(reservations.values_list("id", "product_id", "quantity"))
+        quantities = defaultdict(int)
+        released = 0
+        for reservation_id, product_id, quantity in rows:
+            # claim each hold individually so a concurrent release can't return stock twice
+            if StockReservation.objects.filter(id=reservation_id, status="held").update(status="released"):
+                quantities[product_id] += quantity
+                released += 1
+        _restore(quantities)
+    return released
@@ -1,7 +1,31 @@
+import hashlib
+from functools import lru_cache
+
 import jwt
 from django.conf import settings
 from datetime import datetime, timezone
 
+SIGNING_CHUNK_SIZE = 500  # tokens per task when signing in a process pool
+
+
+@lru_cache(maxsize=16)
+def key_id(secret):
+    """The ``kid`` for a secret: a short fingerprint, so keys need no separate names."""
+    return hashlib.sha256(f"bluewave-jwt:{secret}".encode()).hexdigest()[:16]
+
+
+def verification_keys():
+    """
+    {kid: secret} for every key a subscription token may be signed with: JWT_API_SECRET, which
+    signs new tokens, then JWT_API_SECRET_FALLBACKS, which only verify (like SECRET_KEY_FALLBACKS).
+    """
+    secrets = [settings.JWT_API_SECRET, *getattr(settings, "JWT_API_SECRET_FALLBACKS", [])]
+    return {key_id(secret): secret for secret in secrets}
+
+
+def current_key_id():
+    return key_id(settings.JWT_API_SECRET)
+
 def generate_api_jwt(user, expires_seconds=None):
     """
     Backwards-compatible quick generator (keeps previous behaviour).
@@ -18,25 +42,77 @@ def generate_api_jwt(user, expires_seconds=None):
         token = token.decode("utf-8")
     return token
 
-def generate_subscription_jwt(subscription):
+def subscription_claims(subscription):
     """
-    Generate a JWT that expires exactly when the subscription end_date is reached.
+    Claims for a subscription token, which expires exactly when the subscription end_date is reached.
     Expects subscription.end_date to be timezone-aware (Django's DateTimeField with USE_TZ=True).
+    Reads subscription.user, so select_related("user") when building many.
     """
     # If end_date is naive, treat as UTC
     end = subscription.end_date
     if end.tzinfo is None:
         end = end.replace(tzinfo=timezone.utc)
 
-    exp_ts = int(end.timestamp())
-    payload = {
-        "user_id": subscription.user.id,
+    return {
+        "user_id": subscription.user_id,
         "email": subscription.user.email,
         "tier": subscription.tier,
         "sub_id": str(subscription.id),
-        "exp": exp_ts,
+        "exp": int(end.timestamp()),
     }
-    token = jwt.encode(payload, settings.JWT_API_SECRET, algorithm=settings.JWT_API_ALGORITHM)
-    if isinstance(token, bytes):
-        token = token.decode("utf-8")
-    return token
\ No newline at end of file
+
+
+def _sign(claims_list, secret, kid, algorithm):
+    tokens = []
+    for claims in claims_list:
+        token = jwt.encode(claims, secret, algorithm=algorithm, headers={"kid": kid})
+        if isinstance(token, bytes):
+            token = token.decode("utf-8")
+        tokens.append(token)
+    return tokens
+
+
+def generate_subscription_jwt(subscription):
+    """Sign a token for the subscription with the current key (see verification_keys)."""
+    return _sign([subscription_claims(subscription)], settings.JWT_API_SECRET, current_key_id(),
+                 settings.JWT_API_ALGORITHM)[0]
+
+
+def sign_subscription_claims(claims_list, executor=None):
+    """
+    Sign many claim sets with the current key, in order. With an executor the work is split into
+    chunks across it; signing is CPU-bound, so that should be a ProcessPoolExecutor.
+    """
+    args = (settings.JWT_API_SECRET, current_key_id(), settings.JWT_API_ALGORITHM)
+    if executor is None or len(claims_list) <= SIGNING_CHUNK_SIZE:
+        return _sign(claims_list, *args)
+    chunks = [claims_list[i:i + SIGNING_CHUNK_SIZE] for i in range(0, len(claims_list), SIGNING_CHUNK_SIZE)]
+    futures = [executor.submit(_sign, chunk, *args) for chunk in chunks]
+    return [token for future in futures for token in future.result()]
+
+
+def decode_subscription_jwt(token):
+    """
+    Verify a subscription token against the key its ``kid`` names, and return its claims.
+    Tokens from before kid headers are tried against every key. Raises jwt.InvalidTokenError.
+    """
+    keys = verification_keys()
+    kid = jwt.get_unverified_header(token).get("kid")
+    if kid is None:
+        candidates = list(keys.values())
+    elif kid in keys:
+        candidates = [keys[kid]]
+    else:
+        raise jwt.InvalidTokenError("API key was signed with a retired key")
+
+    for i, secret in enumerate(candidates):
+        try:
+            return jwt.decode(
+                token,
+                secret,
+                algorithms=[settings.JWT_API_ALGORITHM],
+                options={"require": ["exp", "sub_id"]},
+            )
+        except jwt.InvalidSignatureError:
+            if i == len(candidates) - 1:
+                raise
@@ -0,0 +1,70 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from shop import images
+from shop.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Build resized thumbnails (JPEG/PNG and WebP) for product images that lack current ones, "
+        "rendering in a pool of worker processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Rendering processes.")
+        parser.add_argument("--force", action="store_true", help="Rebuild even when the variants are current.")
+
+    def handle(self, *args, **options):
+        workers = options["workers"]
+        if workers <= 0:
+            raise CommandError("--workers must be positive")
+
+        products = Product.objects.exclude(image="").exclude(image__isnull=True).order_by("pk")
+        todo = [p for p in products.iterator() if options["force"] or not images.variants_are_current(p)]
+        render_options = images.render_options()
+        built = failed = skipped = 0
+        started = time.perf_counter()
+
+        # the main process reads sources and writes results; workers only turn bytes into bytes.
+        # At most two jobs per worker are in flight, so memory stays bounded on large catalogues
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = {}
+            queue = iter(todo)
+            while True:
+                for product in queue:
+                    try:
+                        data = images.read_source(product)
+                    except OSError as e:
+                        failed += 1
+                        self.stderr.write(f"{product.slug}: {e}")
+                        continue
+                    digest = images.variants_digest(data, render_options)
+                    pending[pool.submit(images.render_variants, data, render_options)] = (product, digest)
+                    if len(pending) >= workers * 2:
+                        break
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    product, digest = pending.pop(future)
+                    try:
+                        images.save_variants(product, digest, render_options, future.result())
+                    except Image.DecompressionBombError as e:
+                        # over twice Image.MAX_IMAGE_PIXELS: refused before decoding
+                        skipped += 1
+                        self.stderr.write(f"{product.slug}: skipped, {e}")
+                    except OSError as e:
+                        failed += 1
+                        self.stderr.write(f"{product.slug}: {e}")
+                    else:
+                        built += 1
+
+        self.stdout.write(
+            f"Built thumbnails for {built} products ({products.count() - len(todo)} already current, "
+            f"{failed} failed, {skipped} skipped) in {time.perf_counter() - started:.2f}s."
+        )
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.subscriptions import expire_due
+
+
+class Command(BaseCommand):
+    help = "Deactivate subscriptions past their end date and revoke their API keys."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep sweeping every --interval seconds.")
+        parser.add_argument("--interval", type=float, default=60.0)
+        parser.add_argument("--batch-size", type=int, default=5000, help="Subscriptions per UPDATE.")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] <= 0:
+            raise CommandError("--batch-size must be positive")
+        while True:
+            started = time.perf_counter()
+            expired = expire_due(batch_size=options["batch_size"])
+            if expired or options["verbosity"] > 1:
+                self.stdout.write(f"Expired {expired} subscriptions in {time.perf_counter() - started:.2f}s.")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
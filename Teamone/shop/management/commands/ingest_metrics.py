@@ -0,0 +1,172 @@
+import csv
+import io
+import json
+import math
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from shop.catalogue import invalidate_product
+from shop.metrics import METRIC_FIELDS, apply_rollups, as_utc
+from shop.models import EnvironmentalMetric, Product
+
+
+class RowError(ValueError):
+    pass
+
+
+class ProductLookup:
+    """slug -> product id, memoised (including misses) so each slug costs at most one query."""
+
+    def __init__(self):
+        self._ids = dict(Product.objects.values_list("slug", "id"))
+
+    def __call__(self, slug):
+        if slug not in self._ids:
+            self._ids[slug] = Product.objects.filter(slug=slug).values_list("id", flat=True).first()
+        product_id = self._ids[slug]
+        if product_id is None:
+            raise RowError(f"unknown product {slug!r}")
+        return product_id
+
+
+def _float_or_none(row, field):
+    value = row.get(field)
+    if value is None or value == "":
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise RowError(f"{field} is not a number: {value!r}")
+    # "nan" and "inf" parse, but would poison the rollup sums
+    if not math.isfinite(number):
+        raise RowError(f"{field} is not a finite number: {value!r}")
+    return number
+
+
+def build_metric(row, lookup):
+    """Validate one parsed row and return an unsaved EnvironmentalMetric."""
+    slug = row.get("product")
+    if not slug:
+        raise RowError("missing product")
+    if not isinstance(slug, str):
+        raise RowError(f"product is not a slug: {slug!r}")
+    raw_time = row.get("recorded_at")
+    try:
+        recorded_at = parse_datetime(raw_time) if isinstance(raw_time, str) else None
+    except ValueError:  # well formed but impossible, e.g. February 30th
+        recorded_at = None
+    if recorded_at is None:
+        raise RowError(f"invalid recorded_at: {raw_time!r}")
+    values = {field: _float_or_none(row, field) for field in METRIC_FIELDS}
+    return EnvironmentalMetric(
+        product_id=lookup(slug),
+        recorded_at=as_utc(recorded_at),
+        notes=row.get("notes") or "",
+        **values,
+    )
+
+
+def read_csv(stream):
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield reader.line_num, row, row
+
+
+def read_ndjson(stream):
+    for line_num, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_num, RowError(f"invalid JSON: {e}"), line
+            continue
+        if not isinstance(row, dict):
+            row = RowError("expected a JSON object")
+        yield line_num, row, line
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream EnvironmentalMetric readings from a CSV or NDJSON file (or '-' for stdin) "
+        "into the database in batches. Malformed rows are written to a reject file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", help="Path to a .csv/.ndjson file, or '-' to read stdin.")
+        parser.add_argument("--format", choices=["csv", "ndjson"], help="Input format (default: from extension, csv for stdin).")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows per bulk_create/transaction.")
+        parser.add_argument("--rejects", help="Where to write rejected rows as NDJSON (default: <source>.rejects.ndjson, stderr for stdin).")
+
+    def handle(self, *args, **options):
+        self.verbosity = options["verbosity"]
+        source = options["source"]
+        fmt = options["format"] or ("ndjson" if source.endswith((".ndjson", ".jsonl")) else "csv")
+        batch_size = options["batch_size"]
+        if batch_size <= 0:
+            raise CommandError("--batch-size must be positive")
+
+        if source == "-":
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+        else:
+            try:
+                stream = open(source, encoding="utf-8", newline="")
+            except OSError as e:
+                raise CommandError(str(e))
+
+        rejects_path = options["rejects"] or (None if source == "-" else f"{source}.rejects.ndjson")
+        rejects = open(rejects_path, "w", encoding="utf-8") if rejects_path else sys.stderr
+
+        try:
+            loaded, rejected, elapsed = self.ingest(stream, fmt, batch_size, rejects)
+        finally:
+            if source != "-":
+                stream.close()
+            if rejects is not sys.stderr:
+                rejects.close()
+
+        rate = loaded / elapsed if elapsed else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {loaded} readings in {elapsed:.2f}s ({rate:,.0f} rows/s); {rejected} rejected."
+        ))
+        if rejected and rejects_path:
+            self.stdout.write(f"Rejected rows written to {rejects_path}")
+
+    def ingest(self, stream, fmt, batch_size, rejects):
+        rows = read_ndjson(stream) if fmt == "ndjson" else read_csv(stream)
+        lookup = ProductLookup()
+        batch, loaded, rejected = [], 0, 0
+        started = time.perf_counter()
+
+        for line_num, row, raw in rows:
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                batch.append(build_metric(row, lookup))
+            except RowError as e:
+                rejected += 1
+                rejects.write(json.dumps({"line": line_num, "error": str(e), "row": raw}) + "\n")
+                continue
+            if len(batch) >= batch_size:
+                loaded += self._flush(batch)
+                batch = []
+                if self.verbosity > 1:
+                    self.stdout.write(f"  {loaded} rows loaded")
+
+        if batch:
+            loaded += self._flush(batch)
+        return loaded, rejected, time.perf_counter() - started
+
+    def _flush(self, batch):
+        # bulk_create bypasses post_save, so do the rollup and cache upkeep ourselves
+        with transaction.atomic():
+            EnvironmentalMetric.objects.bulk_create(batch, batch_size=len(batch))
+            apply_rollups(batch)
+        for product_id in {metric.product_id for metric in batch}:
+            invalidate_product(product_id)
+        return len(batch)
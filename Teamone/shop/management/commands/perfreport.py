@@ -0,0 +1,115 @@
+import re
+import sys
+import urllib.request
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.perf import METRIC_PREFIX
+
+_SAMPLE = re.compile(r'^(\w+)\{([^}]*)\}\s+(\S+)$')
+_LABEL = re.compile(r'(\w+)="([^"]*)"')
+
+
+def parse_prometheus(text):
+    """{view: {metric: {"buckets": [(le, cumulative)], "sum": x, "count": n}}} plus n+1 counters."""
+    views = defaultdict(lambda: defaultdict(lambda: {"buckets": [], "sum": 0.0, "count": 0}))
+    for line in text.splitlines():
+        match = _SAMPLE.match(line.strip())
+        if not match or not match.group(1).startswith(METRIC_PREFIX):
+            continue
+        name, labels, value = match.group(1)[len(METRIC_PREFIX):], dict(_LABEL.findall(match.group(2))), float(match.group(3))
+        view = labels.get("view", "")
+        if name == "n_plus_one_total":
+            views[view]["n_plus_one"]["count"] = int(value)
+        elif name.endswith("_bucket"):
+            views[view][name[:-7]]["buckets"].append((float(labels["le"]), value))
+        elif name.endswith("_sum"):
+            views[view][name[:-4]]["sum"] = value
+        elif name.endswith("_count"):
+            views[view][name[:-6]]["count"] = int(value)
+    return views
+
+
+def quantile(buckets, q):
+    """Estimate a quantile from cumulative histogram buckets (linear within a bucket)."""
+    if not buckets or not buckets[-1][1]:
+        return None
+    target = q * buckets[-1][1]
+    lower_bound, lower_count = 0.0, 0.0
+    for bound, cumulative in buckets:
+        if cumulative >= target:
+            if bound == float("inf"):
+                return lower_bound
+            span = cumulative - lower_count
+            return lower_bound + (bound - lower_bound) * ((target - lower_count) / span if span else 1)
+        lower_bound, lower_count = bound, cumulative
+    return lower_bound
+
+
+class Command(BaseCommand):
+    help = "Summarise PerfMiddleware metrics per view from a running server's /internal/metrics/ (or a saved scrape)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", help="URL of the metrics endpoint, a file with a saved scrape, or '-' for stdin.")
+        parser.add_argument(
+            "--token", default=getattr(settings, "PERF_METRICS_TOKEN", ""),
+            help="Bearer token for the metrics endpoint (default: PERF_METRICS_TOKEN).",
+        )
+        parser.add_argument("--sort", default="p95", choices=["p95", "count", "queries"], help="Sort order.")
+
+    def handle(self, *args, **options):
+        source = options["source"]
+        try:
+            if source == "-":
+                text = sys.stdin.read()
+            elif source.startswith(("http://", "https://")):
+                request = urllib.request.Request(source)
+                if options["token"]:
+                    request.add_header("Authorization", f"Bearer {options['token']}")
+                with urllib.request.urlopen(request, timeout=10) as response:
+                    text = response.read().decode("utf-8")
+            else:
+                with open(source, encoding="utf-8") as fh:
+                    text = fh.read()
+        except OSError as e:
+            raise CommandError(f"Could not read metrics from {source}: {e}")
+
+        rows = []
+        for view, metrics in parse_prometheus(text).items():
+            duration = metrics["request_duration_seconds"]
+            count = duration["count"]
+            p50, p95 = quantile(duration["buckets"], 0.5), quantile(duration["buckets"], 0.95)
+            if not count or p50 is None:
+                # only an N+1 counter, or a scrape cut short before the buckets
+                continue
+
+            def mean(metric):
+                entry = metrics[metric]
+                return entry["sum"] / entry["count"] if entry["count"] else 0.0
+
+            rows.append({
+                "view": view,
+                "count": count,
+                "p50": p50 * 1e3,
+                "p95": p95 * 1e3,
+                "queries": mean("db_queries"),
+                "db_ms": mean("db_duration_seconds") * 1e3,
+                "tpl_ms": mean("template_render_seconds") * 1e3,
+                "kb": mean("response_bytes") / 1e3,
+                "n_plus_one": metrics["n_plus_one"]["count"],
+            })
+
+        if not rows:
+            self.stdout.write("No requests recorded.")
+            return
+        rows.sort(key=lambda r: r[options["sort"]], reverse=True)
+        header = f"{'view':<32} {'reqs':>7} {'p50 ms':>8} {'p95 ms':>8} {'queries':>8} {'db ms':>7} {'tpl ms':>7} {'kB':>8} {'N+1':>5}"
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+        for r in rows:
+            self.stdout.write(
+                f"{r['view'][:32]:<32} {r['count']:>7} {r['p50']:>8.1f} {r['p95']:>8.1f} {r['queries']:>8.1f}"
+                f" {r['db_ms']:>7.1f} {r['tpl_ms']:>7.1f} {r['kb']:>8.1f} {r['n_plus_one']:>5}"
+            )
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.webhooks import process_pending_events
+
+
+class Command(BaseCommand):
+    help = "Process pending (and retryable failed) Stripe webhook events from the StripeEvent ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep polling instead of exiting when the queue is empty.")
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds to sleep between polls when idle.")
+        parser.add_argument("--batch-size", type=int, default=100)
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            processed = process_pending_events(limit=options["batch_size"])
+            total += processed
+            if processed:
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} events."))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.catalogue import invalidate_catalogue
+from shop.models import Product
+from shop.search import Fts5Index, get_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the product search index from the products table, after bulk loads or raw SQL "
+        "that bypassed the Product save/delete signals."
+    )
+
+    def handle(self, *args, **options):
+        index = get_index()
+        if not isinstance(index, Fts5Index):
+            # the in-process index lives in each worker; a new catalogue version makes them rebuild
+            invalidate_catalogue()
+            self.stdout.write("Search uses the in-process index; workers will rebuild it on their next query.")
+            return
+        started = time.perf_counter()
+        index.rebuild()
+        self.stdout.write(
+            f"Indexed {Product.objects.count()} products in {time.perf_counter() - started:.2f}s."
+        )
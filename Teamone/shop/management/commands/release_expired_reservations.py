@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.inventory import release_expired
+
+
+class Command(BaseCommand):
+    help = "Return stock held by expired checkout reservations."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep sweeping every --interval seconds.")
+        parser.add_argument("--interval", type=float, default=60.0)
+
+    def handle(self, *args, **options):
+        while True:
+            released = release_expired()
+            if released or options["verbosity"] > 1:
+                self.stdout.write(f"Released {released} expired reservations.")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
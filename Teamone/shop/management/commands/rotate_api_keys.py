@@ -0,0 +1,50 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.jwt_utils import current_key_id
+from shop.subscriptions import reissue_api_keys
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-issue the API keys of all active subscriptions, signed with the current JWT_API_SECRET. "
+        "Move the old secret to JWT_API_SECRET_FALLBACKS first; replaced keys keep working for the grace period."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Subscriptions per query and bulk update.")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Signing processes.")
+        parser.add_argument(
+            "--grace-hours", type=float, default=getattr(settings, "JWT_API_ROTATION_GRACE_HOURS", 24),
+            help="How long replaced keys stay valid.",
+        )
+        parser.add_argument("--force", action="store_true", help="Also re-issue keys already signed with the current key.")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] <= 0 or options["workers"] <= 0:
+            raise CommandError("--batch-size and --workers must be positive")
+        if options["grace_hours"] < 0:
+            raise CommandError("--grace-hours must not be negative")
+
+        workers = options["workers"]
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext()
+        started = time.perf_counter()
+        with pool as executor:
+            count = reissue_api_keys(
+                batch_size=options["batch_size"],
+                grace=timedelta(hours=options["grace_hours"]),
+                executor=executor,
+                force=options["force"],
+            )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Re-issued {count} API keys with key {current_key_id()} in {elapsed:.2f}s "
+            f"({count / elapsed if elapsed else 0:.0f} tokens/s); "
+            f"replaced keys stay valid for {options['grace_hours']:g}h."
+        )
@@ -0,0 +1,243 @@
+import random
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from shop.catalogue import invalidate_catalogue
+from shop.jwt_utils import sign_subscription_claims, subscription_claims
+from shop.metrics import rebuild_rollups
+from shop.models import (
+    Cart, CartItem, EnvironmentalMetric, MetricAnomaly, MetricAnomalyState, MetricRollup, Product, Subscription, User,
+)
+from shop.pricing import subscription_price
+from shop.search import get_index as search_index
+
+TIERS = ("basic", "pro", "research")
+
+# Generated times are offsets from this, so the same --seed gives the same rows on every run.
+# It lies in the future: active subscriptions end after it, and their API keys must still be valid
+# when a benchmark runs.
+BASE_TIME = datetime(2035, 1, 1, tzinfo=dt_timezone.utc)
+
+# starting point and per-step drift for each metric's random walk
+_WALKS = {
+    "salinity": (35.0, 0.05, 30.0, 40.0),
+    "ph": (8.1, 0.01, 7.5, 8.6),
+    "pollutant_index": (20.0, 0.5, 0.0, 100.0),
+}
+
+
+def _walk(rng, start, step, low, high):
+    value = start + rng.uniform(-1, 1) * (high - low) / 10
+    while True:
+        value = min(high, max(low, value + rng.gauss(0, step)))
+        yield round(value, 3)
+
+
+class Command(BaseCommand):
+    help = (
+        "Populate the database with a synthetic, reproducible dataset for benchmarking: "
+        "users, products, carts, subscriptions and EnvironmentalMetric readings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--products", type=int, default=50)
+        parser.add_argument("--carts", type=int, default=300, help="One open cart per user first, the rest are past orders.")
+        parser.add_argument("--items-per-cart", type=int, default=3)
+        parser.add_argument("--subscriptions", type=int, default=150)
+        parser.add_argument("--metrics", type=int, default=100_000, help="Total EnvironmentalMetric rows, spread over the products.")
+        parser.add_argument("--days", type=int, default=90, help="Readings cover this many days up to --base-time.")
+        parser.add_argument(
+            "--base-time", default=BASE_TIME.isoformat(),
+            help=(
+                "ISO 8601 time that readings lead up to and subscription end dates count from, or 'now'. "
+                "The fixed default is in the future, so active subscriptions and their API keys are valid."
+            ),
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--prefix", default="bench", help="Username/slug prefix of generated rows.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--flush", action="store_true", help="Delete rows from a previous run with the same prefix first.")
+        parser.add_argument("--no-rollups", action="store_true", help="Skip rebuilding metric rollups.")
+
+    def handle(self, *args, **options):
+        self.verbosity = options["verbosity"]
+        self.rng = random.Random(options["seed"])
+        self.prefix = options["prefix"]
+        self.batch_size = options["batch_size"]
+        self.base_time = self.parse_base_time(options["base_time"])
+        if self.batch_size <= 0:
+            raise CommandError("--batch-size must be positive")
+        if options["products"] <= 0 and (options["carts"] or options["metrics"]):
+            raise CommandError("--products must be positive to create carts or metrics")
+        if options["users"] <= 0 and (options["carts"] or options["subscriptions"]):
+            raise CommandError("--users must be positive to create carts or subscriptions")
+
+        if options["flush"]:
+            self.flush()
+        elif User.objects.filter(username__startswith=f"{self.prefix}-").exists():
+            raise CommandError(f"Rows with prefix {self.prefix!r} already exist; use --flush or another --prefix.")
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            users = self.step("users", self.create_users, options["users"])
+            products = self.step("products", self.create_products, options["products"])
+            self.step("carts", self.create_carts, users, products, options["carts"], options["items_per_cart"])
+            self.step("subscriptions", self.create_subscriptions, users, options["subscriptions"])
+        metrics = self.step("metrics", self.create_metrics, products, options["metrics"], options["days"])
+        if metrics and not options["no_rollups"]:
+            self.step("rollups", rebuild_rollups, [p.id for p in products], self.batch_size)
+        invalidate_catalogue()
+        self.step("search index", search_index().rebuild)  # bulk_create skipped the save signals
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(users)} users, {len(products)} products, {options['carts']} carts, "
+            f"{options['subscriptions']} subscriptions and {metrics} readings "
+            f"in {time.perf_counter() - started:.1f}s."
+        ))
+
+    @staticmethod
+    def parse_base_time(value):
+        if value == "now":
+            return timezone.now()
+        try:
+            base_time = parse_datetime(value)
+        except ValueError:
+            base_time = None
+        if base_time is None:
+            raise CommandError(f"--base-time must be an ISO 8601 datetime or 'now', not {value!r}")
+        if timezone.is_naive(base_time):
+            base_time = timezone.make_aware(base_time, dt_timezone.utc)
+        return base_time
+
+    def step(self, name, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        if self.verbosity > 1:
+            self.stdout.write(f"  {name}: {time.perf_counter() - started:.2f}s")
+        return result
+
+    def flush(self):
+        products = Product.objects.filter(slug__startswith=f"{self.prefix}-")
+        # readings and rollups go in plain DELETEs first: cascading through the ORM would fire a
+        # rollup refresh per reading via the post_delete signal. Anomalies (from detect_anomalies)
+        # point at the readings, so they go before them.
+        sql, params = products.values("id").query.sql_with_params()
+        with transaction.atomic(), connection.cursor() as cursor:
+            for model in (MetricAnomaly, MetricAnomalyState, EnvironmentalMetric, MetricRollup):
+                cursor.execute(f"DELETE FROM {model._meta.db_table} WHERE product_id IN ({sql})", params)
+        # cascades take carts, items, reservations and subscriptions with them
+        User.objects.filter(username__startswith=f"{self.prefix}-").delete()
+        products.delete()
+
+    def create_users(self, count):
+        # no password hashing: benchmark clients log in with force_login
+        users = [
+            User(username=f"{self.prefix}-user-{i}", email=f"{self.prefix}-user-{i}@example.com")
+            for i in range(count)
+        ]
+        for user in users:
+            user.set_unusable_password()
+        return User.objects.bulk_create(users, batch_size=self.batch_size)
+
+    def create_products(self, count):
+        rng = self.rng
+        products = [
+            Product(
+                name=f"Sensor kit {i}",
+                slug=f"{self.prefix}-product-{i}",
+                description=f"Synthetic product {i} for benchmarking.",
+                price=Decimal(rng.randint(500, 50_000)) / 100,
+                stock=1_000_000,
+            )
+            for i in range(count)
+        ]
+        return Product.objects.bulk_create(products, batch_size=self.batch_size)
+
+    def create_carts(self, users, products, count, items_per_cart):
+        rng = self.rng
+        carts = Cart.objects.bulk_create(
+            # the first pass over the users gives each an open cart; later carts are order history
+            [Cart(user=users[i % len(users)], checked_out=i >= len(users)) for i in range(count)],
+            batch_size=self.batch_size,
+        )
+        items = []
+        for cart in carts:
+            for product in rng.sample(products, min(items_per_cart, len(products))):
+                items.append(CartItem(cart=cart, product=product, quantity=rng.randint(1, 5)))
+        CartItem.objects.bulk_create(items, batch_size=self.batch_size)
+        return carts
+
+    def create_subscriptions(self, users, count):
+        rng = self.rng
+        subs = []
+        for i in range(count):
+            tier = rng.choice(TIERS)
+            months = rng.choice((1, 3, 6, 12))
+            active = rng.random() < 0.7
+            end_date = self.base_time + timedelta(days=rng.randint(1, 30 * months) if active else -rng.randint(1, 365))
+            subs.append(Subscription(
+                user=users[i % len(users)], tier=tier, months=months, active=active,
+                end_date=end_date, price=subscription_price(tier, months),
+            ))
+        subs = Subscription.objects.bulk_create(subs, batch_size=self.batch_size)
+        keyed = [sub for sub in subs if sub.active]
+        for sub, token in zip(keyed, sign_subscription_claims([subscription_claims(sub) for sub in keyed])):
+            sub.api_key = token
+        Subscription.objects.bulk_update(keyed, ["api_key"], batch_size=self.batch_size)
+        return subs
+
+    def create_metrics(self, products, count, days):
+        """
+        Evenly spaced random-walk readings per product, inserted in batches.
+        Rows go in through a plain executemany rather than bulk_create: at millions of rows,
+        building model instances and compiling per-row SQL dominated the run time.
+        """
+        if not count:
+            return 0
+        rng = self.rng
+        adapt = connection.ops.adapt_datetimefield_value
+        per_product, remainder = divmod(count, len(products))
+        created = 0
+        batch = []
+        for index, product in enumerate(products):
+            n = per_product + (index < remainder)
+            if not n:
+                continue
+            spacing = timedelta(days=days) / n
+            start = self.base_time - timedelta(days=days)
+            walks = {field: _walk(rng, *params) for field, params in _WALKS.items()}
+            for i in range(n):
+                # the occasional missing reading, as from a flaky sensor
+                values = [None if rng.random() < 0.01 else next(walk) for walk in walks.values()]
+                batch.append((product.id, adapt(start + spacing * i), *values, ""))
+                if len(batch) >= self.batch_size:
+                    created += self._flush_metrics(batch)
+                    batch = []
+        if batch:
+            created += self._flush_metrics(batch)
+        return created
+
+    @staticmethod
+    def metric_insert_sql():
+        meta = EnvironmentalMetric._meta
+        qn = connection.ops.quote_name
+        columns = ["product_id", "recorded_at", *_WALKS, "notes"]
+        return "INSERT INTO {} ({}) VALUES ({})".format(
+            qn(meta.db_table),
+            ", ".join(qn(meta.get_field(name).column) for name in columns),
+            ", ".join(["%s"] * len(columns)),
+        )
+
+    def _flush_metrics(self, batch):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(self.metric_insert_sql(), batch)
+        if self.verbosity > 2:
+            self.stdout.write(f"    {len(batch)} readings")
+        return len(batch)
@@ -0,0 +1,83 @@
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def default_modules():
+    """The WSGI entry point plus the URLconf, which the first request imports."""
+    return [settings.WSGI_APPLICATION.rpartition(".")[0], settings.ROOT_URLCONF]
+
+
+def profile_imports(modules):
+    """
+    Import ``modules`` in a fresh interpreter under ``python -X importtime`` (with this
+    process's settings and path) and return ``[(module, self_us, cumulative_us, depth)]`` in
+    the order the imports finished.
+    """
+    env = {
+        **os.environ,
+        "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE,
+        "PYTHONPATH": os.pathsep.join(p for p in sys.path if p),
+    }
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+    )
+    if result.returncode:
+        raise CommandError(f"Importing {', '.join(modules)} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+
+def total_ms(rows):
+    """Wall time of the whole import: the sum over the top-level imports."""
+    return sum(cumulative for _, _, cumulative, depth in rows if depth == 0) / 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Report where a cold worker spends its import time: the WSGI entry point and URLconf "
+        "(or the given modules) are imported in a fresh interpreter under -X importtime."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("modules", nargs="*", help="Modules to import (default: the WSGI module and ROOT_URLCONF).")
+        parser.add_argument("--limit", type=int, default=15, help="Rows per table.")
+        parser.add_argument(
+            "--budget", type=float, metavar="MS",
+            help="Fail when the cold import takes longer than this (for a CI step on a known machine).",
+        )
+
+    def handle(self, *args, **options):
+        modules = options["modules"] or default_modules()
+        rows = profile_imports(modules)
+        limit = options["limit"]
+
+        self.stdout.write(f"Cold import of {', '.join(modules)}: {total_ms(rows):.1f} ms, {len(rows)} modules")
+
+        packages = defaultdict(int)
+        for name, self_us, _, _ in rows:
+            packages[name.partition(".")[0]] += self_us
+        self.stdout.write("\nBy package (own time of its modules):")
+        for package, us in sorted(packages.items(), key=lambda item: -item[1])[:limit]:
+            self.stdout.write(f"  {package:<40} {us / 1000:8.1f} ms")
+
+        # the heaviest imports, each with everything it pulled in
+        self.stdout.write("\nBy module (including its own imports):")
+        for name, _, cumulative, depth in sorted(rows, key=lambda row: -row[2])[:limit]:
+            self.stdout.write(f"  {name:<40} {cumulative / 1000:8.1f} ms   depth {depth}")
+
+        if options["budget"] is not None and total_ms(rows) > options["budget"]:
+            raise CommandError(f"Cold import took {total_ms(rows):.1f} ms, over the {options['budget']:g} ms budget.")
@@ -0,0 +1,252 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min, Sum, Value, FloatField
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import EnvironmentalMetric, MetricRollup
+
+METRIC_FIELDS = ("salinity", "ph", "pollutant_index")
+BUCKETS = ("hour", "day", "week")
+
+_BUCKET_LENGTH = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+}
+
+
+def as_utc(value):
+    """Treat naive datetimes as UTC."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def bucket_start(value, bucket):
+    """Floor a datetime to the start of its UTC hour/day/ISO week."""
+    value = as_utc(value).astimezone(timezone.utc)
+    if bucket == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+    day = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if bucket == "day":
+        return day
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    raise ValueError(f"Unknown bucket {bucket!r}")
+
+
+def bucket_end(start, bucket):
+    return start + _BUCKET_LENGTH[bucket]
+
+
+def _empty_stats():
+    stats = {"count": 0}
+    for field in METRIC_FIELDS:
+        stats[f"{field}_count"] = 0
+        stats[f"{field}_sum"] = 0.0
+        stats[f"{field}_min"] = None
+        stats[f"{field}_max"] = None
+    return stats
+
+
+def _accumulate(readings):
+    """
+    Fold readings into per-(product, bucket, bucket_start) stats.
+    ``readings`` yields objects with product_id, recorded_at and the metric fields.
+    """
+    groups = defaultdict(_empty_stats)
+    for reading in readings:
+        hour = bucket_start(reading.recorded_at, "hour")
+        day = hour.replace(hour=0)
+        starts = (("hour", hour), ("day", day), ("week", day - timedelta(days=day.weekday())))
+        for bucket, start in starts:
+            stats = groups[(reading.product_id, bucket, start)]
+            stats["count"] += 1
+            for field in METRIC_FIELDS:
+                value = getattr(reading, field)
+                if value is None:
+                    continue
+                stats[f"{field}_count"] += 1
+                stats[f"{field}_sum"] += value
+                low, high = stats[f"{field}_min"], stats[f"{field}_max"]
+                stats[f"{field}_min"] = value if low is None else min(low, value)
+                stats[f"{field}_max"] = value if high is None else max(high, value)
+    return groups
+
+
+def _merge_updates(stats):
+    """F()-based UPDATE kwargs that fold ``stats`` into an existing rollup row."""
+    updates = {"count": F("count") + stats["count"]}
+    for field in METRIC_FIELDS:
+        if not stats[f"{field}_count"]:
+            continue
+        low = Value(stats[f"{field}_min"], output_field=FloatField())
+        high = Value(stats[f"{field}_max"], output_field=FloatField())
+        updates[f"{field}_count"] = F(f"{field}_count") + stats[f"{field}_count"]
+        updates[f"{field}_sum"] = F(f"{field}_sum") + stats[f"{field}_sum"]
+        updates[f"{field}_min"] = Least(Coalesce(F(f"{field}_min"), low), low)
+        updates[f"{field}_max"] = Greatest(Coalesce(F(f"{field}_max"), high), high)
+    return updates
+
+
+def _upsert(product_id, bucket, start, stats):
+    rows = MetricRollup.objects.filter(product_id=product_id, bucket=bucket, bucket_start=start)
+    if rows.update(**_merge_updates(stats)):
+        return
+    try:
+        with transaction.atomic():
+            MetricRollup.objects.create(product_id=product_id, bucket=bucket, bucket_start=start, **stats)
+    except IntegrityError:
+        # another writer created the bucket first; fold into theirs
+        rows.update(**_merge_updates(stats))
+
+
+def _merge_into(row, stats):
+    row.count += stats["count"]
+    for field in METRIC_FIELDS:
+        n = stats[f"{field}_count"]
+        if not n:
+            continue
+        setattr(row, f"{field}_count", getattr(row, f"{field}_count") + n)
+        setattr(row, f"{field}_sum", getattr(row, f"{field}_sum") + stats[f"{field}_sum"])
+        low, high = getattr(row, f"{field}_min"), getattr(row, f"{field}_max")
+        setattr(row, f"{field}_min", stats[f"{field}_min"] if low is None else min(low, stats[f"{field}_min"]))
+        setattr(row, f"{field}_max", stats[f"{field}_max"] if high is None else max(high, stats[f"{field}_max"]))
+
+
+_ROLLUP_VALUE_FIELDS = ["count"] + [
+    f"{field}_{agg}" for field in METRIC_FIELDS for agg in ("count", "sum", "min", "max")
+]
+_LOOKUP_CHUNK = 500
+
+
+def apply_rollups(readings):
+    """
+    Incrementally fold new readings into the rollup tables.
+    Existing buckets are read once per bucket kind (locked for update), merged in Python
+    and written back with bulk_update; unseen buckets are bulk-created. Callers ingesting
+    in batches should pass the whole batch at once.
+    """
+    groups = _accumulate(readings)
+    if not groups:
+        return 0
+
+    keys_by_bucket = defaultdict(list)
+    for key in groups:
+        keys_by_bucket[key[1]].append(key)
+
+    with transaction.atomic():
+        existing = {}
+        for bucket, keys in keys_by_bucket.items():
+            product_ids = {key[0] for key in keys}
+            starts = sorted({key[2] for key in keys})
+            for i in range(0, len(starts), _LOOKUP_CHUNK):
+                rows = MetricRollup.objects.select_for_update().filter(
+                    bucket=bucket, product_id__in=product_ids, bucket_start__in=starts[i:i + _LOOKUP_CHUNK],
+                )
+                for row in rows:
+                    existing[(row.product_id, row.bucket, row.bucket_start)] = row
+
+        updated, created = [], {}
+        for key, stats in groups.items():
+            row = existing.get(key)
+            if row is None:
+                created[key] = MetricRollup(product_id=key[0], bucket=key[1], bucket_start=key[2], **stats)
+            else:
+                _merge_into(row, stats)
+                updated.append(row)
+
+        MetricRollup.objects.bulk_update(updated, _ROLLUP_VALUE_FIELDS, batch_size=_LOOKUP_CHUNK)
+        try:
+            with transaction.atomic():
+                MetricRollup.objects.bulk_create(created.values(), batch_size=_LOOKUP_CHUNK)
+        except IntegrityError:
+            # a concurrent writer created some of these buckets; merge row by row instead
+            for key in created:
+                _upsert(*key, groups[key])
+    return len(groups)
+
+
+def refresh_rollups(product_id, recorded_at):
+    """Recompute, from raw readings, every bucket containing ``recorded_at``."""
+    aggregates = {"count": Count("id")}
+    for field in METRIC_FIELDS:
+        aggregates[f"{field}_count"] = Count(field)
+        aggregates[f"{field}_sum"] = Coalesce(Sum(field), 0.0)
+        aggregates[f"{field}_min"] = Min(field)
+        aggregates[f"{field}_max"] = Max(field)
+
+    with transaction.atomic():
+        for bucket in BUCKETS:
+            start = bucket_start(recorded_at, bucket)
+            stats = EnvironmentalMetric.objects.filter(
+                product_id=product_id,
+                recorded_at__gte=start,
+                recorded_at__lt=bucket_end(start, bucket),
+            ).aggregate(**aggregates)
+            lookup = {"product_id": product_id, "bucket": bucket, "bucket_start": start}
+            if stats["count"]:
+                MetricRollup.objects.update_or_create(defaults=stats, **lookup)
+            else:
+                MetricRollup.objects.filter(**lookup).delete()
+
+
+def rebuild_rollups(product_ids=None, chunk_size=5000):
+    """Drop and rebuild rollups from raw readings (backfill / repair)."""
+    rollups = MetricRollup.objects.all()
+    readings = EnvironmentalMetric.objects.order_by().only("product_id", "recorded_at", *METRIC_FIELDS)
+    if product_ids is not None:
+        rollups = rollups.filter(product_id__in=product_ids)
+        readings = readings.filter(product_id__in=product_ids)
+
+    with transaction.atomic():
+        rollups.delete()
+        batch = []
+        for reading in readings.iterator(chunk_size=chunk_size):
+            batch.append(reading)
+            if len(batch) >= chunk_size:
+                apply_rollups(batch)
+                batch = []
+        if batch:
+            apply_rollups(batch)
+
+
+def timeseries(product, bucket, start=None, end=None):
+    """
+    Bucketed min/max/avg series for ``product`` read from the rollup tables.
+    ``start`` is floored to its bucket so every returned point covers a whole bucket.
+    """
+    rows = MetricRollup.objects.filter(product=product, bucket=bucket).order_by("bucket_start")
+    if start is not None:
+        rows = rows.filter(bucket_start__gte=bucket_start(start, bucket))
+    if end is not None:
+        rows = rows.filter(bucket_start__lt=end)
+
+    points = []
+    for row in rows:
+        point = {"bucket_start": row.bucket_start.isoformat(), "count": row.count}
+        for field in METRIC_FIELDS:
+            n = getattr(row, f"{field}_count")
+            point[field] = {
+                "min": getattr(row, f"{field}_min"),
+                "max": getattr(row, f"{field}_max"),
+                "avg": getattr(row, f"{field}_sum") / n if n else None,
+            }
+        points.append(point)
+    return points
+
+
+def parse_range_bound(raw):
+    """Parse an ISO date or datetime query parameter; returns None when absent."""
+    if not raw:
+        return None
+    value = parse_datetime(raw)
+    if value is None:
+        day = parse_date(raw)
+        if day is None:
+            raise ValueError(f"Invalid date: {raw!r}")
+        value = datetime(day.year, day.month, day.day)
+    return as_utc(value)
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day'), ('week', 'Week')], max_length=4)),
+                ('bucket_start', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('salinity_count', models.PositiveIntegerField(default=0)),
+                ('salinity_sum', models.FloatField(default=0)),
+                ('salinity_min', models.FloatField(blank=True, null=True)),
+                ('salinity_max', models.FloatField(blank=True, null=True)),
+                ('ph_count', models.PositiveIntegerField(default=0)),
+                ('ph_sum', models.FloatField(default=0)),
+                ('ph_min', models.FloatField(blank=True, null=True)),
+                ('ph_max', models.FloatField(blank=True, null=True)),
+                ('pollutant_index_count', models.PositiveIntegerField(default=0)),
+                ('pollutant_index_sum', models.FloatField(default=0)),
+                ('pollutant_index_min', models.FloatField(blank=True, null=True)),
+                ('pollutant_index_max', models.FloatField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['bucket_start'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='environmentalmetric',
+            index=models.Index(fields=['product', '-recorded_at'], name='metric_product_recorded_idx'),
+        ),
+        migrations.AddField(
+            model_name='metricrollup',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='metric_rollups', to='shop.product'),
+        ),
+        migrations.AddConstraint(
+            model_name='metricrollup',
+            constraint=models.UniqueConstraint(fields=('product', 'bucket', 'bucket_start'), name='unique_metric_rollup'),
+        ),
+    ]
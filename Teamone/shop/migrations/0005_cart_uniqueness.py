@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0004_stripe_event'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(condition=models.Q(('checked_out', False)), fields=('user',), name='one_open_cart_per_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'product'), name='unique_cart_product'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0006_stock_reservation'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(fields=['user', 'checked_out', '-created_at'], name='cart_user_checkout_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(condition=models.Q(('stripe_checkout_session__isnull', False)), fields=['stripe_checkout_session'], name='sub_checkout_session_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['user', 'tier', 'active', '-start_date'], name='sub_user_tier_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['user', '-end_date'], name='sub_user_end_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0007_query_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(condition=models.Q(('active', True)), fields=['end_date'], name='sub_active_end_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations, OperationalError
+
+FTS_TABLE = "shop_product_fts"
+
+
+def create_fts_table(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "sqlite":
+        return  # shop.search falls back to its in-process index
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                "name, description, tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3 4')"
+            )
+        except OperationalError:
+            return  # SQLite built without FTS5
+        # ORDER BY rank uses bm25 with name matches weighted 10x description matches
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rank) VALUES ('rank', 'bm25(10.0, 1.0)')")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, description) SELECT id, name, description FROM shop_product"
+        )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0008_subscription_expiry_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
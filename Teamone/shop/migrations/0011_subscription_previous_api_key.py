@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0010_product_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscription',
+            name='previous_api_key',
+            field=models.CharField(blank=True, max_length=512, null=True),
+        ),
+        migrations.AddField(
+            model_name='subscription',
+            name='previous_api_key_expires',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
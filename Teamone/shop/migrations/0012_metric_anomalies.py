@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0011_subscription_previous_api_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricAnomalyState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_recorded_at', models.DateTimeField(blank=True, null=True)),
+                ('last_metric_id', models.BigIntegerField(default=0)),
+                ('state', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='anomaly_state', to='shop.product')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MetricAnomaly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('salinity', 'Salinity'), ('ph', 'pH'), ('pollutant_index', 'Pollutant index')], max_length=20)),
+                ('recorded_at', models.DateTimeField()),
+                ('value', models.FloatField()),
+                ('rolling_mean', models.FloatField()),
+                ('rolling_std', models.FloatField()),
+                ('zscore', models.FloatField(blank=True, null=True)),
+                ('ewma', models.FloatField()),
+                ('ewma_zscore', models.FloatField(blank=True, null=True)),
+                ('detected_at', models.DateTimeField(auto_now_add=True)),
+                ('metric', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='anomalies', to='shop.environmentalmetric')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='anomalies', to='shop.product')),
+            ],
+            options={
+                'ordering': ['-recorded_at'],
+                'indexes': [models.Index(fields=['product', '-recorded_at'], name='anomaly_product_recorded_idx')],
+                'constraints': [models.UniqueConstraint(fields=('metric', 'field'), name='unique_metric_anomaly')],
+            },
+        ),
+    ]
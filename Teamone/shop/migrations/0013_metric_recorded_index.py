@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0012_metric_anomalies'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='environmentalmetric',
+            index=models.Index(fields=['recorded_at', 'id'], name='metric_recorded_idx'),
+        ),
+    ]
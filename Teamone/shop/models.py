@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import DecimalField, ExpressionWrapper, F, Prefetch, Sum
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 from decimal import Decimal
@@ -18,25 +19,81 @@ class Product(models.Model):
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     image = models.ImageField(upload_to="products/", null=True, blank=True)
+    # resized copies of image, see shop.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     stock = models.IntegerField(default=10)
 
     def __str__(self):
         return self.name
 
 
+LINE_AMOUNT_FIELD = DecimalField(max_digits=14, decimal_places=2)
+
+
+class CartQuerySet(models.QuerySet):
+    def with_totals(self):
+        """Annotate each cart with ``annotated_total``, computed by the database."""
+        return self.annotate(
+            annotated_total=Sum(
+                F("items__quantity") * F("items__product__price"),
+                output_field=LINE_AMOUNT_FIELD,
+            )
+        )
+
+    def order_history(self, user):
+        """
+        Checked-out carts for ``user``, newest first, with totals annotated and
+        items/products prefetched so rendering a page costs a fixed number of queries.
+        """
+        items = CartItem.objects.select_related("product").with_subtotals().order_by("id")
+        return (
+            self.filter(user=user, checked_out=True)
+            .with_totals()
+            .prefetch_related(Prefetch("items", queryset=items))
+            .order_by("-created_at", "-id")
+        )
+
+
+class CartItemQuerySet(models.QuerySet):
+    def with_subtotals(self):
+        """Annotate each line with ``annotated_subtotal`` (quantity * product price)."""
+        return self.annotate(
+            annotated_subtotal=ExpressionWrapper(
+                F("quantity") * F("product__price"),
+                output_field=LINE_AMOUNT_FIELD,
+            )
+        )
+
+
 class Cart(models.Model):
     user = models.ForeignKey("shop.User", related_name="carts", on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     checked_out = models.BooleanField(default=False)
 
+    objects = CartQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user"], condition=models.Q(checked_out=False), name="one_open_cart_per_user",
+            ),
+        ]
+        indexes = [
+            # my_orders / dashboard order history
+            models.Index(fields=["user", "checked_out", "-created_at"], name="cart_user_checkout_idx"),
+        ]
+
     def __str__(self):
         return f"Cart {self.id} for {self.user}"
 
     @property
     def total(self):
-       return sum([item.subtotal for item in self.items.all()])
-
+        # use the DB-computed value when the cart came from CartQuerySet.with_totals()
+        if hasattr(self, "annotated_total"):
+            return self.annotated_total or Decimal("0.00")
+        return sum([item.subtotal for item in self.items.all()])
 
 
 class CartItem(models.Model):
@@ -44,14 +101,51 @@ class CartItem(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
 
+    objects = CartItemQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["cart", "product"], name="unique_cart_product"),
+        ]
+
     @property
     def subtotal(self) -> Decimal:
+        if getattr(self, "annotated_subtotal", None) is not None:
+            return self.annotated_subtotal
         return Decimal(self.quantity) * self.product.price
 
     def __str__(self):
         return f"{self.quantity} x {self.product.name}"
 
 
+class StockReservation(models.Model):
+    """
+    Units of a product held for a cart between checkout-session creation and payment.
+    Product.stock is decremented when the hold is placed; see shop.inventory.
+    """
+    STATUS_CHOICES = [
+        ("held", "Held"),
+        ("committed", "Committed"),
+        ("released", "Released"),
+    ]
+
+    cart = models.ForeignKey(Cart, related_name="reservations", on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, related_name="reservations", on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="held")
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "expires_at"], name="reservation_status_exp_idx"),
+            models.Index(fields=["cart", "status"], name="reservation_cart_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} for cart {self.cart_id} ({self.status})"
+
+
 class EnvironmentalMetric(models.Model):
     product = models.ForeignKey(Product, related_name="metrics", on_delete=models.CASCADE)
     recorded_at = models.DateTimeField(default=timezone.now)
@@ -62,6 +156,103 @@ class EnvironmentalMetric(models.Model):
 
     class Meta:
         ordering = ["-recorded_at"]
+        indexes = [
+            models.Index(fields=["product", "-recorded_at"], name="metric_product_recorded_idx"),
+            # admin changelist: date drill-down and newest-first keyset pages across products
+            models.Index(fields=["recorded_at", "id"], name="metric_recorded_idx"),
+        ]
+
+
+class MetricRollup(models.Model):
+    """
+    Pre-aggregated EnvironmentalMetric readings for one product and one time bucket.
+    Maintained incrementally by shop.metrics as readings arrive.
+    """
+    BUCKET_CHOICES = [
+        ("hour", "Hour"),
+        ("day", "Day"),
+        ("week", "Week"),
+    ]
+
+    product = models.ForeignKey(Product, related_name="metric_rollups", on_delete=models.CASCADE)
+    bucket = models.CharField(max_length=4, choices=BUCKET_CHOICES)
+    bucket_start = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    # per-field running aggregates; *_count only counts non-null readings
+    salinity_count = models.PositiveIntegerField(default=0)
+    salinity_sum = models.FloatField(default=0)
+    salinity_min = models.FloatField(null=True, blank=True)
+    salinity_max = models.FloatField(null=True, blank=True)
+    ph_count = models.PositiveIntegerField(default=0)
+    ph_sum = models.FloatField(default=0)
+    ph_min = models.FloatField(null=True, blank=True)
+    ph_max = models.FloatField(null=True, blank=True)
+    pollutant_index_count = models.PositiveIntegerField(default=0)
+    pollutant_index_sum = models.FloatField(default=0)
+    pollutant_index_min = models.FloatField(null=True, blank=True)
+    pollutant_index_max = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["bucket_start"]
+        constraints = [
+            models.UniqueConstraint(fields=["product", "bucket", "bucket_start"], name="unique_metric_rollup"),
+        ]
+
+    def __str__(self):
+        return f"{self.product} {self.bucket} {self.bucket_start:%Y-%m-%d %H:%M} ({self.count})"
+
+
+class MetricAnomaly(models.Model):
+    """
+    A reading whose value for one metric field stood out from that product's recent history,
+    by rolling z-score and/or deviation from the EWMA. Written by shop.anomalies.
+    """
+    FIELD_CHOICES = [
+        ("salinity", "Salinity"),
+        ("ph", "pH"),
+        ("pollutant_index", "Pollutant index"),
+    ]
+
+    product = models.ForeignKey(Product, related_name="anomalies", on_delete=models.CASCADE)
+    metric = models.ForeignKey(EnvironmentalMetric, related_name="anomalies", on_delete=models.CASCADE)
+    field = models.CharField(max_length=20, choices=FIELD_CHOICES)
+    recorded_at = models.DateTimeField()
+    value = models.FloatField()
+    # statistics of the readings before this one
+    rolling_mean = models.FloatField()
+    rolling_std = models.FloatField()
+    zscore = models.FloatField(null=True, blank=True)
+    ewma = models.FloatField()
+    ewma_zscore = models.FloatField(null=True, blank=True)
+    detected_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-recorded_at"]
+        constraints = [
+            models.UniqueConstraint(fields=["metric", "field"], name="unique_metric_anomaly"),
+        ]
+        indexes = [
+            models.Index(fields=["product", "-recorded_at"], name="anomaly_product_recorded_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.product} {self.field}={self.value:g} at {self.recorded_at:%Y-%m-%d %H:%M}"
+
+
+class MetricAnomalyState(models.Model):
+    """
+    Where anomaly detection got to for a product: the last reading processed (the watermark)
+    and the rolling window/EWMA state needed to carry on from it.
+    """
+    product = models.OneToOneField(Product, related_name="anomaly_state", on_delete=models.CASCADE)
+    last_recorded_at = models.DateTimeField(null=True, blank=True)
+    last_metric_id = models.BigIntegerField(default=0)
+    state = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.product} up to {self.last_recorded_at}"
 
 
 class Subscription(models.Model):
@@ -80,6 +271,9 @@ class Subscription(models.Model):
 
     # API token (JWT)
     api_key = models.CharField(max_length=512, blank=True, null=True)
+    # the token api_key replaced at the last key rotation, accepted until previous_api_key_expires
+    previous_api_key = models.CharField(max_length=512, blank=True, null=True)
+    previous_api_key_expires = models.DateTimeField(blank=True, null=True)
 
     # Stripe integration
     order_id = models.UUIDField(default=uuid.uuid4, editable=False)
@@ -95,6 +289,22 @@ class Subscription(models.Model):
         "research": Decimal("200.00"),
     }
 
+    class Meta:
+        indexes = [
+            # webhook lookup by checkout session (most rows have none)
+            models.Index(
+                fields=["stripe_checkout_session"],
+                condition=models.Q(stripe_checkout_session__isnull=False),
+                name="sub_checkout_session_idx",
+            ),
+            # webhook fallback: a user's latest pending subscription for a tier
+            models.Index(fields=["user", "tier", "active", "-start_date"], name="sub_user_tier_active_idx"),
+            # dashboard: a user's latest subscription
+            models.Index(fields=["user", "-end_date"], name="sub_user_end_idx"),
+            # expiry sweep: active subscriptions by end date
+            models.Index(fields=["end_date"], condition=models.Q(active=True), name="sub_active_end_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         # auto-assign price if not set
         if not self.price or self.price == Decimal("0.00"):
@@ -104,4 +314,32 @@ class Subscription(models.Model):
 
     def __str__(self):
         return f"{self.user} - {self.tier} (${self.price}) ({'active' if self.active else 'inactive'})"
-    
\ No newline at end of file
+
+
+class StripeEvent(models.Model):
+    """
+    Ledger of received Stripe webhook events. The unique event_id makes delivery idempotent,
+    and pending rows double as the queue consumed by shop.webhooks.
+    """
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("processed", "Processed"),
+        ("failed", "Failed"),
+    ]
+
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "received_at"], name="stripe_event_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.event_id} ({self.type}, {self.status})"
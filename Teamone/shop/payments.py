@@ -0,0 +1,98 @@
+"""
+Async access to the Stripe API for request handlers.
+
+Checkout sessions are created through a StripeClient backed by aiohttp, so an ASGI worker
+keeps serving other requests during the round trip to Stripe. Each event loop gets its own
+client and connection pool (aiohttp sessions can't be shared across loops); under ASGI that
+is one pool per worker process, reused with keep-alive across requests.
+
+Calls are bounded by ``STRIPE_MAX_CONCURRENCY`` in-flight requests per loop. A call that
+can't get a slot within ``STRIPE_QUEUE_TIMEOUT`` seconds raises PaymentsBusy instead of
+queueing without limit, and each request is limited to ``STRIPE_TIMEOUT`` seconds overall.
+``STRIPE_API_BASE`` points the client elsewhere, e.g. at a local fake server in tests.
+
+The Stripe SDK and aiohttp are imported when the first client is built rather than with this
+module: between them they take a few hundred milliseconds to import, which every worker
+would otherwise pay at startup.
+"""
+import asyncio
+import ssl
+import weakref
+
+from django.conf import settings
+
+
+class PaymentsBusy(Exception):
+    """Too many Stripe calls are already in flight on this worker."""
+
+
+class _LoopState:
+    def __init__(self):
+        self.http_client, self.client = _build_client()
+        self.slots = asyncio.Semaphore(getattr(settings, "STRIPE_MAX_CONCURRENCY", 50))
+
+
+_states = weakref.WeakKeyDictionary()  # event loop -> _LoopState
+
+
+def _build_client():
+    import aiohttp
+    import stripe
+
+    base = getattr(settings, "STRIPE_API_BASE", None)
+    connector = aiohttp.TCPConnector(
+        limit=getattr(settings, "STRIPE_MAX_CONNECTIONS", 20),
+        keepalive_timeout=getattr(settings, "STRIPE_KEEPALIVE_TIMEOUT", 30),
+        ssl=ssl.create_default_context(cafile=stripe.ca_bundle_path),
+    )
+    http_client = stripe.AIOHTTPClient(
+        timeout=aiohttp.ClientTimeout(total=getattr(settings, "STRIPE_TIMEOUT", 10)),
+        connector=connector,
+    )
+    client = stripe.StripeClient(
+        getattr(settings, "STRIPE_SECRET_KEY", ""),
+        http_client=http_client,
+        base_addresses={"api": base} if base else None,
+        max_network_retries=getattr(settings, "STRIPE_MAX_NETWORK_RETRIES", 1),
+    )
+    return http_client, client
+
+
+def _state():
+    loop = asyncio.get_running_loop()
+    state = _states.get(loop)
+    if state is None:
+        state = _states[loop] = _LoopState()
+    return state
+
+
+async def create_checkout_session(pooled=True, **params):
+    """
+    Create a Stripe Checkout session; returns the Session (raises stripe errors as-is).
+
+    Pass ``pooled=False`` when the current event loop only lives for this request (an async
+    view served by WSGI): the call then uses a one-off client that is closed afterwards.
+    """
+    if not pooled:
+        http_client, client = _build_client()
+        try:
+            return await client.v1.checkout.sessions.create_async(params)
+        finally:
+            await http_client.close_async()
+
+    state = _state()
+    try:
+        await asyncio.wait_for(state.slots.acquire(), getattr(settings, "STRIPE_QUEUE_TIMEOUT", 5))
+    except asyncio.TimeoutError:
+        raise PaymentsBusy("Too many payment requests in progress, try again shortly")
+    try:
+        return await state.client.v1.checkout.sessions.create_async(params)
+    finally:
+        state.slots.release()
+
+
+async def close():
+    """Close this loop's connection pool (ASGI lifespan shutdown, tests)."""
+    state = _states.pop(asyncio.get_running_loop(), None)
+    if state is not None:
+        await state.http_client.close_async()
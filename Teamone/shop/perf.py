@@ -0,0 +1,248 @@
+"""
+Opt-in request instrumentation (settings.PERF_METRICS_ENABLED).
+
+PerfMiddleware records, per URL name: wall time, DB query count, DB time, template render
+time and response size into in-process histograms, and logs repeated identical SQL within a
+request (likely N+1) with the view and template line that issued it.
+
+Histograms are kept per thread: a request only ever writes to its own thread's store, so the
+hot path takes no locks. Readers (the Prometheus endpoint) merge all stores on demand. The
+N+1 counter is shared and locked, but only requests that tripped the threshold touch it.
+"""
+import hmac
+import logging
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+# metric name -> (help text, bucket upper bounds)
+METRICS = {
+    "request_duration_seconds": (
+        "Wall time per request.",
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+    ),
+    "db_queries": ("DB queries per request.", (1, 2, 5, 10, 20, 50, 100, 200, 500)),
+    "db_duration_seconds": (
+        "Time spent in DB queries per request.",
+        (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+    ),
+    "template_render_seconds": (
+        "Template render time per request.",
+        (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+    ),
+    "response_bytes": ("Response body size.", (1_000, 10_000, 100_000, 1_000_000, 10_000_000)),
+}
+METRIC_PREFIX = "shop_"
+
+_stores = []
+_stores_lock = threading.Lock()
+_local = threading.local()
+_n_plus_one = Counter()
+_n_plus_one_lock = threading.Lock()
+
+
+def _store():
+    store = getattr(_local, "store", None)
+    if store is None:
+        store = _local.store = {}
+        with _stores_lock:  # once per thread, not per request
+            _stores.append(store)
+    return store
+
+
+def observe(metric, view, value):
+    bounds = METRICS[metric][1]
+    key = (metric, view)
+    store = _store()
+    entry = store.get(key)
+    if entry is None:
+        entry = store[key] = [[0] * (len(bounds) + 1), 0.0, 0]
+    entry[0][bisect_left(bounds, value)] += 1
+    entry[1] += value
+    entry[2] += 1
+
+
+def snapshot():
+    """Merge every thread's histograms: {(metric, view): (bucket_counts, sum, count)}."""
+    merged = {}
+    with _stores_lock:
+        stores = list(_stores)
+    for store in stores:
+        for key, (buckets, total, count) in list(store.items()):
+            current = merged.get(key)
+            if current is None:
+                merged[key] = (list(buckets), total, count)
+            else:
+                merged[key] = ([a + b for a, b in zip(current[0], buckets)], current[1] + total, current[2] + count)
+    return merged
+
+
+def reset():
+    with _stores_lock:
+        for store in _stores:
+            store.clear()
+    with _n_plus_one_lock:
+        _n_plus_one.clear()
+
+
+def render_prometheus():
+    lines = []
+    data = snapshot()
+    for metric, (help_text, bounds) in METRICS.items():
+        name = METRIC_PREFIX + metric
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for (key_metric, view), (buckets, total, count) in sorted(data.items()):
+            if key_metric != metric:
+                continue
+            cumulative = 0
+            for bound, n in zip(list(bounds) + ["+Inf"], buckets):
+                cumulative += n
+                lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{view="{view}"}} {total}')
+            lines.append(f'{name}_count{{view="{view}"}} {count}')
+    name = METRIC_PREFIX + "n_plus_one_total"
+    lines.append(f"# HELP {name} Requests with repeated identical SQL.")
+    lines.append(f"# TYPE {name} counter")
+    with _n_plus_one_lock:
+        n_plus_one = sorted(_n_plus_one.items())
+    for view, n in n_plus_one:
+        lines.append(f'{name}{{view="{view}"}} {n}')
+    return "\n".join(lines) + "\n"
+
+
+# ------------------------------
+# Per-request collection
+# ------------------------------
+
+class _RequestStats:
+    __slots__ = ("queries", "db_time", "template_time", "sql_counts", "flagged")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.sql_counts = Counter()
+        self.flagged = set()
+
+
+_current = ContextVar("shop_perf_request", default=None)
+_template_patch_installed = False
+
+
+def _install_template_timer():
+    """Time top-level template renders (the backend wrapper, so includes aren't double-counted)."""
+    global _template_patch_installed
+    if _template_patch_installed:
+        return
+    from django.template.backends.django import Template
+
+    original = Template.render
+
+    def timed_render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return original(self, context, request)
+        start = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            stats.template_time += time.perf_counter() - start
+
+    Template.render = timed_render
+    _template_patch_installed = True
+
+
+def _template_location():
+    """The template file and line being rendered when the current query ran, if any."""
+    from django.template.base import Node
+
+    frame = sys._getframe(2)
+    while frame is not None:
+        node = frame.f_locals.get("self")
+        if isinstance(node, Node) and getattr(node, "token", None) is not None and node.origin:
+            return f"{node.origin.template_name or node.origin.name}:{node.token.lineno}"
+        frame = frame.f_back
+    return None
+
+
+class PerfMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, "PERF_METRICS_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = getattr(settings, "PERF_DUPLICATE_QUERY_THRESHOLD", 5)
+        _install_template_timer()
+
+    def __call__(self, request):
+        stats = _RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(self._wrap_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        elapsed = time.perf_counter() - start
+
+        match = getattr(request, "resolver_match", None)
+        view = (match.view_name if match else None) or "<unresolved>"
+        observe("request_duration_seconds", view, elapsed)
+        observe("db_queries", view, stats.queries)
+        observe("db_duration_seconds", view, stats.db_time)
+        observe("template_render_seconds", view, stats.template_time)
+        if not response.streaming:
+            observe("response_bytes", view, len(response.content))
+        if stats.flagged:
+            with _n_plus_one_lock:
+                _n_plus_one[view] += 1
+            for sql, location in stats.flagged:
+                logger.warning(
+                    "Possible N+1 in view %s: %d identical queries (template %s): %s",
+                    view, stats.sql_counts[sql], location or "n/a", sql[:200],
+                )
+        return response
+
+    def _wrap_query(self, execute, sql, params, many, context):
+        stats = _current.get()
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if stats is not None:
+                stats.db_time += time.perf_counter() - start
+                stats.queries += 1
+                stats.sql_counts[sql] += 1
+                if stats.sql_counts[sql] == self.threshold:
+                    stats.flagged.add((sql, _template_location()))
+
+
+def _has_metrics_token(request):
+    token = getattr(settings, "PERF_METRICS_TOKEN", "")
+    header = request.META.get("HTTP_AUTHORIZATION", "")
+    if not token or header[:7].lower() != "bearer ":
+        return False
+    return hmac.compare_digest(header[7:].strip().encode(), token.encode())
+
+
+def metrics_view(request):
+    """
+    Prometheus text exposition, for staff users or a scraper sending
+    ``Authorization: Bearer <PERF_METRICS_TOKEN>``.
+    """
+    if not getattr(request.user, "is_staff", False) and not _has_metrics_token(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render_prometheus(), content_type="text/plain; version=0.0.4")
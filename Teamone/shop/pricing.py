@@ -0,0 +1,30 @@
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+
+DEFAULT_TIER_PRICES = {"basic": 10.0, "pro": 50.0, "research": 200.0}
+
+
+def tier_prices() -> dict:
+    """
+    Monthly price per tier. settings.SUBSCRIPTION_TIERS maps each tier either to a price or
+    to a dict with a "price" key (alongside e.g. its "rate_limit").
+    """
+    tier_map = getattr(settings, "SUBSCRIPTION_TIERS", DEFAULT_TIER_PRICES)
+    return {
+        tier: config.get("price", 0.0) if isinstance(config, dict) else config
+        for tier, config in tier_map.items()
+    }
+
+
+def monthly_price_for_tier(tier: str) -> Decimal:
+    """Helper to get monthly price for tier from settings, returns Decimal."""
+    try:
+        monthly = Decimal(str(tier_prices().get(tier, 0.0)))
+    except (InvalidOperation, TypeError):
+        monthly = Decimal("0.0")
+    return monthly
+
+
+def subscription_price(tier: str, months: int) -> Decimal:
+    return (monthly_price_for_tier(tier) * Decimal(months)).quantize(Decimal("0.01"))
@@ -0,0 +1,161 @@
+"""
+Per-subscription API rate limiting.
+
+Quotas come from settings.SUBSCRIPTION_TIERS: a tier's ``"rate_limit"`` entry of
+``{"requests": N, "window": seconds}`` allows N requests per window per subscription.
+Tiers without one are unlimited.
+
+Two stores implement the same ``hit(key, limit, window, now)`` interface:
+
+* MemoryBucketStore: a token bucket per key (capacity N, refilled at N/window per second)
+  held in process memory. Exact and cheap, but each worker process counts separately.
+* CacheBucketStore: a sliding-window counter in the Django cache, built on atomic
+  ``incr`` so all workers share one count (use a shared backend such as Redis or Memcached).
+
+settings.API_RATE_LIMIT_BACKEND picks the store ("memory" or "cache").
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class Decision:
+    __slots__ = ("allowed", "limit", "remaining", "reset", "window")
+
+    def __init__(self, allowed, limit, remaining, reset, window):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = reset  # seconds until the full quota is available again
+        self.window = window
+
+    def headers(self):
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(math.ceil(self.reset)),
+            "RateLimit-Policy": f"{self.limit};w={self.window}",
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.reset)))
+        return headers
+
+
+class MemoryBucketStore:
+    """Token buckets in process memory, LRU-bounded (an evicted bucket starts full again)."""
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()  # key -> [tokens, updated_at]
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, window, now=None):
+        now = time.monotonic() if now is None else now
+        rate = limit / window
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(limit), now]
+                if len(self._buckets) > self.maxsize:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(limit, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            allowed = bucket[0] >= 1
+            if allowed:
+                bucket[0] -= 1
+            tokens = bucket[0]
+        if allowed:
+            reset = (limit - tokens) / rate
+        else:
+            reset = (1 - tokens) / rate  # until the next token
+        return Decision(allowed, limit, int(tokens), reset, window)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucketStore:
+    """
+    Sliding-window counters in a Django cache. The current window's count is incremented
+    atomically; the previous window's count is weighted by how much of it still overlaps.
+    """
+
+    def __init__(self, alias="default", prefix="ratelimit"):
+        self.alias = alias
+        self.prefix = prefix
+
+    def hit(self, key, limit, window, now=None):
+        cache = caches[self.alias]
+        now = time.time() if now is None else now
+        index, offset = divmod(now, window)
+        current_key = f"{self.prefix}:{key}:{int(index)}"
+        previous_key = f"{self.prefix}:{key}:{int(index) - 1}"
+
+        cache.add(current_key, 0, timeout=int(window * 2) + 1)
+        try:
+            current = cache.incr(current_key)
+        except ValueError:  # evicted between add and incr
+            cache.set(current_key, 1, timeout=int(window * 2) + 1)
+            current = 1
+        previous = cache.get(previous_key, 0)
+
+        weight = 1 - offset / window
+        used = previous * weight + current
+        allowed = used <= limit
+        if not allowed:
+            cache.decr(current_key)  # rejected requests don't use up quota
+            used -= 1
+        return Decision(allowed, limit, max(0, int(limit - used)), window - offset, window)
+
+    def clear(self):
+        caches[self.alias].clear()
+
+
+def _build_store():
+    if getattr(settings, "API_RATE_LIMIT_BACKEND", "memory") == "cache":
+        return CacheBucketStore(alias=getattr(settings, "API_RATE_LIMIT_CACHE", "default"))
+    return MemoryBucketStore()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = _build_store()
+    return _store
+
+
+def reset_store():
+    """Forget the configured store (after a settings change, or between tests)."""
+    global _store
+    with _store_lock:
+        _store = None
+
+
+def tier_quota(tier):
+    """(requests, window seconds) for a tier, or None when it is unlimited."""
+    config = getattr(settings, "SUBSCRIPTION_TIERS", {}).get(tier)
+    limit = config.get("rate_limit") if isinstance(config, dict) else None
+    if not limit:
+        return None
+    return limit["requests"], limit["window"]
+
+
+def check(claims):
+    """Count one request against the subscription in ``claims``; None when its tier is unlimited."""
+    quota = tier_quota(claims.get("tier"))
+    if quota is None:
+        return None
+    return get_store().hit(f"sub:{claims.get('sub_id')}", *quota)
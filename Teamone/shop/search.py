@@ -0,0 +1,300 @@
+"""
+Product search over name and description.
+
+On SQLite with FTS5 (the ``shop_product_fts`` table, created by migration 0004) queries run
+against the full-text index, ranked by bm25 with name matches weighted above description
+matches. Elsewhere an in-process inverted index with the same weighting is built from the
+products table on first use.
+
+Both are kept current by the Product save/delete signals. The in-process index also watches
+the catalogue version, so a change made by another process makes it rebuild on the next query.
+
+Search matches products containing every word of the query. Autocomplete matches names only
+and treats the last word as a prefix, so it can run on each keystroke.
+"""
+import heapq
+import math
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+
+from django.db import connection, transaction
+
+from .catalogue import catalogue_version
+from .models import Product
+
+FTS_TABLE = "shop_product_fts"
+NAME_WEIGHT = 10.0  # matches the bm25 weights migration 0004 sets on the FTS table
+MAX_PREFIX_EXPANSIONS = 100
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    return _WORD.findall((text or "").lower())
+
+
+# ------------------------------
+# SQLite FTS5
+# ------------------------------
+
+def fts5_available(conn=connection):
+    if conn.vendor != "sqlite":
+        return False
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        return cursor.fetchone() is not None
+
+
+class Fts5Index:
+    def rebuild(self):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, description) "
+                f"SELECT id, name, description FROM {Product._meta.db_table}"
+            )
+
+    def update(self, product):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product.pk])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, description) VALUES (%s, %s, %s)",
+                [product.pk, product.name, product.description],
+            )
+
+    def remove(self, product_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product_id])
+
+    def search(self, query, limit=20):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        # every match is ranked; ORDER BY rank LIMIT is FTS5's top-N path, which keeps only the
+        # best ``limit`` rows while it scores
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rank LIMIT %s",
+                [" AND ".join(f'"{token}"' for token in tokens), limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def autocomplete(self, prefix, limit=10):
+        tokens = tokenize(prefix)
+        if not tokens:
+            return []
+        terms = [f'name : "{token}"' for token in tokens[:-1]] + [f'name : "{tokens[-1]}"*']
+        # shortest, i.e. closest, names first
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT p.slug, p.name FROM {FTS_TABLE} f JOIN {Product._meta.db_table} p ON p.id = f.rowid "
+                f"WHERE f.{FTS_TABLE} MATCH %s ORDER BY length(p.name), p.name LIMIT %s",
+                [" AND ".join(terms), limit],
+            )
+            return cursor.fetchall()
+
+
+# ------------------------------
+# In-process fallback
+# ------------------------------
+
+class InvertedIndex:
+    """
+    token -> {product_id: weight} postings, where a name occurrence counts NAME_WEIGHT times a
+    description occurrence, scored as sum(idf * log(1 + weight)) over the query words.
+
+    Once a word has been searched for its postings are also kept sorted best-first, so a query
+    walks the rarest word's list from the top and stops as soon as no product further down could
+    make the results. Autocomplete likewise walks each name word's products shortest name first.
+    """
+
+    def __init__(self):
+        self._postings = defaultdict(dict)
+        self._name_postings = defaultdict(set)
+        self._docs = {}  # product_id -> (slug, name, tokens, name tokens)
+        self._name_terms = []  # sorted, for prefix lookups
+        self._ranked = {}  # token -> [(-weight, product_id)], ascending
+        self._by_name = {}  # name token -> [(len(name), name, product_id)], ascending
+        self._lock = threading.RLock()
+        self.version = None
+
+    def rebuild(self):
+        with self._lock:
+            version = catalogue_version()
+            for store in (self._postings, self._name_postings, self._docs, self._ranked, self._by_name):
+                store.clear()
+            rows = Product.objects.order_by().values_list("id", "slug", "name", "description")
+            for row in rows.iterator(chunk_size=5000):
+                self._add(*row, sort_terms=False)
+            self._name_terms = sorted(self._name_postings)
+            self.version = version
+
+    def _ensure_current(self):
+        if self.version != catalogue_version():
+            self.rebuild()
+
+    def _add(self, product_id, slug, name, description, sort_terms=True):
+        name_tokens = set(tokenize(name))
+        weights = Counter(tokenize(description))
+        for token in name_tokens:
+            weights[token] += NAME_WEIGHT
+        for token, weight in weights.items():
+            weight = math.log1p(weight)
+            self._postings[token][product_id] = weight
+            if token in self._ranked:
+                insort(self._ranked[token], (-weight, product_id))
+        for token in name_tokens:
+            if sort_terms and token not in self._name_postings:
+                insort(self._name_terms, token)
+            self._name_postings[token].add(product_id)
+            if token in self._by_name:
+                insort(self._by_name[token], (len(name), name, product_id))
+        self._docs[product_id] = (slug, name, tuple(weights), tuple(name_tokens))
+
+    def _remove(self, product_id):
+        doc = self._docs.pop(product_id, None)
+        if doc is None:
+            return
+        _, name, tokens, name_tokens = doc
+        for token in tokens:
+            postings = self._postings[token]
+            weight = postings.pop(product_id)
+            if not postings:
+                del self._postings[token]
+                self._ranked.pop(token, None)
+            elif token in self._ranked:
+                _discard(self._ranked[token], (-weight, product_id))
+        for token in name_tokens:
+            postings = self._name_postings[token]
+            postings.discard(product_id)
+            if not postings:
+                del self._name_postings[token]
+                self._by_name.pop(token, None)
+                _discard(self._name_terms, token)
+            elif token in self._by_name:
+                _discard(self._by_name[token], (len(name), name, product_id))
+
+    def update(self, product):
+        with self._lock:
+            if self.version is None:
+                return  # not built yet; the first query builds it
+            self._remove(product.pk)
+            self._add(product.pk, product.slug, product.name, product.description)
+            self.version = catalogue_version()
+
+    def remove(self, product_id):
+        with self._lock:
+            if self.version is None:
+                return
+            self._remove(product_id)
+            self.version = catalogue_version()
+
+    def _ranked_postings(self, token):
+        ranked = self._ranked.get(token)
+        if ranked is None:
+            ranked = self._ranked[token] = sorted((-weight, pk) for pk, weight in self._postings[token].items())
+        return ranked
+
+    def _names(self, token):
+        names = self._by_name.get(token)
+        if names is None:
+            docs = self._docs
+            names = self._by_name[token] = sorted(
+                (len(docs[pk][1]), docs[pk][1], pk) for pk in self._name_postings[token]
+            )
+        return names
+
+    def _idf(self, token):
+        return math.log(1 + len(self._docs) / (1 + len(self._postings[token])))
+
+    def search(self, query, limit=20):
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+        with self._lock:
+            self._ensure_current()
+            if not all(token in self._postings for token in tokens):
+                return []
+            # walk the rarest word's postings best-first; the others are only looked up
+            driver, *rest = sorted(tokens, key=lambda token: len(self._postings[token]))
+            driver_idf = self._idf(driver)
+            others = [(self._postings[token], self._idf(token)) for token in rest]
+            # the most a product can still gain from the other words
+            headroom = sum(idf * -self._ranked_postings(token)[0][0] for token, (_, idf) in zip(rest, others))
+
+            top = []  # min-heap of (score, product_id)
+            for neg_weight, product_id in self._ranked_postings(driver):
+                score = -neg_weight * driver_idf
+                if len(top) == limit and score + headroom <= top[0][0]:
+                    break
+                for postings, idf in others:
+                    weight = postings.get(product_id)
+                    if weight is None:
+                        break
+                    score += idf * weight
+                else:
+                    if len(top) < limit:
+                        heapq.heappush(top, (score, product_id))
+                    elif score > top[0][0]:
+                        heapq.heapreplace(top, (score, product_id))
+            return [product_id for _, product_id in sorted(top, reverse=True)]
+
+    def _expand(self, prefix):
+        start = bisect_left(self._name_terms, prefix)
+        terms = []
+        for term in self._name_terms[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+    def autocomplete(self, prefix, limit=10):
+        tokens = tokenize(prefix)
+        if not tokens:
+            return []
+        with self._lock:
+            self._ensure_current()
+            candidates = None
+            for token in tokens[:-1]:
+                matches = self._name_postings.get(token, set())
+                candidates = matches if candidates is None else candidates & matches
+                if not candidates:
+                    return []
+            # shortest, i.e. closest, names first
+            results, seen = [], set()
+            for _, name, product_id in heapq.merge(*(self._names(term) for term in self._expand(tokens[-1]))):
+                if product_id in seen or (candidates is not None and product_id not in candidates):
+                    continue
+                seen.add(product_id)
+                results.append((self._docs[product_id][0], name))
+                if len(results) == limit:
+                    break
+            return results
+
+
+def _discard(items, value):
+    """Remove ``value`` from the sorted list ``items`` if it is there."""
+    index = bisect_left(items, value)
+    if index < len(items) and items[index] == value:
+        del items[index]
+
+
+_fallback = InvertedIndex()
+
+
+def get_index():
+    return Fts5Index() if fts5_available() else _fallback
+
+
+def search_products(query, limit=20):
+    """Products containing every word of ``query``, best match first."""
+    ids = get_index().search(query, limit)
+    products = Product.objects.in_bulk(ids)
+    return [products[product_id] for product_id in ids if product_id in products]
+
+
+def autocomplete(prefix, limit=10):
+    """``(slug, name)`` pairs whose name matches the words typed so far."""
+    return get_index().autocomplete(prefix, limit)
@@ -0,0 +1,103 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import images
+from .api_auth import token_cache
+from .catalogue import invalidate_catalogue, invalidate_product
+from .metrics import apply_rollups, refresh_rollups
+from .dashboard import invalidate_summaries, invalidate_summary
+from .models import Cart, CartItem, EnvironmentalMetric, Product, Subscription
+from .search import get_index as search_index
+from .subscriptions import api_keys_reissued, subscriptions_expired
+
+
+@receiver(pre_save, sender=EnvironmentalMetric)
+def remember_metric_buckets(sender, instance, **kwargs):
+    # an edit may move the reading to another product or time; its old buckets need a refresh too
+    instance._previous_bucket = None
+    if instance.pk is not None and not instance._state.adding:
+        instance._previous_bucket = (
+            EnvironmentalMetric.objects.filter(pk=instance.pk).values_list("product_id", "recorded_at").first()
+        )
+
+
+@receiver(post_save, sender=EnvironmentalMetric)
+def rollup_saved_metric(sender, instance, created, **kwargs):
+    # new readings fold straight into the rollups; edits recompute the affected buckets
+    if created:
+        apply_rollups([instance])
+    else:
+        refresh_rollups(instance.product_id, instance.recorded_at)
+        previous = getattr(instance, "_previous_bucket", None)
+        if previous and previous != (instance.product_id, instance.recorded_at):
+            refresh_rollups(*previous)
+            invalidate_product(previous[0])
+    invalidate_product(instance.product_id)
+
+
+@receiver(post_delete, sender=EnvironmentalMetric)
+def rollup_deleted_metric(sender, instance, **kwargs):
+    refresh_rollups(instance.product_id, instance.recorded_at)
+    invalidate_product(instance.product_id)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_catalogue_pages(sender, instance, **kwargs):
+    invalidate_catalogue()
+    # and again once committed, so nothing loaded from before the commit (a cached page or a
+    # shop.snapshot catalogue) is kept under the new version
+    transaction.on_commit(invalidate_catalogue)
+
+@receiver(post_save, sender=Product)
+def index_saved_product(sender, instance, **kwargs):
+    search_index().update(instance)
+
+@receiver(post_delete, sender=Product)
+def unindex_deleted_product(sender, instance, **kwargs):
+    search_index().remove(instance.pk)
+
+@receiver(post_save, sender=Product)
+def build_image_variants(sender, instance, **kwargs):
+    # a new upload (or new thumbnail settings) gets its thumbnails once the row is committed
+    if not images.variants_are_current(instance):
+        transaction.on_commit(lambda: images.build_variants_on_commit(instance))
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def invalidate_subscription_tokens(sender, instance, **kwargs):
+    # cancellation/re-issue must take effect immediately, not after the cache TTL
+    token_cache.invalidate_subscription(instance.id)
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+@receiver(post_save, sender=Cart)
+@receiver(post_delete, sender=Cart)
+def invalidate_owner_summary(sender, instance, **kwargs):
+    invalidate_summary(instance.user_id)
+
+
+@receiver(post_save, sender=CartItem)
+@receiver(post_delete, sender=CartItem)
+def invalidate_cart_owner_summary(sender, instance, **kwargs):
+    # bulk helpers in shop.carts bypass these signals and invalidate themselves
+    if CartItem.cart.is_cached(instance):
+        user_id = instance.cart.user_id
+    else:
+        user_id = Cart.objects.filter(pk=instance.cart_id).values_list("user_id", flat=True).first()
+    invalidate_summary(user_id)
+
+
+@receiver(subscriptions_expired)
+def invalidate_expired_subscriptions(sender, subscription_ids, user_ids, **kwargs):
+    token_cache.invalidate_subscriptions(subscription_ids)
+    invalidate_summaries(user_ids)
+
+@receiver(api_keys_reissued)
+def invalidate_reissued_key_summaries(sender, subscription_ids, user_ids, **kwargs):
+    # a second rotation inside the grace period retires the previous key; dashboards show the current one
+    token_cache.invalidate_subscriptions(subscription_ids)
+    invalidate_summaries(user_ids)
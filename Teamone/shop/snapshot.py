@@ -0,0 +1,126 @@
+"""
+An immutable in-process copy of the catalogue for hot read paths.
+
+The catalogue is small and read-mostly, so each worker keeps every product as a compact
+``__slots__`` record, indexed by id and by slug, and resolves products without a query. A
+snapshot is never modified: when the catalogue version (see shop.catalogue) moves on, the next
+``get_snapshot()`` loads a new one and swaps it in whole, so readers always see one consistent
+version.
+
+Stock is copied as of the snapshot's version and is for display only; reservations decrement
+it in the database without bumping the version, and shop.inventory remains the arbiter.
+"""
+import threading
+from decimal import Decimal
+
+from django.db.models.fields.files import FieldFile
+
+from .catalogue import catalogue_version
+from .models import Product
+
+_FIELDS = ("id", "slug", "name", "description", "price", "stock", "image", "image_variants", "updated_at")
+
+
+class ProductRecord:
+    """The read-only parts of a Product that pages and line items need, with the price in cents."""
+
+    __slots__ = ("id", "slug", "name", "description", "price_cents", "stock", "image_name", "image_variants", "updated_at")
+
+    def __init__(self, id, slug, name, description, price, stock, image, image_variants, updated_at):
+        self.id = id
+        self.slug = slug
+        self.name = name
+        self.description = description
+        self.price_cents = int(price * 100)
+        self.stock = stock
+        self.image_name = image or ""
+        self.image_variants = image_variants
+        self.updated_at = updated_at
+
+    @classmethod
+    def from_product(cls, product):
+        return cls(product.id, product.slug, product.name, product.description, product.price,
+                   product.stock, product.image.name, product.image_variants, product.updated_at)
+
+    @property
+    def pk(self):
+        return self.id
+
+    @property
+    def price(self):
+        return Decimal(self.price_cents).scaleb(-2)
+
+    @property
+    def image(self):
+        return FieldFile(None, Product._meta.get_field("image"), self.image_name)
+
+    def __repr__(self):
+        return f"<ProductRecord {self.id}: {self.slug}>"
+
+    def __str__(self):
+        return self.name
+
+
+class CatalogueSnapshot:
+    """Every product at one catalogue version, looked up by id or slug."""
+
+    __slots__ = ("version", "_by_id", "_by_slug")
+
+    def __init__(self, version, records):
+        self.version = version
+        self._by_id = {record.id: record for record in records}
+        self._by_slug = {record.slug: record for record in records}
+
+    @classmethod
+    def load(cls, version):
+        rows = Product.objects.order_by().values_list(*_FIELDS)
+        return cls(version, [ProductRecord(*row) for row in rows.iterator(chunk_size=5000)])
+
+    def get(self, product_id):
+        return self._by_id.get(product_id)
+
+    def by_slug(self, slug):
+        return self._by_slug.get(slug)
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __iter__(self):
+        return iter(self._by_id.values())
+
+
+_current = None
+_lock = threading.Lock()
+
+
+def get_snapshot():
+    """The snapshot for the current catalogue version, loading a new one if it has moved on."""
+    global _current
+    # read the version before loading, so a change made during the load triggers another one
+    version = catalogue_version()
+    snapshot = _current
+    if snapshot is None or snapshot.version != version:
+        with _lock:
+            snapshot = _current
+            if snapshot is None or snapshot.version != version:
+                snapshot = _current = CatalogueSnapshot.load(version)
+    return snapshot
+
+
+def resolve(product_ids):
+    """
+    ``{product_id: ProductRecord}`` for the given ids. Ids the snapshot doesn't know (a product
+    created in another worker since this one last checked the version) are read from the database.
+    """
+    snapshot = get_snapshot()
+    records, missing = {}, []
+    for product_id in product_ids:
+        record = snapshot.get(product_id)
+        if record is None:
+            missing.append(product_id)
+        else:
+            records[product_id] = record
+    if missing:
+        for product in Product.objects.filter(id__in=missing):
+            records[product.id] = ProductRecord.from_product(product)
+    return records
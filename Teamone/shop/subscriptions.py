@@ -0,0 +1,101 @@
+"""
+Subscription lifecycle maintenance.
+
+expire_due() deactivates lapsed subscriptions in batches of end_date ranges; every query is a
+range scan on sub_active_end_idx and each batch ends with one UPDATE. Listeners of ``subscriptions_expired``
+drop whatever they cached for those subscriptions (API token claims, dashboard summaries).
+
+reissue_api_keys() re-signs active subscriptions' API keys with the current JWT key after a
+rotation, a batch at a time, and sends ``api_keys_reissued`` per batch.
+"""
+from datetime import timedelta
+
+import jwt
+from django.conf import settings
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .jwt_utils import current_key_id, sign_subscription_claims, subscription_claims
+from .models import Subscription
+
+# sent once per batch with subscription_ids and user_ids
+subscriptions_expired = Signal()
+api_keys_reissued = Signal()
+
+
+def expire_due(now=None, batch_size=5000):
+    """Deactivate subscriptions whose end_date has passed and clear their API keys. Returns the count."""
+    now = now or timezone.now()
+    due = Subscription.objects.filter(active=True)
+    expired = 0
+    while True:
+        with transaction.atomic():
+            # each batch is an end_date range: its upper bound is the batch_size-th due end_date
+            # (index-only lookup), so the UPDATE is a range scan rather than a long IN list
+            cutoff = (
+                due.filter(end_date__lte=now).order_by("end_date")
+                .values_list("end_date", flat=True)[batch_size - 1:batch_size].first()
+            ) or now
+            batch = due.filter(end_date__lte=cutoff)
+            rows = list(batch.values_list("id", "user_id"))
+            if not rows:
+                break
+            count = batch.update(active=False, api_key=None)
+            subscriptions_expired.send(
+                sender=Subscription,
+                subscription_ids=[sub_id for sub_id, _ in rows],
+                user_ids={user_id for _, user_id in rows},
+            )
+        expired += count
+        if cutoff == now:
+            break
+    return expired
+
+
+def _signed_with(token, kid):
+    try:
+        return jwt.get_unverified_header(token).get("kid") == kid
+    except jwt.InvalidTokenError:
+        return False
+
+
+def reissue_api_keys(batch_size=1000, grace=None, executor=None, force=False, now=None):
+    """
+    Re-sign the API key of every active subscription with the current JWT key.
+
+    Batches walk the primary key: one select_related("user") query, signing (spread over
+    ``executor``, a process pool, if given) and one bulk_update each. The replaced key moves to
+    previous_api_key and stays valid for ``grace`` (default JWT_API_ROTATION_GRACE_HOURS); a
+    second rotation within that window retires it early. Keys already signed with the current
+    key are left alone unless ``force``. Returns the number of keys re-issued.
+    """
+    now = now or timezone.now()
+    if grace is None:
+        grace = timedelta(hours=getattr(settings, "JWT_API_ROTATION_GRACE_HOURS", 24))
+    kid = current_key_id()
+    keyed = Subscription.objects.filter(active=True, api_key__isnull=False).select_related("user").order_by("pk")
+    reissued = 0
+    last_pk = 0
+    while True:
+        batch = list(keyed.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        stale = [sub for sub in batch if force or not _signed_with(sub.api_key, kid)]
+        if stale:
+            tokens = sign_subscription_claims([subscription_claims(sub) for sub in stale], executor=executor)
+            for sub, token in zip(stale, tokens):
+                sub.previous_api_key, sub.previous_api_key_expires = sub.api_key, now + grace
+                sub.api_key = token
+            with transaction.atomic():
+                Subscription.objects.bulk_update(stale, ["api_key", "previous_api_key", "previous_api_key_expires"])
+                api_keys_reissued.send(
+                    sender=Subscription,
+                    subscription_ids=[sub.id for sub in stale],
+                    user_ids={sub.user_id for sub in stale},
+                )
+            reissued += len(stale)
+        if len(batch) < batch_size:
+            break
+    return reissued
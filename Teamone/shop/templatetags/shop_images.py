@@ -0,0 +1,27 @@
+from django import template
+
+register = template.Library()
+
+
+@register.inclusion_tag("shop/includes/product_picture.html")
+def product_picture(product, size="medium", sizes="100vw", css_class="", eager=False):
+    """
+    A <picture> for the product's image: WebP and JPEG/PNG srcsets over every built size, with
+    ``size`` as the fallback src. ``sizes`` is the img sizes attribute (the rendered width).
+    Without built variants it falls back to the original upload.
+    """
+    variants = (product.image_variants or {}).get("sizes", {}) if product.image else {}
+    storage = product.image.storage
+    ordered = sorted(variants.values(), key=lambda entry: entry["width"])
+    chosen = variants.get(size) or (ordered[-1] if ordered else None)
+    return {
+        "product": product,
+        "src": storage.url(chosen["src"]) if chosen else (product.image.url if product.image else ""),
+        "srcset": ", ".join(f"{storage.url(e['src'])} {e['width']}w" for e in ordered),
+        "webp_srcset": ", ".join(f"{storage.url(e['webp'])} {e['width']}w" for e in ordered if "webp" in e),
+        "width": chosen["width"] if chosen else None,
+        "height": chosen["height"] if chosen else None,
+        "sizes": sizes,
+        "css_class": css_class,
+        "eager": eager,
+    }
@@ -0,0 +1,31 @@
+"""Fixtures shared by several test modules."""
+from datetime import timedelta
+
+from django.db import OperationalError
+from django.utils import timezone
+
+from shop.jwt_utils import generate_subscription_jwt
+from shop.models import Subscription
+
+# anonymous pages render the "Login with Google" link, which needs a configured app
+GOOGLE_APP = {"google": {"APP": {"client_id": "test", "secret": "test"}}}
+
+
+def make_subscription(user, tier="research", days=30, active=True):
+    sub = Subscription.objects.create(
+        user=user, tier=tier, end_date=timezone.now() + timedelta(days=days), active=active,
+    )
+    sub.api_key = generate_subscription_jwt(sub)
+    sub.save()
+    return sub
+
+
+def retry_if_locked(func, *args):
+    # SQLite's shared-cache test database reports contention as "table is locked"
+    # instead of waiting; the failed statement did not run, so retrying is safe.
+    while True:
+        try:
+            return func(*args)
+        except OperationalError as e:
+            if "locked" not in str(e):
+                raise
@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib import admin
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from shop.admin import EstimatedCountPaginator
+from shop.carts import add_item, get_open_cart
+from shop.models import Cart, CartItem, EnvironmentalMetric, Product, User
+
+START = datetime(2024, 12, 30, tzinfo=dt_timezone.utc)
+
+
+class HighVolumeAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username="admin", email="admin@example.com", password="pw")
+        cls.product = Product.objects.create(name="Unit", slug="unit", price="2.50")
+        # 250 readings, several sharing a timestamp, across a year boundary
+        EnvironmentalMetric.objects.bulk_create([
+            EnvironmentalMetric(product=cls.product, recorded_at=START + timedelta(hours=i // 3), salinity=i)
+            for i in range(250)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.url = reverse("admin:shop_environmentalmetric_changelist")
+
+    def _page(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        sql = [q["sql"] for q in ctx.captured_queries]
+        self.assertFalse([q for q in sql if "COUNT(" in q.upper() or "DISTINCT" in q.upper()], sql)
+        return response, len(sql)
+
+    def test_metric_pages_seek_newest_first_without_counting(self):
+        seen, url, query_counts = [], self.url, set()
+        while url:
+            response, queries = self._page(url)
+            cl = response.context["cl"]
+            seen.extend(m.pk for m in cl.result_list)
+            query_counts.add(queries)
+            url = cl.next_page_url and self.url + cl.next_page_url
+        expected = list(EnvironmentalMetric.objects.order_by("-recorded_at", "-pk").values_list("pk", flat=True))
+        self.assertEqual(seen, expected)
+        # deep pages cost what the first one does
+        self.assertEqual(len(query_counts), 1)
+        self.assertContains(response, "Newest")
+
+    def test_bad_cursor_is_rejected(self):
+        response = self.client.get(self.url, {"cursor": "yesterday_1"})
+        self.assertRedirects(response, f"{self.url}?e=1", fetch_redirect_response=False)
+
+    def test_date_hierarchy_drills_down_by_calendar(self):
+        response, _ = self._page(self.url)
+        self.assertContains(response, "recorded_at__year=2024")
+        self.assertContains(response, "recorded_at__year=2025")
+        response, _ = self._page(f"{self.url}?recorded_at__year=2025&recorded_at__month=1")
+        self.assertContains(response, "recorded_at__day=31")
+        response, _ = self._page(f"{self.url}?recorded_at__year=2024")
+        self.assertEqual({m.recorded_at.year for m in response.context["cl"].result_list}, {2024})
+
+    def test_cart_item_list_costs_the_same_for_more_rows(self):
+        url = reverse("admin:shop_cartitem_changelist")
+        products = [Product.objects.create(name=f"P{i}", slug=f"p{i}", price="1.25") for i in range(6)]
+        users = [User.objects.create_user(username=f"u{i}") for i in range(6)]
+
+        def queries():
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            return response, len(ctx.captured_queries)
+
+        add_item(get_open_cart(users[0]), products[0].id, quantity=2)
+        _, few = queries()
+        for user, product in zip(users[1:], products[1:]):
+            add_item(get_open_cart(user), product.id)
+        response, many = queries()
+        self.assertEqual(few, many)
+        subtotals = {item.pk: item.subtotal for item in response.context["cl"].result_list}
+        self.assertEqual(sorted(subtotals.values()), [Decimal("1.25")] * 5 + [Decimal("2.50")])
+
+    @override_settings(ADMIN_COUNT_LIMIT=100)
+    def test_counts_are_capped_or_estimated(self):
+        self.assertEqual(EstimatedCountPaginator(Cart.objects.order_by("pk"), 10).count, 0)
+        filtered = EstimatedCountPaginator(EnvironmentalMetric.objects.filter(product=self.product), 10)
+        self.assertEqual(filtered.count, 110)  # one page past the capped count
+        self.assertEqual(filtered.count_label, "100+")
+        self.assertEqual(EstimatedCountPaginator(filtered.object_list, 10, page=20).count, 210)
+        self.assertEqual(EstimatedCountPaginator(filtered.object_list, 10, page=25).count, 250)
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+            self.assertEqual(EstimatedCountPaginator(EnvironmentalMetric.objects.all(), 10).count, 250)
+        self.assertEqual(CartItem.objects.count(), 0)
+
+    @override_settings(ADMIN_COUNT_LIMIT=10)
+    def test_pages_past_the_count_limit_are_reachable(self):
+        Product.objects.bulk_create(Product(name=f"Pump {i:02}", slug=f"pump-{i}", price=1) for i in range(30))
+        url = reverse("admin:shop_product_changelist")
+        with mock.patch.object(admin.site._registry[Product], "list_per_page", 5):
+            for query in ({}, {"q": "pump"}):
+                for page in (3, 5, 6):
+                    response = self.client.get(url, {**query, "p": page, "o": "1"})
+                    self.assertEqual(response.status_code, 200, (query, page))
+                    names = [p.name for p in response.context["cl"].result_list]
+                    self.assertEqual(names, [f"Pump {i:02}" for i in range(page * 5 - 5, page * 5)])
+            self.assertContains(self.client.get(url, {"q": "pump", "p": 3}), "15+ products")
@@ -0,0 +1,138 @@
+import io
+import math
+import random
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from shop.anomalies import STD_FLOOR, detect, detection_options, score
+from shop.models import EnvironmentalMetric, MetricAnomaly, MetricAnomalyState, Product
+from shop.tests.helpers import GOOGLE_APP
+
+START = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+OPTIONS = {"window": 20, "min_periods": 8, "zscore_threshold": 4.0, "alpha": 0.2, "ewma_threshold": 4.0}
+
+
+def reference(values, options):
+    """The per-reading loop the vectorised scoring replaces."""
+    window, alpha = options["window"], options["alpha"]
+    results, ewma, ewvar = [], None, 0.0
+    for i, x in enumerate(values):
+        previous = values[max(0, i - window):i]
+        mean = sum(previous) / len(previous) if previous else math.nan
+        std = math.sqrt(sum((v - mean) ** 2 for v in previous) / len(previous)) if previous else math.nan
+        ready = i >= options["min_periods"]
+        z = (x - mean) / max(std, STD_FLOOR * max(abs(mean), 1.0)) if ready else math.nan
+        ewma = x if ewma is None else ewma
+        deviation = x - ewma
+        ewma_z = deviation / max(math.sqrt(ewvar), STD_FLOOR * max(abs(ewma), 1.0)) if ready else math.nan
+        flagged = not math.isnan(z) and abs(z) > options["zscore_threshold"]
+        flagged = flagged and not math.isnan(ewma_z) and abs(ewma_z) > options["ewma_threshold"]
+        results.append((z, ewma, ewma_z, flagged))
+        ewma += alpha * deviation
+        ewvar = (1 - alpha) * (ewvar + alpha * deviation ** 2)
+    return results
+
+
+def series(n, seed=0, spikes=()):
+    rng = random.Random(seed)
+    values = [35 + math.sin(i / 10) + rng.gauss(0, 0.2) for i in range(n)]
+    for i in spikes:
+        values[i] += 8
+    return values
+
+
+class ScoringTests(TestCase):
+    def test_vectorised_scores_match_the_reference_loop_across_chunks(self):
+        values = series(700, spikes=(100, 450, 451))
+        expected = reference(values, OPTIONS)
+
+        state, got = {}, []
+        for begin, end in ((0, 5), (5, 300), (300, 700)):
+            scores, state = score(np.array(values[begin:end]), state, OPTIONS)
+            got.extend(zip(scores["zscore"], scores["ewma"], scores["ewma_zscore"], scores["flagged"]))
+
+        for (z, e, ez, flag), (rz, re, rez, rflag) in zip(got, expected):
+            np.testing.assert_allclose([z, e, ez], [rz, re, rez], rtol=1e-6, atol=1e-9, equal_nan=True)
+            self.assertEqual(bool(flag), rflag)
+        self.assertEqual([i for i, row in enumerate(got) if row[3]], [100, 450])
+        self.assertEqual(state["count"], 700)
+        self.assertEqual(len(state["tail"]), OPTIONS["window"])
+
+    def test_nothing_is_flagged_before_min_periods(self):
+        scores, _ = score(np.array([1.0, 1.0, 50.0, 1.0]), {}, OPTIONS)
+        self.assertFalse(scores["flagged"].any())
+        self.assertTrue(np.isnan(scores["zscore"]).all())
+
+    def test_spike_after_a_flat_history_is_flagged(self):
+        # e.g. a pollutant index sitting at 0: the window and EWMA spreads are both zero
+        scores, _ = score(np.array([0.0] * 30 + [5.0, 0.0]), {}, OPTIONS)
+        self.assertEqual(np.flatnonzero(scores["flagged"]).tolist(), [30])
+        self.assertLess(abs(scores["zscore"][29]), 1e-3)
+
+        _, state = score(np.zeros(30), {}, OPTIONS)
+        scores, _ = score(np.array([5.0]), state, OPTIONS)
+        self.assertLess(scores["std"][0], STD_FLOOR)  # zero, up to rounding
+        self.assertTrue(scores["flagged"][0])
+
+
+@override_settings(**{f"ANOMALY_{key.upper()}": value for key, value in OPTIONS.items()})
+class DetectionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(name="Unit", slug="unit", price=1)
+
+    def _readings(self, values, offset=0, **fields):
+        EnvironmentalMetric.objects.bulk_create([
+            EnvironmentalMetric(product=self.product, recorded_at=START + timedelta(hours=offset + i), salinity=v, **fields)
+            for i, v in enumerate(values)
+        ])
+
+    def _flagged(self):
+        return list(MetricAnomaly.objects.filter(field="salinity").order_by("recorded_at").values_list("recorded_at", flat=True))
+
+    def test_detect_stores_anomalies_and_resumes_from_the_watermark(self):
+        self.assertEqual(detection_options()["window"], OPTIONS["window"])
+        values = series(400, spikes=(150, 350))
+        self._readings(values[:300], ph=7.0)
+        self.assertEqual(detect(self.product.id, chunk_size=64), (300, 1))
+        anomaly = MetricAnomaly.objects.get()
+        self.assertEqual((anomaly.field, anomaly.value), ("salinity", values[150]))
+        self.assertGreater(anomaly.zscore, OPTIONS["zscore_threshold"])
+        # a constant ph is never flagged (zero deviation)
+        self.assertFalse(MetricAnomaly.objects.filter(field="ph").exists())
+
+        self._readings(values[300:], offset=300)  # ph missing from here on
+        self.assertEqual(detect(self.product.id, chunk_size=64), (100, 1))
+        self.assertEqual(detect(self.product.id), (0, 0))
+        incremental = self._flagged()
+        self.assertEqual(incremental, [START + timedelta(hours=150), START + timedelta(hours=350)])
+
+        # a full run scores the same readings the same way
+        self.assertEqual(detect(self.product.id, full=True), (400, 2))
+        self.assertEqual(self._flagged(), incremental)
+        state = MetricAnomalyState.objects.get(product=self.product)
+        self.assertEqual(state.last_recorded_at, START + timedelta(hours=399))
+        self.assertEqual(state.state["ph"]["count"], 300)
+
+    @override_settings(SOCIALACCOUNT_PROVIDERS=GOOGLE_APP)
+    def test_detail_page_highlights_anomalies(self):
+        self._readings(series(60, spikes=(59,)))
+        url = reverse("product_detail", args=["unit"])
+        self.assertNotContains(self.client.get(url), "Unusual Readings")
+        detect(self.product.id)
+        response = self.client.get(url)
+        self.assertContains(response, "Unusual Readings")
+        self.assertContains(response, 'class="table-warning"', count=1)
+
+    def test_detect_anomalies_command(self):
+        self._readings(series(60, spikes=(40,)))
+        out = io.StringIO()
+        call_command("detect_anomalies", stdout=out)
+        self.assertRegex(out.getvalue(), r"Scored 60 readings of 1 products in .* rows/s\); 1 anomalies found\.")
+        out = io.StringIO()
+        call_command("detect_anomalies", "--product", "unit", "--full", stdout=out)
+        self.assertIn("1 anomalies found", out.getvalue())
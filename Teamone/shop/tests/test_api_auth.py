@@ -0,0 +1,87 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from shop.api_auth import TokenCache, token_cache
+from shop.models import Product, User
+from shop.tests.helpers import make_subscription
+
+
+class ApiKeyAuthTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="api", email="api@example.com", password="pw")
+        Product.objects.create(name="Unit", slug="unit", price=1)
+
+    def setUp(self):
+        token_cache.clear()
+        self.sub = make_subscription(self.user)
+        self.url = reverse("metrics_timeseries", args=["unit"])
+
+    def _get(self, token, **headers):
+        return self.client.get(self.url, HTTP_AUTHORIZATION=f"Bearer {token}", **headers)
+
+    def test_missing_and_invalid_keys_are_rejected(self):
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+        self.assertEqual(self._get("not-a-jwt").status_code, 401)
+
+    def test_expired_key_is_rejected(self):
+        expired = make_subscription(self.user, days=-1)
+        response = self._get(expired.api_key)
+        self.assertEqual(response.status_code, 401)
+        self.assertIn("expired", response.json()["error"].lower())
+
+    def test_x_api_key_header_is_accepted(self):
+        response = self.client.get(self.url, HTTP_X_API_KEY=self.sub.api_key)
+        self.assertEqual(response.status_code, 200)
+
+    def test_warm_cache_skips_subscription_lookup(self):
+        self.assertEqual(self._get(self.sub.api_key).status_code, 200)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self._get(self.sub.api_key).status_code, 200)
+        self.assertFalse(any("shop_subscription" in q["sql"] for q in ctx.captured_queries))
+
+    def test_cancellation_revokes_cached_key_immediately(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self._get(self.sub.api_key).status_code, 200)
+        self.client.get(reverse("cancel_subscription", args=[self.sub.id]))
+        self.assertEqual(self._get(self.sub.api_key).status_code, 401)
+
+
+class TokenCacheTests(TestCase):
+    def test_lru_eviction_and_ttl(self):
+        cache = TokenCache(maxsize=2, ttl=60)
+        cache.set("a", {"sub_id": "1", "exp": 2**40})
+        cache.set("b", {"sub_id": "2", "exp": 2**40})
+        cache.get("a")
+        cache.set("c", {"sub_id": "3", "exp": 2**40})
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+
+        cache.set("old", {"sub_id": "4", "exp": 1})
+        self.assertIsNone(cache.get("old"))
+
+    def test_invalidate_subscription(self):
+        cache = TokenCache()
+        cache.set("a", {"sub_id": "7", "exp": 2**40})
+        cache.set("b", {"sub_id": "7", "exp": 2**40})
+        cache.invalidate_subscription(7)
+        self.assertEqual(len(cache), 0)
+
+    def test_invalidation_reaches_other_processes(self):
+        # two instances stand in for two workers sharing the default cache
+        worker_a, worker_b = TokenCache(), TokenCache()
+        worker_a.set("a", {"sub_id": "7", "exp": 2**40})
+        worker_b.set("a", {"sub_id": "7", "exp": 2**40})
+        worker_b.set("b", {"sub_id": "8", "exp": 2**40})
+        worker_a.invalidate_subscription(7)
+        self.assertIsNone(worker_b.get("a"))
+        self.assertIsNotNone(worker_b.get("b"))
+
+    def test_revocation_during_verification_leaves_entry_stale(self):
+        cache = TokenCache()
+        version = cache.version("7")
+        cache.invalidate_subscription(7)
+        cache.set("a", {"sub_id": "7", "exp": 2**40}, version)
+        self.assertIsNone(cache.get("a"))
@@ -0,0 +1,108 @@
+import json
+import threading
+
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from shop.carts import add_item, get_open_cart
+from shop.models import Cart, CartItem, Product, User
+from shop.tests.helpers import retry_if_locked
+
+
+class CartConstraintTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="shopper", password="pw")
+        cls.product = Product.objects.create(name="Pump", slug="pump", price=5)
+
+    def test_one_open_cart_per_user(self):
+        Cart.objects.create(user=self.user)
+        Cart.objects.create(user=self.user, checked_out=True)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Cart.objects.create(user=self.user)
+
+    def test_one_line_per_product(self):
+        cart = get_open_cart(self.user)
+        add_item(cart, self.product.id)
+        add_item(cart, self.product.id, quantity=2)
+        self.assertEqual(CartItem.objects.get(cart=cart).quantity, 3)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CartItem.objects.create(cart=cart, product=self.product)
+
+
+class CartApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="shopper", password="pw")
+        cls.pump = Product.objects.create(name="Pump", slug="pump", price="5.00")
+        cls.filter = Product.objects.create(name="Filter", slug="filter", price="2.50")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _put(self, items):
+        return self.client.post(reverse("cart_api"), json.dumps({"items": items}), content_type="application/json")
+
+    def test_bulk_set_quantities(self):
+        add_item(get_open_cart(self.user), self.pump.id)
+        data = self._put([
+            {"product_id": self.pump.id, "quantity": 4},
+            {"product_id": self.filter.id, "quantity": 2},
+        ]).json()
+        self.assertEqual([(i["product_id"], i["quantity"]) for i in data["items"]], [(self.pump.id, 4), (self.filter.id, 2)])
+        self.assertEqual(data["total"], "25.00")
+
+        data = self._put([{"product_id": self.pump.id, "quantity": 0}]).json()
+        self.assertEqual([i["product_id"] for i in data["items"]], [self.filter.id])
+        self.assertEqual(self.client.get(reverse("cart_api")).json()["total"], "5.00")
+
+    def test_invalid_payloads(self):
+        self.assertEqual(self._put([{"product_id": 999, "quantity": 1}]).status_code, 400)
+        self.assertEqual(self._put([{"product_id": self.pump.id, "quantity": -1}]).status_code, 400)
+        self.assertEqual(self._put([{"quantity": 1}]).status_code, 400)
+
+    def test_non_integer_quantities_are_rejected(self):
+        for qty in (1.9, 2.0, "2", True, None):
+            with self.subTest(qty=qty):
+                self.assertEqual(self._put([{"product_id": self.pump.id, "quantity": qty}]).status_code, 400)
+        self.assertEqual(self.client.get(reverse("cart_api")).json()["items"], [])
+
+    def test_non_integer_product_ids_are_rejected(self):
+        for product_id in (self.pump.id + 0.9, float(self.pump.id), str(self.pump.id), "abc", None, True, [self.pump.id]):
+            with self.subTest(product_id=product_id):
+                self.assertEqual(self._put([{"product_id": product_id, "quantity": 1}]).status_code, 400)
+        self.assertEqual(self.client.get(reverse("cart_api")).json()["items"], [])
+
+
+class ConcurrentAddToCartTests(TransactionTestCase):
+    threads = 8
+    adds_per_thread = 25
+
+    def test_no_lost_updates(self):
+        user = User.objects.create_user(username="clicker", password="pw")
+        product = Product.objects.create(name="Pump", slug="pump", price=5)
+        barrier = threading.Barrier(self.threads)
+        errors = []
+
+        def hammer():
+            try:
+                barrier.wait()
+                for _ in range(self.adds_per_thread):
+                    cart = retry_if_locked(get_open_cart, user)
+                    retry_if_locked(add_item, cart, product.id)
+            except Exception as e:  # surfaced below; a thread can't fail the test directly
+                errors.append(e)
+            finally:
+                close_old_connections()
+                connection.close()
+
+        workers = [threading.Thread(target=hammer) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Cart.objects.filter(user=user, checked_out=False).count(), 1)
+        self.assertEqual(CartItem.objects.get(cart__user=user).quantity, self.threads * self.adds_per_thread)
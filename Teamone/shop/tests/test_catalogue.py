@@ -0,0 +1,118 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import connection
+from django.template import engines
+from django.template.loaders import cached
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from shop.catalogue import invalidate_product
+from shop.models import EnvironmentalMetric, Product, User
+from shop.tests.helpers import GOOGLE_APP
+
+
+@override_settings(SOCIALACCOUNT_PROVIDERS=GOOGLE_APP)
+class CataloguePageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(name="AquaPure", slug="aquapure", price=10)
+
+    def setUp(self):
+        cache.clear()
+        self.list_url = reverse("product_list")
+        self.detail_url = reverse("product_detail", args=[self.product.slug])
+
+    def test_list_is_served_from_cache(self):
+        first = self.client.get(self.list_url)
+        self.assertContains(first, "AquaPure")
+        self.assertIn("ETag", first)
+        self.assertIn("Last-Modified", first)
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get(self.list_url)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_conditional_get_returns_304(self):
+        etag = self.client.get(self.detail_url)["ETag"]
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        last_modified = self.client.get(self.list_url)["Last-Modified"]
+        self.assertEqual(self.client.get(self.list_url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    def test_product_save_invalidates_pages(self):
+        etag = self.client.get(self.list_url)["ETag"]
+        self.client.get(self.detail_url)
+        self.product.name = "AquaPure Max"
+        self.product.save()
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "AquaPure Max")
+        self.assertContains(self.client.get(self.detail_url), "AquaPure Max")
+
+    def test_metric_save_and_delete_invalidate_detail(self):
+        self.client.get(self.detail_url)
+        metric = EnvironmentalMetric.objects.create(
+            product=self.product, recorded_at=timezone.now() - timedelta(days=400), notes="backdated reading"
+        )
+        self.assertContains(self.client.get(self.detail_url), "backdated reading")
+        metric.delete()
+        self.assertNotContains(self.client.get(self.detail_url), "backdated reading")
+
+    def test_unknown_slug_is_404(self):
+        self.assertEqual(self.client.get(reverse("product_detail", args=["nope"])).status_code, 404)
+
+
+@override_settings(SOCIALACCOUNT_PROVIDERS=GOOGLE_APP)
+class FragmentCacheTests(TestCase):
+    """Signed-in pages aren't cached whole, but their product grid, cards and metrics table are."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(name="AquaPure", slug="aquapure", price=10)
+        cls.user = User.objects.create(username="shopper")
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.list_url = reverse("product_list")
+        self.detail_url = reverse("product_detail", args=[self.product.slug])
+
+    def test_templates_come_from_the_cached_loader(self):
+        loader = engines["django"].engine.template_loaders[0]
+        self.assertIsInstance(loader, cached.Loader)
+
+    def test_grid_fragment_skips_the_product_query(self):
+        self.assertContains(self.client.get(self.list_url), "AquaPure")
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertContains(self.client.get(self.list_url), "AquaPure")
+        self.assertFalse([q for q in ctx.captured_queries if 'ORDER BY "shop_product"."created_at"' in q["sql"]])
+
+    def test_product_changes_change_the_fragment_keys(self):
+        self.client.get(self.list_url)
+        card_key = make_template_fragment_key("product_card", [self.product.id, self.product.updated_at.timestamp()])
+        self.assertIsNotNone(cache.get(card_key))
+
+        Product.objects.create(name="BrineBuster", slug="brinebuster", price=20)
+        self.assertContains(self.client.get(self.list_url), "BrineBuster")
+
+        self.product.name = "AquaPure Max"
+        self.product.save()
+        self.assertContains(self.client.get(self.list_url), "AquaPure Max")
+
+        Product.objects.filter(slug="brinebuster").delete()
+        self.assertNotContains(self.client.get(self.list_url), "BrineBuster")
+
+    def test_metrics_table_follows_the_product_version(self):
+        metric = EnvironmentalMetric.objects.create(product=self.product, recorded_at=timezone.now(), notes="first reading")
+        self.assertContains(self.client.get(self.detail_url), "first reading")
+        # a queryset update skips the signals, so the fragment is still current as far as it knows
+        EnvironmentalMetric.objects.filter(pk=metric.pk).update(notes="edited reading")
+        self.assertContains(self.client.get(self.detail_url), "first reading")
+        invalidate_product(self.product.id)
+        self.assertContains(self.client.get(self.detail_url), "edited reading")
@@ -0,0 +1,84 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from shop.carts import add_item, get_open_cart, set_quantities
+from shop.models import Cart, CartItem, Product, Subscription, User
+
+
+@override_settings(DASHBOARD_RECENT_ORDERS=3)
+class DashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="diver")
+        cls.pump = Product.objects.create(name="Pump", slug="pump", price=Decimal("12.50"))
+        cls.filter = Product.objects.create(name="Filter", slug="filter", price=Decimal("3.25"))
+        for _ in range(6):
+            order = Cart.objects.create(user=cls.user, checked_out=True)
+            CartItem.objects.create(cart=order, product=cls.pump, quantity=1)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def _get(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def test_summary_and_recent_orders(self):
+        Subscription.objects.create(
+            user=self.user, tier="pro", active=True, api_key="tok", end_date=timezone.now() + timedelta(days=30),
+        )
+        cart = get_open_cart(self.user)
+        add_item(cart, self.pump.id, 2)
+        add_item(cart, self.filter.id, 1)
+
+        response, _ = self._get()
+        self.assertEqual(response.context["active_tier"], "pro")
+        self.assertEqual(response.context["api_token"], "tok")
+        self.assertEqual(response.context["cart_count"], 3)
+        self.assertEqual(response.context["cart_total"], Decimal("28.25"))
+        self.assertEqual(len(response.context["orders"]), 3)
+
+    def test_repeat_loads_use_the_cached_summary(self):
+        _, cold = self._get()
+        _, warm = self._get()
+        self.assertLess(warm, cold)
+        for _ in range(10):
+            order = Cart.objects.create(user=self.user, checked_out=True)
+            CartItem.objects.create(cart=order, product=self.filter, quantity=1)
+        self._get()  # new orders invalidate the summary
+        _, later = self._get()
+        self.assertEqual(later, warm)
+
+    def test_summary_is_invalidated_by_cart_and_subscription_changes(self):
+        cart = get_open_cart(self.user)
+        self.assertEqual(self._get()[0].context["cart_count"], 0)
+
+        add_item(cart, self.pump.id)
+        self.assertEqual(self._get()[0].context["cart_count"], 1)
+        set_quantities(cart, {self.pump.id: 4})
+        self.assertEqual(self._get()[0].context["cart_count"], 4)
+        self.client.get(reverse("remove_from_cart", args=[cart.items.get().id]))
+        self.assertEqual(self._get()[0].context["cart_count"], 0)
+
+        sub = Subscription.objects.create(user=self.user, tier="basic", end_date=timezone.now() + timedelta(days=30))
+        self.assertIsNone(self._get()[0].context["active_tier"])
+        sub.active = True
+        sub.save()
+        self.assertEqual(self._get()[0].context["active_tier"], "basic")
+
+    def test_price_change_refreshes_cart_total(self):
+        add_item(get_open_cart(self.user), self.pump.id)
+        self.assertEqual(self._get()[0].context["cart_total"], Decimal("12.50"))
+        self.pump.price = Decimal("20.00")
+        self.pump.save()
+        self.assertEqual(self._get()[0].context["cart_total"], Decimal("20.00"))
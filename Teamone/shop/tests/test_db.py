@@ -0,0 +1,63 @@
+import os
+import runpy
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, TestCase
+
+SETTINGS_FILE = Path(__file__).resolve().parents[2] / "Teamone" / "settings.py"
+
+
+def load_settings(**env):
+    with mock.patch.dict(os.environ, env):
+        return runpy.run_path(str(SETTINGS_FILE))
+
+
+class DatabaseProfileTests(SimpleTestCase):
+    def test_sqlite_is_the_default(self):
+        database = load_settings(DATABASE_CONN_MAX_AGE="30")["DATABASES"]["default"]
+        self.assertEqual(database["ENGINE"], "django.db.backends.sqlite3")
+        self.assertEqual(database["CONN_MAX_AGE"], 30)
+        self.assertTrue(database["CONN_HEALTH_CHECKS"])
+        self.assertEqual(database["OPTIONS"]["transaction_mode"], "IMMEDIATE")
+
+    def test_connections_are_not_persistent_by_default(self):
+        # persistent connections are only safe under WSGI; see the settings comment
+        self.assertEqual(load_settings()["DATABASES"]["default"]["CONN_MAX_AGE"], 0)
+
+    def test_postgres_profile(self):
+        database = load_settings(
+            DATABASE_PROFILE="postgres", DATABASE_NAME="shop", DATABASE_DISABLE_SERVER_SIDE_CURSORS="1",
+        )["DATABASES"]["default"]
+        self.assertEqual(database["ENGINE"], "django.db.backends.postgresql")
+        self.assertEqual(database["NAME"], "shop")
+        self.assertTrue(database["DISABLE_SERVER_SIDE_CURSORS"])
+
+    def test_unknown_profile_is_rejected(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, "DATABASE_PROFILE must be one of sqlite, postgres"):
+            load_settings(DATABASE_PROFILE="oracle")
+
+
+class SqlitePragmaTests(TestCase):
+    def _pragma(self, conn, name):
+        with conn.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied_to_new_connections(self):
+        with tempfile.TemporaryDirectory() as directory:
+            conn = DatabaseWrapper({**connection.settings_dict, "NAME": os.path.join(directory, "shop.sqlite3")})
+            try:
+                self.assertEqual(self._pragma(conn, "journal_mode"), "wal")
+                self.assertEqual(self._pragma(conn, "synchronous"), 1)  # NORMAL
+                self.assertEqual(self._pragma(conn, "busy_timeout"), 20000)
+                self.assertEqual(self._pragma(conn, "mmap_size"), 256 * 1024 * 1024)
+            finally:
+                conn.close()
+
+    def test_test_database_connection_is_tuned_too(self):
+        self.assertEqual(self._pragma(connection, "busy_timeout"), 20000)
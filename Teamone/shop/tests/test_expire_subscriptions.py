@@ -0,0 +1,57 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from shop.api_auth import token_cache
+from shop.dashboard import get_summary
+from shop.models import Subscription, User
+from shop.subscriptions import expire_due, subscriptions_expired
+
+
+class ExpireSubscriptionsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="lapsed")
+        now = timezone.now()
+        Subscription.objects.bulk_create(
+            [Subscription(user=cls.user, tier="basic", active=True, api_key=f"k{i}", end_date=now - timedelta(hours=i + 1))
+             for i in range(7)]
+            + [Subscription(user=cls.user, tier="pro", active=True, api_key="live", end_date=now + timedelta(days=1))]
+        )
+
+    def test_expires_due_subscriptions_in_batches(self):
+        batches = []
+
+        def record(sender, subscription_ids, user_ids, **kwargs):
+            batches.append(len(subscription_ids))
+
+        subscriptions_expired.connect(record)
+        self.addCleanup(subscriptions_expired.disconnect, record)
+
+        self.assertEqual(expire_due(batch_size=3), 7)
+        self.assertEqual(batches, [3, 3, 1])
+        live = Subscription.objects.get(active=True)
+        self.assertEqual(live.api_key, "live")
+        self.assertFalse(Subscription.objects.filter(active=False, api_key__isnull=False).exists())
+        self.assertEqual(expire_due(), 0)
+
+    def test_expiry_invalidates_cached_tokens_and_summaries(self):
+        cache.clear()
+        token_cache.clear()
+        sub = Subscription.objects.filter(active=True, end_date__lte=timezone.now()).first()
+        token_cache.set(sub.api_key, {"sub_id": str(sub.id), "exp": (timezone.now() + timedelta(days=1)).timestamp()})
+        self.assertEqual(get_summary(self.user)["active_tier"], "pro")
+        self.assertEqual(len([s for s in get_summary(self.user)["subscriptions"] if s.active]), 8)
+
+        expire_due()
+        self.assertIsNone(token_cache.get(sub.api_key))
+        self.assertEqual(len([s for s in get_summary(self.user)["subscriptions"] if s.active]), 1)
+
+    def test_command(self):
+        out = StringIO()
+        call_command("expire_subscriptions", "--batch-size", "2", stdout=out)
+        self.assertIn("Expired 7 subscriptions", out.getvalue())
@@ -0,0 +1,63 @@
+import csv
+import io
+from datetime import datetime, timedelta, timezone
+
+from django.test import TestCase
+from django.urls import reverse
+
+from shop.exports import read_columnar
+from shop.models import EnvironmentalMetric, Product, User
+from shop.tests.helpers import make_subscription
+
+START = datetime(2025, 8, 1, tzinfo=timezone.utc)
+
+
+class MetricsExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="researcher", password="pw")
+        cls.product = Product.objects.create(name="Unit", slug="unit", price=1)
+        EnvironmentalMetric.objects.bulk_create([
+            EnvironmentalMetric(
+                product=cls.product,
+                recorded_at=START + timedelta(hours=i),
+                salinity=None if i == 1 else i / 10,
+                ph=7.0,
+                pollutant_index=float(i),
+                notes='a, quoted "note"' if i == 0 else "",
+            )
+            for i in range(5)
+        ])
+
+    def setUp(self):
+        self.url = reverse("metrics_export", args=[self.product.slug])
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {make_subscription(self.user).api_key}"}
+
+    def _body(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content)
+
+    def test_csv_export(self):
+        body = self._body(self.client.get(self.url, **self.auth))
+        rows = list(csv.DictReader(io.StringIO(body.decode("utf-8"))))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]["notes"], 'a, quoted "note"')
+        self.assertEqual(rows[1]["salinity"], "")
+        self.assertEqual(rows[4]["pollutant_index"], "4.0")
+
+    def test_columnar_export_with_range(self):
+        response = self.client.get(
+            self.url, {"format": "bwm", "start": "2025-08-01T01:00:00Z", "end": "2025-08-01T03:00:00Z"}, **self.auth
+        )
+        columns = read_columnar(io.BytesIO(self._body(response)))
+        self.assertEqual(columns["salinity"], [None, 0.2])
+        self.assertEqual(columns["pollutant_index"], [1.0, 2.0])
+        first = START + timedelta(hours=1)
+        self.assertEqual(columns["recorded_at"][0], int(first.timestamp() * 1_000_000))
+
+    def test_export_requires_research_tier(self):
+        basic = make_subscription(self.user, tier="basic")
+        response = self.client.get(self.url, HTTP_AUTHORIZATION=f"Bearer {basic.api_key}")
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.client.get(self.url, {"format": "xlsx"}, **self.auth).status_code, 400)
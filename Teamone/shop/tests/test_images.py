@@ -0,0 +1,129 @@
+import io
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+from PIL import Image
+
+from shop import images
+from shop.models import Product
+from shop.views import media_thumbnail
+
+SIZES = {"small": 100, "large": 400}
+
+
+def image_upload(name="pump.jpg", size=(1600, 900), mode="RGB", fmt="JPEG"):
+    buffer = io.BytesIO()
+    Image.new(mode, size, (10, 120, 200, 128)[:len(mode)]).save(buffer, fmt)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@override_settings(THUMBNAIL_SIZES=SIZES)
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def _product(self, slug="pump", **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(name=slug.title(), slug=slug, price=Decimal("10"), **kwargs)
+        product.refresh_from_db()
+        return product
+
+    def _open(self, product, size, key):
+        with product.image.storage.open(product.image_variants["sizes"][size][key]) as f:
+            return Image.open(io.BytesIO(f.read()))
+
+    def test_upload_builds_bounded_jpeg_and_webp_variants(self):
+        product = self._product(image=image_upload())
+        variants = product.image_variants
+        self.assertEqual(variants["source"], product.image.name)
+        self.assertEqual(
+            {name: (v["width"], v["height"]) for name, v in variants["sizes"].items()},
+            {"small": (100, 56), "large": (400, 225)},
+        )
+        large = self._open(product, "large", "src")
+        self.assertEqual((large.format, large.size), ("JPEG", (400, 225)))
+        self.assertEqual(self._open(product, "small", "webp").format, "WEBP")
+        # content-hashed names
+        self.assertIn(variants["digest"], variants["sizes"]["small"]["src"])
+
+    def test_transparent_images_keep_alpha_and_small_images_are_not_upscaled(self):
+        product = self._product(image=image_upload("logo.png", (150, 60), "RGBA", "PNG"))
+        sizes = product.image_variants["sizes"]
+        self.assertEqual((sizes["large"]["width"], sizes["large"]["height"]), (150, 60))
+        self.assertTrue(sizes["large"]["src"].endswith(".png"))
+        self.assertEqual(self._open(product, "large", "webp").mode, "RGBA")
+
+    def test_same_image_and_options_give_the_same_names(self):
+        first = self._product("first", image=image_upload())
+        second = self._product("second", image=image_upload())
+        self.assertEqual(first.image_variants["sizes"], second.image_variants["sizes"])
+
+        with override_settings(THUMBNAIL_QUALITY=50):
+            self.assertFalse(images.variants_are_current(first))
+            images.build_variants(first)
+        self.assertNotEqual(first.image_variants["digest"], second.image_variants["digest"])
+
+    def test_unreadable_upload_keeps_the_original(self):
+        with self.assertLogs("shop.images", "WARNING"):
+            product = self._product(image=SimpleUploadedFile("broken.jpg", b"not an image"))
+        self.assertEqual(product.image_variants, {})
+        html = Template("{% load shop_images %}{% product_picture product %}").render(Context({"product": product}))
+        self.assertIn(f'src="{product.image.url}"', html)
+
+    def test_decompression_bombs_are_skipped(self):
+        # 1600x900 is more than twice the limit, so Pillow refuses to open it
+        with patch.object(Image, "MAX_IMAGE_PIXELS", 500_000):
+            with self.assertLogs("shop.images", "WARNING"):
+                product = self._product(image=image_upload())
+            self.assertEqual(product.image_variants, {})
+
+            out, err = io.StringIO(), io.StringIO()
+            call_command("build_thumbnails", "--workers", "1", stdout=out, stderr=err)
+        self.assertIn("Built thumbnails for 0 products (0 already current, 0 failed, 1 skipped)", out.getvalue())
+        self.assertIn("pump: skipped", err.getvalue())
+
+    def test_picture_tag(self):
+        product = self._product(image=image_upload())
+        html = Template('{% load shop_images %}{% product_picture product "small" sizes="50vw" %}').render(
+            Context({"product": product})
+        )
+        small, large = (product.image_variants["sizes"][s] for s in ("small", "large"))
+        self.assertIn(f'<source type="image/webp" srcset="/media/{small["webp"]} 100w, /media/{large["webp"]} 400w"', html)
+        self.assertIn(f'src="/media/{small["src"]}"', html)
+        self.assertIn('width="100" height="56"', html)
+        self.assertIn('loading="lazy"', html)
+
+        bare = Product.objects.create(name="Bare", slug="bare", price=Decimal("1"))
+        self.assertNotIn("<picture>", Template("{% load shop_images %}{% product_picture p %}").render(Context({"p": bare})))
+
+    def test_build_thumbnails_backfills_in_a_process_pool(self):
+        product = self._product(image=image_upload())
+        Product.objects.filter(pk=product.pk).update(image_variants={})
+        out = io.StringIO()
+        call_command("build_thumbnails", "--workers", "2", stdout=out)
+        self.assertIn("Built thumbnails for 1 products (0 already current, 0 failed, 0 skipped)", out.getvalue())
+        product.refresh_from_db()
+        self.assertTrue(images.variants_are_current(product))
+
+        out = io.StringIO()
+        call_command("build_thumbnails", "--workers", "1", stdout=out)
+        self.assertIn("Built thumbnails for 0 products (1 already current", out.getvalue())
+
+    def test_thumbnails_are_served_with_immutable_caching(self):
+        # Teamone/urls.py only routes this view under DEBUG
+        product = self._product(image=image_upload())
+        path = product.image_variants["sizes"]["small"]["webp"].removeprefix(f"{images.VARIANTS_DIR}/")
+        response = media_thumbnail(RequestFactory().get("/"), path)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn("max-age=31536000", response["Cache-Control"])
@@ -0,0 +1,85 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from shop.models import EnvironmentalMetric, MetricRollup, Product
+
+
+class IngestMetricsCommandTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(name="Unit", slug="unit", price=1)
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def _write(self, name, content):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(content)
+        return path
+
+    def _rejects(self, path):
+        with open(f"{path}.rejects.ndjson", encoding="utf-8") as fh:
+            return [json.loads(line) for line in fh]
+
+    def test_csv_ingest_batches_and_rejects(self):
+        path = self._write("readings.csv", "\n".join([
+            "product,recorded_at,salinity,ph,pollutant_index,notes",
+            "unit,2025-08-01T12:00:00Z,3.2,7.5,12.3,ok",
+            "unit,2025-08-01T13:00:00Z,,7.1,,",
+            "missing,2025-08-01T13:00:00Z,1,1,1,",
+            "unit,not-a-date,1,1,1,",
+            "unit,2025-08-01T14:00:00Z,salty,7,1,",
+            "unit,2025-02-30T10:00:00Z,2,7,1,",
+            "unit,2025-08-02T09:00:00Z,3.0,7.0,11.0,",
+        ]) + "\n")
+        out = StringIO()
+        call_command("ingest_metrics", path, batch_size=2, stdout=out)
+
+        self.assertEqual(EnvironmentalMetric.objects.count(), 3)
+        self.assertIn("Loaded 3 readings", out.getvalue())
+        rejects = self._rejects(path)
+        self.assertEqual([r["line"] for r in rejects], [4, 5, 6, 7])
+        self.assertIn("invalid recorded_at", rejects[-1]["error"])
+
+        day = MetricRollup.objects.get(bucket="day", bucket_start__day=1)
+        self.assertEqual((day.count, day.salinity_count, day.ph_count), (2, 1, 2))
+
+    def test_ndjson_ingest(self):
+        path = self._write("readings.ndjson", "\n".join([
+            json.dumps({"product": "unit", "recorded_at": "2025-08-01T12:00:00+00:00", "ph": 7.2}),
+            "{broken",
+            json.dumps(["not", "an", "object"]),
+            json.dumps({"product": ["unit"], "recorded_at": "2025-08-01T13:00:00Z"}),
+            json.dumps({"product": {"slug": "unit"}, "recorded_at": "2025-08-01T13:00:00Z"}),
+            json.dumps({"product": "unit", "recorded_at": "2025-08-01T14:00:00Z", "ph": 7.0}),
+        ]) + "\n")
+        call_command("ingest_metrics", path, stdout=StringIO())
+
+        self.assertEqual(list(EnvironmentalMetric.objects.order_by("recorded_at").values_list("ph", flat=True)), [7.2, 7.0])
+        rejects = self._rejects(path)
+        self.assertEqual([r["line"] for r in rejects], [2, 3, 4, 5])
+        self.assertIn("product is not a slug", rejects[2]["error"])
+
+    def test_non_finite_numbers_are_rejected(self):
+        path = self._write("readings.csv", "\n".join([
+            "product,recorded_at,salinity,ph,pollutant_index,notes",
+            "unit,2025-08-01T12:00:00Z,nan,7,1,",
+            "unit,2025-08-01T13:00:00Z,3,inf,1,",
+            "unit,2025-08-01T14:00:00Z,3,7,-inf,",
+            "unit,2025-08-01T15:00:00Z,3,7,1,",
+        ]) + "\n")
+        call_command("ingest_metrics", path, stdout=StringIO())
+
+        self.assertEqual(EnvironmentalMetric.objects.count(), 1)
+        rejects = self._rejects(path)
+        self.assertEqual([r["line"] for r in rejects], [2, 3, 4])
+        self.assertTrue(all("not a finite number" in r["error"] for r in rejects))
+        day = MetricRollup.objects.get(bucket="day")
+        self.assertEqual((day.count, day.salinity_sum), (1, 3.0))
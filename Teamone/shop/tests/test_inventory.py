@@ -0,0 +1,123 @@
+import json
+import threading
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from django.db import close_old_connections, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from shop.inventory import InsufficientStock, release_cart, release_expired, reserve_cart
+from shop.models import Cart, CartItem, Product, StockReservation, User
+from shop.tests.helpers import retry_if_locked
+
+
+class ReservationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="buyer", password="pw")
+        cls.pump = Product.objects.create(name="Pump", slug="pump", price=5, stock=5)
+        cls.filter = Product.objects.create(name="Filter", slug="filter", price=2, stock=1)
+
+    def setUp(self):
+        self.cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=self.cart, product=self.pump, quantity=2)
+        CartItem.objects.create(cart=self.cart, product=self.filter, quantity=1)
+
+    def _stock(self):
+        return list(Product.objects.order_by("id").values_list("stock", flat=True))
+
+    def test_reserve_and_release(self):
+        reserve_cart(self.cart)
+        self.assertEqual(self._stock(), [3, 0])
+        self.assertEqual(StockReservation.objects.filter(status="held").count(), 2)
+
+        reserve_cart(self.cart)  # re-starting checkout replaces the holds
+        self.assertEqual(self._stock(), [3, 0])
+
+        self.assertEqual(release_cart(self.cart.id), 2)
+        self.assertEqual(self._stock(), [5, 1])
+
+    def test_all_or_nothing(self):
+        CartItem.objects.filter(product=self.filter).update(quantity=2)
+        with self.assertRaises(InsufficientStock) as ctx:
+            reserve_cart(self.cart)
+        self.assertEqual(ctx.exception.product_ids, [self.filter.id])
+        self.assertEqual(self._stock(), [5, 1])
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_sweeper_releases_only_expired(self):
+        reserve_cart(self.cart, ttl=timedelta(minutes=5))
+        self.assertEqual(release_expired(), 0)
+        self.assertEqual(release_expired(now=timezone.now() + timedelta(minutes=6)), 2)
+        self.assertEqual(self._stock(), [5, 1])
+
+    @override_settings(STRIPE_WEBHOOK_SECRET=None, STRIPE_WEBHOOK_QUEUE="sync")
+    def test_webhook_commits_reservation(self):
+        reserve_cart(self.cart)
+        event = {
+            "id": "evt_1",
+            "type": "checkout.session.completed",
+            "data": {"object": {"id": "cs_1", "metadata": {"user_id": str(self.user.id), "cart_id": str(self.cart.id)}}},
+        }
+        self.client.post(reverse("stripe_webhook"), json.dumps(event), content_type="application/json")
+        self.assertEqual(StockReservation.objects.filter(status="committed").count(), 2)
+        self.assertEqual(release_expired(now=timezone.now() + timedelta(days=1)), 0)
+        self.assertEqual(self._stock(), [3, 0])
+
+    def test_checkout_view_reserves_and_reports_shortage(self):
+        self.client.force_login(self.user)
+        url = reverse("create_cart_checkout_session")
+        with mock.patch("shop.views.payments.create_checkout_session", return_value=SimpleNamespace(id="cs_1")) as create:
+            self.assertEqual(self.client.post(url).json(), {"sessionId": "cs_1"})
+        self.assertIn("expires_at", create.call_args.kwargs)
+        self.assertEqual(self._stock(), [3, 0])
+
+        other = Cart.objects.create(user=User.objects.create_user(username="late", password="pw"))
+        CartItem.objects.create(cart=other, product=self.filter, quantity=1)
+        self.client.force_login(other.user)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["product_ids"], [self.filter.id])
+
+    def test_checkout_view_releases_on_stripe_error(self):
+        self.client.force_login(self.user)
+        with mock.patch("shop.views.payments.create_checkout_session", side_effect=RuntimeError("down")):
+            self.assertEqual(self.client.post(reverse("create_cart_checkout_session")).status_code, 500)
+        self.assertEqual(self._stock(), [5, 1])
+
+
+class ConcurrentReservationTests(TransactionTestCase):
+    def test_no_oversell_on_hot_product(self):
+        product = Product.objects.create(name="Hot", slug="hot", price=1, stock=20)
+        carts = []
+        for i in range(40):
+            cart = Cart.objects.create(user=User.objects.create(username=f"u{i}"))
+            CartItem.objects.create(cart=cart, product=product, quantity=1)
+            carts.append(cart)
+        outcomes = []
+        barrier = threading.Barrier(8)
+
+        def checkout(batch):
+            barrier.wait()
+            for cart in batch:
+                try:
+                    retry_if_locked(reserve_cart, cart)
+                    outcomes.append(True)
+                except InsufficientStock:
+                    outcomes.append(False)
+            close_old_connections()
+            connection.close()
+
+        workers = [threading.Thread(target=checkout, args=(carts[i::8],)) for i in range(8)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(outcomes.count(True), 20)
+        self.assertEqual(StockReservation.objects.filter(status="held").count(), 20)
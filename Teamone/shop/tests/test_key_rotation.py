@@ -0,0 +1,123 @@
+import io
+from datetime import timedelta
+
+import jwt
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from shop.api_auth import token_cache
+from shop.jwt_utils import generate_subscription_jwt, key_id, sign_subscription_claims, subscription_claims
+from shop.models import Product, Subscription, User
+from shop.subscriptions import reissue_api_keys
+from shop.tests.helpers import make_subscription
+
+OLD, NEW = "old-secret", "new-secret"
+
+
+@override_settings(JWT_API_SECRET=OLD, JWT_API_SECRET_FALLBACKS=[])
+class KeyRotationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="api", email="api@example.com", password="pw")
+        Product.objects.create(name="Unit", slug="unit", price=1)
+
+    def setUp(self):
+        token_cache.clear()
+        self.url = reverse("metrics_timeseries", args=["unit"])
+
+    def _status(self, token):
+        token_cache.clear()
+        return self.client.get(self.url, HTTP_AUTHORIZATION=f"Bearer {token}").status_code
+
+    def test_tokens_carry_the_signing_key_id(self):
+        token = make_subscription(self.user).api_key
+        self.assertEqual(jwt.get_unverified_header(token)["kid"], key_id(OLD))
+        self.assertNotEqual(key_id(OLD), key_id(NEW))
+
+    def test_fallback_keys_verify_and_retired_keys_do_not(self):
+        sub = make_subscription(self.user)
+        with override_settings(JWT_API_SECRET=NEW, JWT_API_SECRET_FALLBACKS=[OLD]):
+            self.assertEqual(self._status(sub.api_key), 200)
+        with override_settings(JWT_API_SECRET=NEW):
+            self.assertEqual(self._status(sub.api_key), 401)
+
+    def test_tokens_without_kid_are_tried_against_every_key(self):
+        sub = make_subscription(self.user)
+        claims = jwt.decode(sub.api_key, OLD, algorithms=["HS256"])
+        sub.api_key = jwt.encode(claims, OLD, algorithm="HS256")
+        sub.save()
+        with override_settings(JWT_API_SECRET=NEW, JWT_API_SECRET_FALLBACKS=[OLD]):
+            self.assertEqual(self._status(sub.api_key), 200)
+
+    def test_reissue_keeps_replaced_keys_valid_for_the_grace_period(self):
+        subs = [make_subscription(self.user) for _ in range(5)]
+        inactive = make_subscription(self.user, active=False)
+        old_keys = [sub.api_key for sub in subs]
+
+        with override_settings(JWT_API_SECRET=NEW, JWT_API_SECRET_FALLBACKS=[OLD]):
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(reissue_api_keys(batch_size=2, grace=timedelta(hours=1)), 5)
+            # per batch of 2: one select with the user joined and one bulk update
+            selects = [q for q in ctx.captured_queries if q["sql"].startswith("SELECT")]
+            self.assertEqual(len(selects), 3)
+            self.assertTrue(all('"shop_user"' in q["sql"] for q in selects))
+
+            for sub, old_key in zip(subs, old_keys):
+                sub.refresh_from_db()
+                self.assertEqual(sub.previous_api_key, old_key)
+                self.assertEqual(jwt.get_unverified_header(sub.api_key)["kid"], key_id(NEW))
+                self.assertEqual(self._status(sub.api_key), 200)
+                self.assertEqual(self._status(old_key), 200)
+            inactive.refresh_from_db()
+            self.assertEqual(jwt.get_unverified_header(inactive.api_key)["kid"], key_id(OLD))
+
+            # already current: nothing to do
+            self.assertEqual(reissue_api_keys(), 0)
+
+            Subscription.objects.update(previous_api_key_expires=timezone.now() - timedelta(seconds=1))
+            self.assertEqual(self._status(old_keys[0]), 401)
+            self.assertEqual(self._status(subs[0].api_key), 200)
+
+    def test_rotation_refreshes_the_dashboard_key(self):
+        sub = make_subscription(self.user)
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse("dashboard")), sub.api_key)
+        with override_settings(JWT_API_SECRET=NEW, JWT_API_SECRET_FALLBACKS=[OLD]):
+            with self.captureOnCommitCallbacks(execute=True):
+                reissue_api_keys()
+        sub.refresh_from_db()
+        self.assertContains(self.client.get(reverse("dashboard")), sub.api_key)
+
+    def test_second_rotation_drops_the_retired_key_from_the_token_cache(self):
+        sub = make_subscription(self.user)
+        first_key = sub.api_key
+        with override_settings(JWT_API_SECRET=NEW, JWT_API_SECRET_FALLBACKS=[OLD]):
+            reissue_api_keys()
+            # cached, so later requests skip the subscription lookup
+            self.client.get(self.url, HTTP_AUTHORIZATION=f"Bearer {first_key}")
+            self.assertIsNotNone(token_cache.get(first_key))
+            reissue_api_keys(force=True)
+            self.assertIsNone(token_cache.get(first_key))
+            response = self.client.get(self.url, HTTP_AUTHORIZATION=f"Bearer {first_key}")
+            self.assertEqual(response.status_code, 401)
+
+    def test_bulk_signing_matches_single_signing(self):
+        subs = list(Subscription.objects.filter(pk__in=[make_subscription(self.user).pk for _ in range(3)])
+                    .select_related("user"))
+        tokens = sign_subscription_claims([subscription_claims(sub) for sub in subs])
+        self.assertEqual(tokens, [generate_subscription_jwt(sub) for sub in subs])
+
+    def test_rotate_api_keys_command(self):
+        make_subscription(self.user)
+        out = io.StringIO()
+        with override_settings(JWT_API_SECRET=NEW, JWT_API_SECRET_FALLBACKS=[OLD]):
+            call_command("rotate_api_keys", "--workers", "2", "--grace-hours", "2", stdout=out)
+        self.assertRegex(out.getvalue(), rf"Re-issued 1 API keys with key {key_id(NEW)} .* tokens/s\); .* 2h\.")
+        sub = Subscription.objects.get()
+        self.assertAlmostEqual(
+            sub.previous_api_key_expires, timezone.now() + timedelta(hours=2), delta=timedelta(minutes=1),
+        )
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta, timezone
+
+from django.test import TestCase
+from django.urls import reverse
+
+from shop.metrics import rebuild_rollups, timeseries
+from shop.models import EnvironmentalMetric, MetricRollup, Product, User
+from shop.tests.helpers import make_subscription
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+class MetricRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(name="Unit", slug="unit", price=1)
+
+    def _reading(self, when, **values):
+        return EnvironmentalMetric.objects.create(product=self.product, recorded_at=when, **values)
+
+    def test_rollups_are_maintained_on_insert(self):
+        self._reading(utc(2025, 8, 4, 10, 5), salinity=3.0, ph=7.0)
+        self._reading(utc(2025, 8, 4, 10, 40), salinity=5.0, ph=None)
+        self._reading(utc(2025, 8, 5, 9, 0), salinity=1.0, ph=8.0)
+
+        hour = MetricRollup.objects.get(product=self.product, bucket="hour", bucket_start=utc(2025, 8, 4, 10))
+        self.assertEqual((hour.count, hour.salinity_min, hour.salinity_max), (2, 3.0, 5.0))
+        self.assertEqual((hour.ph_count, hour.ph_sum), (1, 7.0))
+
+        week = MetricRollup.objects.get(product=self.product, bucket="week")
+        self.assertEqual(week.bucket_start, utc(2025, 8, 4))
+        self.assertEqual((week.count, week.salinity_min, week.salinity_sum), (3, 1.0, 9.0))
+
+    def test_edit_and_delete_recompute_buckets(self):
+        first = self._reading(utc(2025, 8, 4, 10), salinity=3.0)
+        self._reading(utc(2025, 8, 4, 11), salinity=5.0)
+        first.salinity = 9.0
+        first.save()
+        day = MetricRollup.objects.get(bucket="day")
+        self.assertEqual((day.count, day.salinity_max), (2, 9.0))
+
+        first.delete()
+        day.refresh_from_db()
+        self.assertEqual((day.count, day.salinity_min, day.salinity_max), (1, 5.0, 5.0))
+        self.assertFalse(MetricRollup.objects.filter(bucket="hour", bucket_start=utc(2025, 8, 4, 10)).exists())
+
+    def test_moving_a_reading_refreshes_its_old_buckets(self):
+        other = Product.objects.create(name="Other", slug="other", price=1)
+        reading = self._reading(utc(2024, 1, 1, 12), salinity=3.0)
+        reading.recorded_at = utc(2024, 3, 1, 12)
+        reading.save()
+        self.assertEqual(
+            list(MetricRollup.objects.filter(bucket="day").values_list("product_id", "bucket_start", "count")),
+            [(self.product.id, utc(2024, 3, 1), 1)],
+        )
+
+        reading.product = other
+        reading.save()
+        self.assertEqual(
+            list(MetricRollup.objects.filter(bucket="day").values_list("product_id", "bucket_start", "count")),
+            [(other.id, utc(2024, 3, 1), 1)],
+        )
+        self.assertEqual(timeseries(self.product, "day"), [])
+        self.assertEqual(len(timeseries(other, "day")), 1)
+
+    def test_rebuild_matches_incremental(self):
+        for hour in range(30):
+            self._reading(utc(2025, 8, 1) + timedelta(hours=hour * 5), salinity=hour)
+        incremental = timeseries(self.product, "day")
+        rebuild_rollups(chunk_size=7)
+        self.assertEqual(timeseries(self.product, "day"), incremental)
+
+    def test_timeseries_endpoint(self):
+        self._reading(utc(2025, 8, 1, 12), salinity=2.0, ph=7.0, pollutant_index=10.0)
+        self._reading(utc(2025, 8, 1, 18), salinity=4.0, ph=7.4, pollutant_index=12.0)
+        self._reading(utc(2025, 8, 3, 12), salinity=9.0)
+
+        user = User.objects.create_user(username="researcher", password="pw")
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {make_subscription(user).api_key}"}
+        url = reverse("metrics_timeseries", args=[self.product.slug])
+        data = self.client.get(url, {"bucket": "day", "start": "2025-08-01", "end": "2025-08-02"}, **auth).json()
+        self.assertEqual(len(data["points"]), 1)
+        point = data["points"][0]
+        self.assertEqual(point["count"], 2)
+        self.assertEqual(point["salinity"], {"min": 2.0, "max": 4.0, "avg": 3.0})
+        self.assertAlmostEqual(point["ph"]["avg"], 7.2)
+
+        self.assertEqual(self.client.get(url, {"bucket": "month"}, **auth).status_code, 400)
+        self.assertEqual(self.client.get(url, {"start": "yesterday"}, **auth).status_code, 400)
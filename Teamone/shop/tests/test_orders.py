@@ -0,0 +1,54 @@
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from shop.models import Cart, CartItem, Product, User
+
+
+class MyOrdersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="buyer", email="buyer@example.com", password="pw")
+        cls.pump = Product.objects.create(name="Pump", slug="pump", price=Decimal("12.50"))
+        cls.filter = Product.objects.create(name="Filter", slug="filter", price=Decimal("3.25"))
+
+    def _make_orders(self, count):
+        for _ in range(count):
+            cart = Cart.objects.create(user=self.user, checked_out=True)
+            CartItem.objects.create(cart=cart, product=self.pump, quantity=2)
+            CartItem.objects.create(cart=cart, product=self.filter, quantity=3)
+
+    def _count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("my_orders"))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_order_history_annotates_totals(self):
+        self._make_orders(1)
+        order = Cart.objects.order_history(self.user).get()
+        self.assertEqual(order.total, Decimal("34.75"))
+        self.assertEqual(sorted(i.subtotal for i in order.items.all()), [Decimal("9.75"), Decimal("25.00")])
+
+    def test_empty_order_total_is_zero(self):
+        Cart.objects.create(user=self.user, checked_out=True)
+        self.assertEqual(Cart.objects.order_history(self.user).get().total, Decimal("0.00"))
+
+    def test_query_count_does_not_grow_with_orders(self):
+        self.client.force_login(self.user)
+        self._make_orders(2)
+        small = self._count_queries()
+        self._make_orders(40)
+        large = self._count_queries()
+        self.assertEqual(small, large)
+
+    def test_orders_are_paginated(self):
+        self.client.force_login(self.user)
+        self._make_orders(15)
+        with self.settings(ORDERS_PER_PAGE=10):
+            response = self.client.get(reverse("my_orders"), {"page": 2})
+        self.assertEqual(len(response.context["orders"]), 5)
+        self.assertEqual(response.context["page"].number, 2)
@@ -0,0 +1,106 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from benchmarks.fake_stripe import FakeStripe
+from shop import payments
+from shop.models import CartItem, Product, StockReservation, Subscription, User
+from shop.carts import get_open_cart
+
+
+class StripeCheckoutViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.fake = FakeStripe().start()
+        cls.addClassCleanup(cls.fake.stop)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="payer")
+        cls.pump = Product.objects.create(name="Pump", slug="pump", price="12.50", stock=5)
+
+    def setUp(self):
+        self.fake.requests.clear()
+        self.fake.fail_with = None
+        self.settings_override = override_settings(
+            STRIPE_API_BASE=self.fake.url, STRIPE_PRICE_MAP={"pro": "price_pro"}, STRIPE_MAX_NETWORK_RETRIES=0,
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    async def _post(self, url, **kwargs):
+        await self.async_client.aforce_login(self.user)
+        try:
+            return await self.async_client.post(url, **kwargs)
+        finally:
+            await payments.close()
+
+    async def test_subscription_checkout_creates_pending_subscription(self):
+        response = await self._post(
+            reverse("create_checkout_session"), data=json.dumps({"tier": "pro", "months": 3}),
+            content_type="application/json",
+        )
+        session_id = response.json()["sessionId"]
+        self.assertTrue(session_id.startswith("cs_test_"))
+        self.assertEqual(self.fake.requests[0]["metadata[tier]"], "pro")
+        sub = await Subscription.objects.aget(stripe_checkout_session=session_id)
+        self.assertFalse(sub.active)
+        self.assertEqual(sub.months, 3)
+
+    async def test_cart_checkout_reserves_stock_and_releases_on_stripe_error(self):
+        cart = await sync_to_async(get_open_cart)(self.user)
+        await CartItem.objects.acreate(cart=cart, product=self.pump, quantity=2)
+
+        response = await self._post(reverse("create_cart_checkout_session"))
+        self.assertIn("sessionId", response.json())
+        self.assertEqual(self.fake.requests[0]["line_items[0][price_data][unit_amount]"], "1250")
+        self.assertIn("expires_at", self.fake.requests[0])
+        self.assertEqual(await StockReservation.objects.filter(status="held").acount(), 1)
+
+        self.fake.fail_with = 500
+        response = await self._post(reverse("create_cart_checkout_session"))
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(await StockReservation.objects.filter(status="held").acount(), 0)
+        await self.pump.arefresh_from_db()
+        self.assertEqual(self.pump.stock, 5)
+
+    def test_sync_server_uses_one_off_client(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse("create_checkout_session"), json.dumps({"tier": "pro"}), content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.fake.requests), 1)
+
+
+@override_settings(STRIPE_SECRET_KEY="sk_test", STRIPE_MAX_NETWORK_RETRIES=0)
+class PaymentsClientTests(TestCase):
+    def _create_many(self, count):
+        async def run():
+            try:
+                return await asyncio.gather(
+                    *(payments.create_checkout_session(mode="payment") for _ in range(count)),
+                    return_exceptions=True,
+                )
+            finally:
+                await payments.close()
+
+        return asyncio.run(run())
+
+    def test_connections_are_pooled(self):
+        with FakeStripe(latency=0.05) as fake, override_settings(STRIPE_API_BASE=fake.url, STRIPE_MAX_CONCURRENCY=4):
+            results = self._create_many(12)
+        self.assertEqual(len({session.id for session in results}), 12)
+        self.assertLessEqual(len(fake.connections), 4)
+
+    def test_concurrency_is_bounded(self):
+        with FakeStripe(latency=0.3) as fake, override_settings(
+            STRIPE_API_BASE=fake.url, STRIPE_MAX_CONCURRENCY=1, STRIPE_QUEUE_TIMEOUT=0.05,
+        ):
+            results = self._create_many(3)
+        self.assertEqual(sum(isinstance(r, payments.PaymentsBusy) for r in results), 2)
+        self.assertEqual(len(fake.requests), 1)
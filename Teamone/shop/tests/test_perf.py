@@ -0,0 +1,127 @@
+import importlib
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.template import engines
+from django.test import TestCase, override_settings
+from django.urls import clear_url_caches, include, path
+
+from shop import perf, urls as shop_urls
+from shop.models import Cart, CartItem, Product, User
+
+N_PLUS_ONE_TEMPLATE = """<ul>
+{% for item in items %}
+  <li>{{ item.product.name }}</li>
+{% endfor %}
+</ul>"""
+
+
+def n_plus_one_view(request):
+    template = engines["django"].from_string(N_PLUS_ONE_TEMPLATE)
+    return HttpResponse(template.render({"items": CartItem.objects.all()}, request))
+
+
+# shop.urls only mounts the metrics endpoint when PERF_METRICS_ENABLED is set at import time
+urlpatterns = [
+    path("n-plus-one/", n_plus_one_view, name="n_plus_one"),
+    path("internal/metrics/", perf.metrics_view, name="perf_metrics"),
+    path("", include("shop.urls")),
+]
+
+
+@override_settings(
+    PERF_METRICS_ENABLED=True, PERF_METRICS_TOKEN="s3cret", PERF_DUPLICATE_QUERY_THRESHOLD=3, ROOT_URLCONF=__name__,
+)
+class PerfMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create(username="ops", is_staff=True)
+        cart = Cart.objects.create(user=cls.staff)
+        for i in range(4):
+            product = Product.objects.create(name=f"P{i}", slug=f"p{i}", price=1)
+            CartItem.objects.create(cart=cart, product=product)
+
+    def setUp(self):
+        perf.reset()
+
+    def test_records_per_view_histograms(self):
+        self.client.get("/n-plus-one/")
+        self.client.get("/n-plus-one/")
+        data = perf.snapshot()
+        buckets, _, count = data[("db_queries", "n_plus_one")]
+        self.assertEqual(count, 2)
+        self.assertEqual(sum(buckets), 2)
+        self.assertGreater(data[("template_render_seconds", "n_plus_one")][1], 0)
+        self.assertGreater(data[("response_bytes", "n_plus_one")][1], 0)
+
+    def test_flags_duplicate_sql_with_template_line(self):
+        with self.assertLogs("shop.perf", "WARNING") as logs:
+            self.client.get("/n-plus-one/")
+        self.assertIn("n_plus_one", logs.output[0])
+        self.assertIn(":3)", logs.output[0])  # the {{ item.product.name }} line
+
+    def test_prometheus_endpoint_and_perfreport(self):
+        self.client.get("/n-plus-one/")
+        self.client.force_login(self.staff)
+        text = self.client.get("/internal/metrics/").content.decode()
+        self.assertIn('shop_db_queries_count{view="n_plus_one"} 1', text)
+        self.assertIn('shop_n_plus_one_total{view="n_plus_one"} 1', text)
+
+        with tempfile.NamedTemporaryFile("w", suffix=".prom") as scrape:
+            scrape.write(text)
+            scrape.flush()
+            out = StringIO()
+            call_command("perfreport", scrape.name, stdout=out)
+        self.assertIn("n_plus_one", out.getvalue())
+
+    def test_perfreport_skips_views_without_samples(self):
+        scrape = "\n".join([
+            'shop_request_duration_seconds_bucket{view="home",le="0.1"} 2',
+            'shop_request_duration_seconds_bucket{view="home",le="+Inf"} 2',
+            'shop_request_duration_seconds_sum{view="home"} 0.1',
+            'shop_request_duration_seconds_count{view="home"} 2',
+            # counted, but the scrape was cut before its buckets
+            'shop_request_duration_seconds_count{view="truncated"} 3',
+            'shop_n_plus_one_total{view="counter_only"} 1',
+        ])
+        with tempfile.NamedTemporaryFile("w", suffix=".prom") as fh:
+            fh.write(scrape)
+            fh.flush()
+            out = StringIO()
+            call_command("perfreport", fh.name, stdout=out)
+        report = out.getvalue()
+        self.assertIn("home", report)
+        self.assertNotIn("truncated", report)
+        self.assertNotIn("counter_only", report)
+        self.assertNotIn("None", report)
+
+    def test_metrics_need_staff_or_the_token(self):
+        self.assertEqual(self.client.get("/internal/metrics/", REMOTE_ADDR="127.0.0.1").status_code, 403)
+        self.assertEqual(self.client.get("/internal/metrics/", HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+        self.assertEqual(self.client.get("/internal/metrics/", HTTP_AUTHORIZATION="Bearer s3cret").status_code, 200)
+        with override_settings(PERF_METRICS_TOKEN=""):
+            self.assertEqual(self.client.get("/internal/metrics/", HTTP_AUTHORIZATION="Bearer ").status_code, 403)
+
+
+class PerfDisabledTests(TestCase):
+    def test_middleware_is_skipped_when_disabled(self):
+        from django.core.exceptions import MiddlewareNotUsed
+
+        with override_settings(PERF_METRICS_ENABLED=False), self.assertRaises(MiddlewareNotUsed):
+            perf.PerfMiddleware(lambda request: None)
+
+    def test_metrics_endpoint_is_only_mounted_when_enabled(self):
+        def mounted():
+            importlib.reload(shop_urls)
+            return any(pattern.name == "perf_metrics" for pattern in shop_urls.urlpatterns)
+
+        try:
+            with override_settings(PERF_METRICS_ENABLED=True):
+                self.assertTrue(mounted())
+            with override_settings(PERF_METRICS_ENABLED=False):
+                self.assertFalse(mounted())
+        finally:
+            importlib.reload(shop_urls)
+            clear_url_caches()
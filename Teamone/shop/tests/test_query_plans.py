@@ -0,0 +1,67 @@
+"""
+Guard the indexes behind the hot queries: each query's SQLite plan must use its index.
+"""
+import unittest
+
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase
+from django.utils import timezone
+
+from shop.models import Cart, EnvironmentalMetric, StockReservation, StripeEvent, Subscription, User
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN checks are SQLite-specific")
+class HotQueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="planner")
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertRegex(plan, rf"USING (COVERING )?INDEX {index_name}\b", msg=plan)
+
+    def test_open_cart(self):
+        self.assertUsesIndex(Cart.objects.filter(user=self.user, checked_out=False), "one_open_cart_per_user")
+
+    def test_order_history(self):
+        self.assertUsesIndex(Cart.objects.order_history(self.user), "cart_user_checkout_idx")
+
+    def test_subscription_by_checkout_session(self):
+        self.assertUsesIndex(
+            Subscription.objects.filter(stripe_checkout_session="cs_123"), "sub_checkout_session_idx"
+        )
+
+    def test_pending_subscription_fallback(self):
+        qs = Subscription.objects.filter(user__id=self.user.id, tier="pro", active=False).order_by("-start_date")
+        self.assertUsesIndex(qs, "sub_user_tier_active_idx")
+
+    def test_latest_subscription(self):
+        self.assertUsesIndex(self.user.subscriptions.order_by("-end_date")[:1], "sub_user_end_idx")
+
+    def test_due_subscriptions(self):
+        qs = Subscription.objects.filter(active=True, end_date__lte=timezone.now()).order_by("end_date")
+        self.assertUsesIndex(qs, "sub_active_end_idx")
+
+    def test_latest_metrics(self):
+        qs = EnvironmentalMetric.objects.filter(product_id=1)[:10]
+        self.assertUsesIndex(qs, "metric_product_recorded_idx")
+        self.assertNotIn("TEMP B-TREE", qs.explain())
+
+    def test_admin_metric_keyset_page(self):
+        now = timezone.now()
+        qs = (
+            EnvironmentalMetric.objects.filter(recorded_at__gte=now.replace(month=1, day=1))
+            .filter(Q(recorded_at__lte=now), Q(recorded_at__lt=now) | Q(pk__lt=500))
+            .order_by("-recorded_at", "-pk")[:101]
+        )
+        self.assertUsesIndex(qs, "metric_recorded_idx")
+        self.assertNotIn("TEMP B-TREE", qs.explain())
+
+    def test_expired_reservations(self):
+        qs = StockReservation.objects.filter(status="held", expires_at__lte=timezone.now()).order_by("expires_at")
+        self.assertUsesIndex(qs, "reservation_status_exp_idx")
+
+    def test_pending_stripe_events(self):
+        qs = StripeEvent.objects.filter(status="pending").order_by("received_at")
+        self.assertUsesIndex(qs, "stripe_event_status_idx")
@@ -0,0 +1,104 @@
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from shop import ratelimit
+from shop.api_auth import token_cache
+from shop.models import Product, User
+from shop.ratelimit import CacheBucketStore, MemoryBucketStore
+from shop.tests.helpers import make_subscription
+
+LOCAL_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "default"},
+    "ratelimit": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "ratelimit"},
+}
+
+
+class MemoryBucketStoreTests(SimpleTestCase):
+    def test_token_bucket_refills_at_the_quota_rate(self):
+        store = MemoryBucketStore()
+        decisions = [store.hit("k", 3, 3, now=100.0) for _ in range(4)]
+        self.assertEqual([d.allowed for d in decisions], [True, True, True, False])
+        self.assertEqual(decisions[2].remaining, 0)
+        self.assertAlmostEqual(decisions[3].reset, 1.0)
+
+        self.assertTrue(store.hit("k", 3, 3, now=101.0).allowed)  # one token per second
+        self.assertFalse(store.hit("k", 3, 3, now=101.5).allowed)
+        self.assertTrue(store.hit("other", 3, 3, now=101.5).allowed)
+
+    def test_buckets_are_bounded(self):
+        store = MemoryBucketStore(maxsize=2)
+        for key in "abc":
+            store.hit(key, 1, 1, now=0.0)
+        self.assertEqual(len(store._buckets), 2)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class CacheBucketStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.store = CacheBucketStore(alias="ratelimit")
+        self.store.clear()
+
+    def test_sliding_window(self):
+        allowed = [self.store.hit("k", 3, 10, now=100.0).allowed for _ in range(4)]
+        self.assertEqual(allowed, [True, True, True, False])
+
+        # halfway through the next window half of the previous window's hits still count
+        self.assertTrue(self.store.hit("k", 3, 10, now=115.0).allowed)
+        decision = self.store.hit("k", 3, 10, now=115.0)
+        self.assertFalse(decision.allowed)
+        self.assertEqual(decision.reset, 5.0)
+
+        self.assertTrue(self.store.hit("k", 3, 10, now=135.0).allowed)
+
+    def test_rejections_do_not_consume_quota(self):
+        for _ in range(10):
+            self.store.hit("k", 2, 10, now=100.0)
+        self.assertEqual(self.store.hit("k", 2, 10, now=112.0).remaining, 0)
+        self.assertTrue(self.store.hit("k", 2, 10, now=119.0).allowed)
+
+
+@override_settings(
+    CACHES=LOCAL_CACHES,
+    SUBSCRIPTION_TIERS={"research": {"price": 200.0, "rate_limit": {"requests": 2, "window": 60}}},
+)
+class RateLimitedApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="heavy")
+        Product.objects.create(name="Unit", slug="unit", price=1)
+
+    def setUp(self):
+        token_cache.clear()
+        self.url = reverse("metrics_timeseries", args=["unit"])
+
+    def _get(self, sub):
+        return self.client.get(self.url, HTTP_AUTHORIZATION=f"Bearer {sub.api_key}")
+
+    def _check_backend(self, backend):
+        with self.settings(API_RATE_LIMIT_BACKEND=backend, API_RATE_LIMIT_CACHE="ratelimit"):
+            ratelimit.reset_store()
+            self.addCleanup(ratelimit.reset_store)
+            ratelimit.get_store().clear()
+            sub = make_subscription(self.user)
+            first, second, third = self._get(sub), self._get(sub), self._get(sub)
+
+            self.assertEqual([first.status_code, second.status_code, third.status_code], [200, 200, 429])
+            self.assertEqual(first["RateLimit-Limit"], "2")
+            self.assertEqual(first["RateLimit-Remaining"], "1")
+            self.assertEqual(first["RateLimit-Policy"], "2;w=60")
+            self.assertEqual(third["RateLimit-Remaining"], "0")
+            self.assertGreaterEqual(int(third["Retry-After"]), 1)
+
+            # quotas are per subscription
+            self.assertEqual(self._get(make_subscription(self.user)).status_code, 200)
+
+    def test_memory_backend(self):
+        self._check_backend("memory")
+
+    def test_cache_backend(self):
+        self._check_backend("cache")
+
+    def test_unlimited_tiers_get_no_headers(self):
+        response = self._get(make_subscription(self.user, tier="basic"))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("RateLimit-Limit", response)
@@ -0,0 +1,135 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from shop import search
+from shop.catalogue import invalidate_catalogue
+from shop.models import Product
+from shop.tests.helpers import GOOGLE_APP
+
+
+class SearchBackendTests:
+    """Shared behaviour; subclasses pick the backend."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.solar = Product.objects.create(
+            name="Solar Desalinator", slug="solar", price=Decimal("900"),
+            description="Off-grid unit with a solar-powered pump.",
+        )
+        cls.pump = Product.objects.create(
+            name="Brine Pump", slug="pump", price=Decimal("120"),
+            description="Replacement pump for solar desalinators.",
+        )
+        cls.membrane = Product.objects.create(
+            name="Membrane Pack", slug="membrane", price=Decimal("45"),
+            description="Reverse-osmosis membranes.",
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def _ids(self, query):
+        return [p.id for p in search.search_products(query)]
+
+    def test_name_matches_rank_above_description_matches(self):
+        self.assertEqual(self._ids("solar"), [self.solar.id, self.pump.id])
+        self.assertEqual(self._ids("pump"), [self.pump.id, self.solar.id])
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self._ids("Solar desalinator"), [self.solar.id])
+        self.assertEqual(self._ids("brine membrane"), [])
+        self.assertEqual(self._ids("memb"), [])
+        self.assertEqual(self._ids("  ?! "), [])
+
+    def test_autocomplete_matches_name_prefixes(self):
+        self.assertEqual(search.autocomplete("des"), [("solar", "Solar Desalinator")])
+        self.assertEqual(search.autocomplete("brine p"), [("pump", "Brine Pump")])
+        self.assertEqual(search.autocomplete("Memb"), [("membrane", "Membrane Pack")])
+        self.assertEqual(search.autocomplete("osmo"), [])
+
+    def test_best_match_is_found_among_many_newer_matches(self):
+        sensor = Product.objects.create(name="Salinity Sensor", slug="salinity-sensor", price=Decimal("30"))
+        Product.objects.bulk_create(
+            Product(name=f"Gauge {i}", slug=f"gauge-{i}", price=Decimal("5"), description="Fits any sensor.")
+            for i in range(1200)
+        )
+        search.get_index().rebuild()  # bulk_create skipped the save signals
+        self.assertEqual(self._ids("sensor")[0], sensor.id)
+        self.assertEqual(search.autocomplete("sens", 1), [("salinity-sensor", "Salinity Sensor")])
+        self.assertEqual(search.autocomplete("gau", 2), [("gauge-0", "Gauge 0"), ("gauge-1", "Gauge 1")])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.membrane.name = "Graphene Membrane"
+        self.membrane.save()
+        self.assertEqual(self._ids("graphene"), [self.membrane.id])
+
+        self.pump.delete()
+        self.assertEqual(self._ids("brine"), [])
+        self.assertEqual(self._ids("pump"), [self.solar.id])
+
+
+class Fts5SearchTests(SearchBackendTests, TestCase):
+    def test_uses_fts5(self):
+        self.assertIsInstance(search.get_index(), search.Fts5Index)
+
+
+class InvertedIndexSearchTests(SearchBackendTests, TestCase):
+    def setUp(self):
+        super().setUp()
+        patches = [
+            mock.patch("shop.search.fts5_available", return_value=False),
+            mock.patch("shop.search._fallback", search.InvertedIndex()),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_rebuilds_after_changes_it_did_not_see(self):
+        self.assertEqual(self._ids("membrane"), [self.membrane.id])
+        # a bulk update in another process: no signals here, just a new catalogue version
+        Product.objects.filter(pk=self.membrane.pk).update(name="Ceramic Filter")
+        self.assertEqual(self._ids("ceramic"), [])
+        invalidate_catalogue()
+        self.assertEqual(self._ids("ceramic"), [self.membrane.id])
+
+
+@override_settings(SOCIALACCOUNT_PROVIDERS=GOOGLE_APP)
+class SearchViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(30):
+            Product.objects.create(name=f"Filter {i}", slug=f"filter-{i}", price=Decimal("5"))
+
+    def test_search_api(self):
+        data = self.client.get(reverse("search_api"), {"q": "filter 12"}).json()
+        self.assertEqual(data["query"], "filter 12")
+        self.assertEqual(data["results"], [{
+            "id": Product.objects.get(slug="filter-12").id,
+            "slug": "filter-12",
+            "name": "Filter 12",
+            "price": "5.00",
+            "url": reverse("product_detail", args=["filter-12"]),
+        }])
+
+        response = self.client.get(reverse("search_api"), {"q": "filter", "limit": 5})
+        self.assertEqual(len(response.json()["results"]), 5)
+
+        response = self.client.get(reverse("search_api"), {"q": "filter", "limit": "x"})
+        self.assertEqual(len(response.json()["results"]), 20)
+        self.assertEqual(self.client.get(reverse("search_api")).json()["results"], [])
+
+    def test_autocomplete(self):
+        response = self.client.get(reverse("search_autocomplete"), {"q": "filter 2"})
+        names = [s["name"] for s in response.json()["suggestions"]]
+        self.assertEqual(len(names), 8)
+        self.assertIn("Filter 2", names)
+        self.assertTrue(all(name.startswith("Filter 2") for name in names))
+
+    def test_search_page(self):
+        response = self.client.get(reverse("product_search"), {"q": "filter 29"})
+        self.assertContains(response, "1 result for")
+        self.assertContains(response, reverse("product_detail", args=["filter-29"]))
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from shop.api_auth import verify_api_token
+from shop.models import (
+    Cart, CartItem, EnvironmentalMetric, MetricAnomaly, MetricAnomalyState, MetricRollup, Product, Subscription, User,
+)
+
+
+def seed(**options):
+    defaults = {"users": 4, "products": 3, "carts": 10, "subscriptions": 5, "metrics": 100, "days": 2}
+    call_command("seed_bench", stdout=StringIO(), **{**defaults, **options})
+
+
+class SeedBenchTests(TestCase):
+    def test_generates_requested_scale(self):
+        seed()
+        self.assertEqual(User.objects.filter(username__startswith="bench-").count(), 4)
+        self.assertEqual(Product.objects.filter(slug__startswith="bench-").count(), 3)
+        self.assertEqual(Cart.objects.filter(checked_out=False).count(), 4)
+        self.assertEqual(Cart.objects.filter(checked_out=True).count(), 6)
+        self.assertEqual(CartItem.objects.count(), 30)
+        self.assertEqual(Subscription.objects.count(), 5)
+        self.assertEqual(EnvironmentalMetric.objects.count(), 100)
+        self.assertFalse(Subscription.objects.filter(active=True, api_key__isnull=True).exists())
+        # the default base time keeps seeded API keys usable
+        active = Subscription.objects.filter(active=True)
+        self.assertTrue(active)
+        for sub in active:
+            self.assertGreater(sub.end_date, timezone.now())
+            self.assertEqual(verify_api_token(sub.api_key)["sub_id"], str(sub.id))
+
+        hourly = MetricRollup.objects.filter(bucket="hour")
+        self.assertEqual(sum(hourly.values_list("count", flat=True)), 100)
+
+    def test_is_reproducible(self):
+        def snapshot():
+            return (
+                list(EnvironmentalMetric.objects.order_by("product__slug", "recorded_at")
+                     .values_list("recorded_at", "salinity", "ph", "pollutant_index")),
+                list(Subscription.objects.order_by("user__username", "tier", "end_date")
+                     .values_list("tier", "end_date")),
+            )
+
+        seed(seed=7)
+        first = snapshot()
+        seed(seed=7, flush=True)
+        self.assertEqual(snapshot(), first)
+        seed(seed=8, flush=True)
+        self.assertNotEqual(snapshot(), first)
+
+    def test_base_time(self):
+        seed(base_time="2024-06-01T00:00:00Z")
+        latest = EnvironmentalMetric.objects.latest("recorded_at").recorded_at
+        self.assertLess(latest, datetime(2024, 6, 1, tzinfo=dt_timezone.utc))
+        self.assertGreaterEqual(latest, datetime(2024, 5, 31, tzinfo=dt_timezone.utc))
+
+        seed(base_time="now", flush=True)
+        self.assertGreater(EnvironmentalMetric.objects.latest("recorded_at").recorded_at, timezone.now() - timedelta(days=1))
+        with self.assertRaisesMessage(CommandError, "--base-time must be an ISO 8601 datetime or 'now'"):
+            seed(base_time="yesterday", flush=True)
+
+    def test_refuses_to_mix_runs(self):
+        seed(metrics=0)
+        with self.assertRaises(CommandError):
+            seed(metrics=0)
+
+
+class SeedBenchFlushTests(TransactionTestCase):
+    # the flush commits its raw DELETEs, so foreign keys are checked for real
+    def test_flush_after_anomaly_detection(self):
+        seed()
+        reading = EnvironmentalMetric.objects.order_by("pk").first()
+        MetricAnomalyState.objects.create(product=reading.product, last_recorded_at=reading.recorded_at, last_metric_id=reading.pk)
+        MetricAnomaly.objects.create(
+            product=reading.product, metric=reading, field="salinity", recorded_at=reading.recorded_at,
+            value=99.0, rolling_mean=35.0, rolling_std=0.1, ewma=35.0,
+        )
+        seed(flush=True)
+        self.assertFalse(MetricAnomaly.objects.exists())
+        self.assertFalse(MetricAnomalyState.objects.exists())
+        self.assertEqual(EnvironmentalMetric.objects.count(), 100)
@@ -0,0 +1,88 @@
+import json
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from shop.carts import add_item, get_open_cart
+from shop.models import Product, User
+from shop.snapshot import get_snapshot, resolve
+from shop.views import _prepare_cart_checkout
+
+
+class CatalogueSnapshotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="shopper", password="pw")
+        cls.pump = Product.objects.create(name="Pump", slug="pump", price="12.50", description="Solar pump")
+        cls.filter = Product.objects.create(name="Filter", slug="filter", price="2.05")
+
+    def _product_queries(self, func):
+        get_snapshot()  # warm
+        with CaptureQueriesContext(connection) as ctx:
+            result = func()
+        return result, [q["sql"] for q in ctx.captured_queries if '"shop_product"' in q["sql"]]
+
+    def test_lookups_and_compact_records(self):
+        snapshot = get_snapshot()
+        record = snapshot.by_slug("pump")
+        self.assertIs(snapshot.get(self.pump.id), record)
+        self.assertEqual((record.name, record.price, str(record.price), record.price_cents), ("Pump", Decimal("12.50"), "12.50", 1250))
+        self.assertFalse(record.image)
+        self.assertFalse(hasattr(record, "__dict__"))
+        self.assertIsNone(snapshot.by_slug("missing"))
+
+    def test_snapshot_is_replaced_when_the_catalogue_changes(self):
+        snapshot = get_snapshot()
+        self.assertIs(get_snapshot(), snapshot)
+
+        self.pump.price = Decimal("15.00")
+        self.pump.save()
+        fresh = get_snapshot()
+        self.assertIsNot(fresh, snapshot)
+        self.assertEqual(fresh.by_slug("pump").price, Decimal("15.00"))
+        # the old snapshot is left as it was for anyone still holding it
+        self.assertEqual(snapshot.by_slug("pump").price, Decimal("12.50"))
+
+        self.filter.delete()
+        self.assertIsNone(get_snapshot().by_slug("filter"))
+
+    def test_products_the_snapshot_missed_are_read_from_the_database(self):
+        # bulk_create sends no signals, so the version doesn't move
+        get_snapshot()
+        [extra] = Product.objects.bulk_create([Product(name="Valve", slug="valve", price="1.00")])
+        records = resolve([self.pump.id, extra.id])
+        self.assertEqual(records[extra.id].name, "Valve")
+
+    def test_detail_page_resolves_the_product_without_a_query(self):
+        self.client.force_login(self.user)
+        response, queries = self._product_queries(lambda: self.client.get(reverse("product_detail", args=["pump"])))
+        self.assertContains(response, "Solar pump")
+        self.assertContains(response, "£12.50")
+        self.assertEqual(queries, [])
+        self.assertEqual(self.client.get(reverse("product_detail", args=["missing"])).status_code, 404)
+
+    def test_cart_and_checkout_lines_resolve_products_without_a_query(self):
+        self.client.force_login(self.user)
+        cart = get_open_cart(self.user)
+        add_item(cart, self.pump.id, quantity=2)
+        add_item(cart, self.filter.id)
+
+        response, queries = self._product_queries(lambda: self.client.get(reverse("view_cart")))
+        self.assertContains(response, "$27.05")
+        self.assertEqual(queries, [])
+
+        response, queries = self._product_queries(lambda: self.client.get(reverse("cart_api")))
+        self.assertEqual(json.loads(response.content)["items"][0]["subtotal"], "25.00")
+        self.assertEqual(queries, [])
+
+        (_, line_items, _), queries = self._product_queries(lambda: _prepare_cart_checkout(self.user))
+        self.assertEqual(
+            [(line["price_data"]["product_data"]["name"], line["price_data"]["unit_amount"], line["quantity"])
+             for line in line_items],
+            [("Pump", 1250, 2), ("Filter", 205, 1)],
+        )
+        # only the stock reservation touches product rows
+        self.assertTrue(all(sql.startswith("UPDATE") for sql in queries))
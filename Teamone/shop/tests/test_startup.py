@@ -0,0 +1,49 @@
+import io
+from unittest import skipUnless
+
+from django.apps import apps
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from shop.management.commands.startup_report import default_modules, profile_imports
+from shop.tests.helpers import GOOGLE_APP
+
+# loaded on first use (a checkout, a webhook, a thumbnail build, anomaly detection)
+LAZY_MODULES = {"stripe", "aiohttp", "PIL", "numpy"}
+
+
+class StartupTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.rows = profile_imports(default_modules())
+
+    def test_heavy_dependencies_are_not_imported_at_startup(self):
+        self.assertEqual(default_modules(), ["Teamone.wsgi", "Teamone.urls"])
+        loaded = {name.partition(".")[0] for name, *_ in self.rows}
+        self.assertIn("shop", loaded)
+        self.assertEqual(loaded & LAZY_MODULES, set())
+
+    def test_startup_report_command(self):
+        out = io.StringIO()
+        call_command("startup_report", "Teamone.wsgi", "--limit", "3", stdout=out)
+        report = out.getvalue()
+        self.assertRegex(report, r"Cold import of Teamone.wsgi: [\d.]+ ms, \d+ modules")
+        self.assertIn("By package", report)
+        self.assertRegex(report, r"Teamone.wsgi +[\d.]+ ms +depth 0")
+
+    def test_startup_report_budget(self):
+        with self.assertRaisesRegex(CommandError, r"Cold import took [\d.]+ ms, over the 0.001 ms budget"):
+            call_command("startup_report", "Teamone.wsgi", "--budget", "0.001", stdout=io.StringIO())
+
+
+@override_settings(SOCIALACCOUNT_PROVIDERS=GOOGLE_APP)
+class SocialLoginToggleTests(TestCase):
+    @skipUnless(apps.is_installed("allauth.socialaccount"), "SOCIAL_LOGIN_ENABLED=0")
+    def test_google_link_is_shown_when_enabled(self):
+        self.assertContains(self.client.get(reverse("product_search")), "Login with Google")
+
+    @override_settings(SOCIAL_LOGIN_ENABLED=False)
+    def test_google_link_is_hidden_when_disabled(self):
+        self.assertNotContains(self.client.get(reverse("product_search")), "Login with Google")
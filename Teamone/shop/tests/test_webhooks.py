@@ -0,0 +1,102 @@
+import hashlib
+import hmac
+import json
+import time
+from functools import partial
+from io import StringIO
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from shop.models import Cart, StripeEvent, Subscription, User
+
+
+def checkout_event(event_id, session_id, **metadata):
+    return {
+        "id": event_id,
+        "type": "checkout.session.completed",
+        "data": {"object": {"id": session_id, "metadata": metadata}},
+    }
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=None, STRIPE_WEBHOOK_QUEUE="sync")
+class StripeWebhookTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="payer", email="payer@example.com", password="pw")
+
+    def _post(self, event):
+        return self.client.post(reverse("stripe_webhook"), json.dumps(event), content_type="application/json")
+
+    def _pending_subscription(self, session_id="cs_1", tier="pro"):
+        return Subscription.objects.create(
+            user=self.user, tier=tier, months=1, end_date=timezone.now() + timedelta(days=30),
+            stripe_checkout_session=session_id,
+        )
+
+    def test_subscription_activation_is_idempotent(self):
+        sub = self._pending_subscription()
+        event = checkout_event("evt_1", "cs_1", user_id=str(self.user.id), tier="pro", months="3")
+        self.assertEqual(self._post(event).status_code, 200)
+        sub.refresh_from_db()
+        self.assertTrue(sub.active)
+        self.assertEqual(sub.months, 3)
+        api_key, end_date = sub.api_key, sub.end_date
+
+        for _ in range(3):
+            self.assertEqual(self._post(event).status_code, 200)
+        self.assertEqual(StripeEvent.objects.count(), 1)
+        sub.refresh_from_db()
+        self.assertEqual((sub.api_key, sub.end_date), (api_key, end_date))
+
+    def test_redelivery_under_new_event_id_does_not_reissue(self):
+        sub = self._pending_subscription()
+        self._post(checkout_event("evt_1", "cs_1", user_id=str(self.user.id), tier="pro"))
+        sub.refresh_from_db()
+        self._post(checkout_event("evt_2", "cs_1", user_id=str(self.user.id), tier="pro"))
+        self.assertEqual(Subscription.objects.get(pk=sub.pk).api_key, sub.api_key)
+
+    def test_fallback_matches_latest_pending_subscription_for_user(self):
+        sub = self._pending_subscription(session_id=None, tier="basic")
+        self._post(checkout_event("evt_1", "cs_unknown", user_id=str(self.user.id), tier="basic"))
+        sub.refresh_from_db()
+        self.assertTrue(sub.active)
+        self.assertEqual(sub.stripe_checkout_session, "cs_unknown")
+
+    def test_cart_checkout_marks_cart(self):
+        cart = Cart.objects.create(user=self.user)
+        self._post(checkout_event("evt_c", "cs_c", user_id=str(self.user.id), cart_id=str(cart.id)))
+        cart.refresh_from_db()
+        self.assertTrue(cart.checked_out)
+
+    def test_malformed_payloads_are_rejected(self):
+        self.assertEqual(
+            self.client.post(reverse("stripe_webhook"), "{", content_type="application/json").status_code, 400
+        )
+        self.assertEqual(self._post({"type": "checkout.session.completed"}).status_code, 400)
+
+    @override_settings(STRIPE_WEBHOOK_SECRET="whsec_test")
+    def test_signed_events_are_verified_and_recorded(self):
+        payload = json.dumps(checkout_event("evt_s", "cs_s"))
+        timestamp = int(time.time())
+        signature = hmac.new(b"whsec_test", f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+        post = partial(self.client.post, reverse("stripe_webhook"), payload, content_type="application/json")
+
+        self.assertEqual(post(HTTP_STRIPE_SIGNATURE=f"t={timestamp},v1={signature}").status_code, 200)
+        self.assertEqual(StripeEvent.objects.get(event_id="evt_s").payload["data"]["object"]["id"], "cs_s")
+        self.assertEqual(post(HTTP_STRIPE_SIGNATURE=f"t={timestamp},v1={'0' * 64}").status_code, 400)
+
+    @override_settings(STRIPE_WEBHOOK_QUEUE="db")
+    def test_db_queue_is_drained_by_command(self):
+        sub = self._pending_subscription()
+        self._post(checkout_event("evt_1", "cs_1", user_id=str(self.user.id), tier="pro"))
+        self._post({"id": "evt_other", "type": "customer.created", "data": {"object": {}}})
+        self.assertFalse(Subscription.objects.get(pk=sub.pk).active)
+        self.assertEqual(StripeEvent.objects.filter(status="pending").count(), 2)
+
+        call_command("process_stripe_events", stdout=StringIO())
+        self.assertTrue(Subscription.objects.get(pk=sub.pk).active)
+        self.assertFalse(StripeEvent.objects.exclude(status="processed").exists())
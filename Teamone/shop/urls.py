@@ -1,9 +1,17 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import perf, views
 
 urlpatterns = [
     path("", views.product_list, name="product_list"),
     path("product/<slug:slug>/", views.product_detail, name="product_detail"),
+    path("search/", views.product_search, name="product_search"),
+    path("api/search/", views.search_api, name="search_api"),
+    path("api/search/autocomplete/", views.search_autocomplete, name="search_autocomplete"),
+
+    # Metrics API
+    path("api/metrics/<slug:slug>/timeseries/", views.metrics_timeseries, name="metrics_timeseries"),
+    path("api/metrics/<slug:slug>/export/", views.metrics_export, name="metrics_export"),
     
     # Dashboard & subscriptions
     path("dashboard/", views.dashboard, name="dashboard"),
@@ -20,8 +28,14 @@ urlpatterns = [
     path("cart/", views.view_cart, name="view_cart"),
     path("cart/add/<int:product_id>/", views.add_to_cart, name="add_to_cart"),
     path("cart/remove/<int:item_id>/", views.remove_from_cart, name="remove_from_cart"),
+    path("api/cart/", views.cart_api, name="cart_api"),
     path("cart/create-checkout-session/", views.create_cart_checkout_session, name="create_cart_checkout_session"),
     path("cart-success/", views.cart_success, name="cart_success"),
     path("cart-cancel/", views.cart_cancel, name="cart_cancel"),
     path("orders/", views.my_orders, name="my_orders"),
 ]
+
+if settings.PERF_METRICS_ENABLED:
+    urlpatterns += [
+        path("internal/metrics/", perf.metrics_view, name="perf_metrics"),
+    ]
@@ -1,28 +1,43 @@
-import stripe
 import json
-from decimal import Decimal, InvalidOperation
+from asgiref.sync import sync_to_async
+from decimal import Decimal
 from django.shortcuts import render, get_object_or_404, HttpResponse, redirect
 from django.core.paginator import Paginator
 from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.db.models import Count, Max
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
 from django.utils import timezone
 from datetime import timedelta
 from django.contrib.auth import get_user_model
 from django.views.decorators.http import require_POST
+from django.views.static import serve as static_serve
 
 from .models import (
     Cart,
     CartItem,
     Product,
     EnvironmentalMetric,
+    MetricAnomaly,
     Subscription,
 )
+from .api_auth import api_key_required
+from .carts import add_item, cart_lines, get_open_cart, set_quantities
+from .catalogue import cached_page, detail_page_key, list_page_key, product_version
+from .dashboard import get_summary, recent_orders
 from .jwt_utils import generate_subscription_jwt
-
-# Stripe config
-stripe.api_key = getattr(settings, "STRIPE_SECRET_KEY", "")
+from .exports import columnar_chunks, csv_chunks
+from .inventory import InsufficientStock, release_cart, reserve_cart
+from . import images, payments
+from .metrics import BUCKETS, METRIC_FIELDS, parse_range_bound, timeseries
+from .pricing import monthly_price_for_tier, tier_prices
+from .search import autocomplete, search_products
+from .snapshot import get_snapshot
+from .webhooks import dispatch, record_event
 
 User = get_user_model()
 
@@ -32,68 +47,196 @@ User = get_user_model()
 # ------------------------------
 
 def product_list(request):
-    qs = Product.objects.all().order_by("-created_at")
-    paginator = Paginator(qs, getattr(settings, "PRODUCTS_PER_PAGE", 12))
     page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
-    return render(request, "shop/product_list.html", {"page": page})
+
+    def render_page():
+        qs = Product.objects.all().order_by("-created_at")
+        totals = Product.objects.aggregate(count=Count("id"), last=Max("updated_at"))
+        paginator = Paginator(qs, getattr(settings, "PRODUCTS_PER_PAGE", 12))
+        paginator.count = totals["count"]  # counted above, with the last change
+        page = paginator.get_page(page_number)
+        last_modified = totals["last"]
+        # the grid fragment's key: any product added, removed or updated changes it
+        grid_version = f"{totals['count']}:{last_modified.timestamp() if last_modified else 0}"
+        context = {"page": page, "grid_version": grid_version}
+        return render(request, "shop/product_list.html", context), last_modified
+
+    # anonymous pages are identical for everyone, so they can be shared and revalidated
+    if request.user.is_authenticated:
+        return render_page()[0]
+    page_key = page_number if page_number and page_number.isdigit() else "1"
+    return cached_page(request, list_page_key(page_key), render_page)
 
 
 def product_detail(request, slug):
-    product = get_object_or_404(Product, slug=slug)
-    metrics = product.metrics.all()[:10]
-    return render(request, "shop/product_detail.html", {"product": product, "metrics": metrics})
+    def render_page():
+        product = get_snapshot().by_slug(slug)
+        if product is None:
+            raise Http404("No Product matches the given query.")
+        metrics = list(EnvironmentalMetric.objects.filter(product_id=product.id)[:10])
+        anomalies = list(MetricAnomaly.objects.filter(product_id=product.id)[:10])
+        last_modified = max([product.updated_at] + [m.recorded_at for m in metrics[:1]])
+        # readings in the table that were flagged on any field
+        flagged = {a.metric_id for a in anomalies}
+        context = {
+            "product": product,
+            "metrics": metrics,
+            "anomalies": anomalies,
+            "flagged": flagged,
+            # bumped whenever the product's readings or anomalies change
+            "metrics_version": product_version(product.id),
+        }
+        return render(request, "shop/product_detail.html", context), last_modified
+
+    if request.user.is_authenticated:
+        return render_page()[0]
+    return cached_page(request, detail_page_key(slug), render_page)
+
+
+def _search_limit(request, default, maximum):
+    try:
+        return min(maximum, max(1, int(request.GET.get("limit", default))))
+    except ValueError:
+        return default
+
+
+def product_search(request):
+    query = request.GET.get("q", "").strip()
+    products = search_products(query, getattr(settings, "SEARCH_RESULTS_LIMIT", 48)) if query else []
+    return render(request, "shop/search.html", {"query": query, "products": products})
+
+
+def search_api(request):
+    query = request.GET.get("q", "").strip()
+    products = search_products(query, _search_limit(request, 20, 100))
+    return JsonResponse({
+        "query": query,
+        "results": [
+            {
+                "id": p.id,
+                "slug": p.slug,
+                "name": p.name,
+                "price": str(p.price),
+                "url": reverse("product_detail", args=[p.slug]),
+            }
+            for p in products
+        ],
+    })
+
+
+def search_autocomplete(request):
+    suggestions = autocomplete(request.GET.get("q", ""), _search_limit(request, 8, 20))
+    return JsonResponse({
+        "suggestions": [
+            {"slug": slug, "name": name, "url": reverse("product_detail", args=[slug])}
+            for slug, name in suggestions
+        ],
+    })
+
+
+def media_thumbnail(request, path):
+    """Serve a content-hashed thumbnail in development, cacheable for good like in production."""
+    response = static_serve(request, f"{images.VARIANTS_DIR}/{path}", document_root=settings.MEDIA_ROOT)
+    patch_cache_control(response, public=True, max_age=365 * 24 * 3600, immutable=True)
+    return response
 
 
 # ------------------------------
-# Subscriptions & Dashboard
+# Metrics API
 # ------------------------------
 
-def _monthly_price_for_tier(tier: str) -> Decimal:
-    """Helper to get monthly price for tier from settings, returns Decimal."""
-    tier_map = getattr(settings, "SUBSCRIPTION_TIERS", {"basic": 10.0, "pro": 50.0, "research": 200.0})
+def _metric_range(request):
+    """Parse the shared ?start=&end= filters; raises ValueError on bad input."""
+    start = parse_range_bound(request.GET.get("start"))
+    end = parse_range_bound(request.GET.get("end"))
+    if start and end and start >= end:
+        raise ValueError("start must be before end")
+    return start, end
+
+
+@api_key_required
+def metrics_timeseries(request, slug):
+    """
+    JSON min/max/avg series for a product, served from the rollup tables.
+    Requires a subscription API key (see shop.api_auth).
+    Query params: bucket=hour|day|week (default day), start/end as ISO dates or datetimes.
+    """
+    product = get_object_or_404(Product, slug=slug)
+    bucket = request.GET.get("bucket", "day")
+    if bucket not in BUCKETS:
+        return JsonResponse({"error": f"bucket must be one of {', '.join(BUCKETS)}"}, status=400)
     try:
-        monthly = Decimal(str(tier_map.get(tier, 0.0)))
-    except (InvalidOperation, TypeError):
-        monthly = Decimal("0.0")
-    return monthly
+        start, end = _metric_range(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
 
+    return JsonResponse({
+        "product": product.slug,
+        "bucket": bucket,
+        "start": start.isoformat() if start else None,
+        "end": end.isoformat() if end else None,
+        "points": timeseries(product, bucket, start, end),
+    })
 
-@login_required
-def dashboard(request):
-    subs = request.user.subscriptions.all()
-    latest_sub = subs.order_by("-end_date").first()
-    api_token = latest_sub.api_key if latest_sub and latest_sub.active else None
 
-    # cart summary
-    cart = Cart.objects.filter(user=request.user, checked_out=False).first()
-    orders = Cart.objects.filter(user=request.user, checked_out=True).prefetch_related("items__product")
+EXPORT_FORMATS = {
+    "csv": (csv_chunks, "text/csv", "csv"),
+    "bwm": (columnar_chunks, "application/octet-stream", "bwm"),
+}
+
+
+@api_key_required
+def metrics_export(request, slug):
+    """
+    Stream a product's full metric history (optionally range-filtered) as CSV or the
+    compact columnar BWM1 format (?format=bwm, see shop.exports). Research tier only.
+    """
+    if request.api_claims.get("tier") != "research":
+        return JsonResponse({"error": "Exports require a Research subscription"}, status=403)
+    product = get_object_or_404(Product, slug=slug)
+    fmt = request.GET.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({"error": f"format must be one of {', '.join(EXPORT_FORMATS)}"}, status=400)
+    try:
+        start, end = _metric_range(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    rows = product.metrics.order_by("recorded_at")
+    if start:
+        rows = rows.filter(recorded_at__gte=start)
+    if end:
+        rows = rows.filter(recorded_at__lt=end)
+    chunk_size = getattr(settings, "METRICS_EXPORT_CHUNK_SIZE", 2000)
+    rows = rows.values_list("recorded_at", *METRIC_FIELDS, "notes").iterator(chunk_size=chunk_size)
 
-    cart_items, cart_total = [], Decimal("0.00")
-    if cart:
-        cart_items = cart.items.select_related("product").all()
-        cart_total = sum([i.subtotal for i in cart_items])
+    encode, content_type, extension = EXPORT_FORMATS[fmt]
+    response = StreamingHttpResponse(encode(rows), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{product.slug}-metrics.{extension}"'
+    return response
+
+
+# ------------------------------
+# Subscriptions & Dashboard
+# ------------------------------
 
+@login_required
+def dashboard(request):
+    summary = get_summary(request.user)
     return render(
         request,
         "shop/dashboard.html",
         {
-            "subscriptions": subs,  # ✅ pass actual Subscription queryset
-            "api_token": api_token,
-            "STRIPE_PUBLISHABLE_KEY": settings.STRIPE_PUBLISHABLE_KEY,
-            "tier_prices": getattr(
-                settings, "SUBSCRIPTION_TIERS",
-                {"basic": 10.0, "pro": 50.0, "research": 200.0}
-            ),
-            "cart_items": cart_items,
-            "cart_total": cart_total,
-            "orders": orders,
+            **summary,
+            "orders": recent_orders(request.user),
+            "STRIPE_PUBLISHABLE_KEY": getattr(settings, "STRIPE_PUBLISHABLE_KEY", ""),
+            "tier_prices": tier_prices(),
         },
     )
 
 
 @login_required
-def create_checkout_session(request):
+async def create_checkout_session(request):
     """Create a Stripe Checkout session for a subscription."""
     if request.method != "POST":
         return HttpResponse(status=405)
@@ -115,26 +258,30 @@ def create_checkout_session(request):
     if not price_id:
         return JsonResponse({"error": "Invalid tier or Stripe price not configured"}, status=400)
 
+    user = await request.auser()
     end_date = timezone.now() + timedelta(days=30 * months)
 
-    monthly_price = _monthly_price_for_tier(tier)
+    monthly_price = monthly_price_for_tier(tier)
     total_price = (monthly_price * Decimal(months)).quantize(Decimal("0.01"))
 
     try:
-        checkout_session = stripe.checkout.Session.create(
+        checkout_session = await payments.create_checkout_session(
+            pooled=isinstance(request, ASGIRequest),
             payment_method_types=["card"],
             mode="payment",
             line_items=[{"price": price_id, "quantity": 1}],
             success_url=request.build_absolute_uri("/stripe-success/") + "?session_id={CHECKOUT_SESSION_ID}",
             cancel_url=request.build_absolute_uri("/stripe-cancel/"),
-            metadata={"user_id": str(request.user.id), "tier": tier, "months": str(months)},
+            metadata={"user_id": str(user.id), "tier": tier, "months": str(months)},
         )
+    except payments.PaymentsBusy as e:
+        return JsonResponse({"error": str(e)}, status=503)
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
     # create a pending subscription
-    Subscription.objects.create(
-        user=request.user,
+    await Subscription.objects.acreate(
+        user=user,
         tier=tier,
         months=months,
         end_date=end_date,
@@ -147,56 +294,38 @@ def create_checkout_session(request):
 
 
 @csrf_exempt
-@csrf_exempt
-def stripe_webhook(request):
+async def stripe_webhook(request):
+    """
+    Verify the event, record it in the ledger and acknowledge. Processing happens
+    in shop.webhooks, so retries are deduplicated and the response stays fast.
+    """
     payload = request.body
     sig_header = request.META.get("HTTP_STRIPE_SIGNATURE", "")
     webhook_secret = getattr(settings, "STRIPE_WEBHOOK_SECRET", None)
 
     try:
         if webhook_secret:
-            event = stripe.Webhook.construct_event(payload, sig_header, webhook_secret)
-        else:
-            event = json.loads(payload)
+            import stripe  # a large import, so not paid at startup by workers that never see a webhook
+
+            # verifies the signature; the ledger stores the plain JSON rather than the StripeObject
+            stripe.Webhook.construct_event(payload, sig_header, webhook_secret)
+        event = json.loads(payload)
     except Exception:
         return HttpResponse(status=400)
 
-    event_type = event.get("type")
-
-    # checkout completed
-    if event_type == "checkout.session.completed":
-        sess = event["data"]["object"]
-        checkout_id = sess.get("id")
-        metadata = sess.get("metadata", {}) or {}
-        user_id = metadata.get("user_id")
-
-        # ✅ if it's a subscription
-        if metadata.get("tier"):
-            months = int(metadata.get("months", 1))
-            tier = metadata.get("tier", "basic")
-            sub = Subscription.objects.filter(stripe_checkout_session=checkout_id).first()
-            if not sub and user_id:
-                sub = Subscription.objects.filter(user__id=user_id, tier=tier, active=False).order_by("-start_date").first()
-            if sub:
-                sub.active = True
-                sub.months = months
-                sub.end_date = timezone.now() + timedelta(days=30 * months)
-                monthly_price = _monthly_price_for_tier(sub.tier)
-                sub.price = (monthly_price * Decimal(sub.months)).quantize(Decimal("0.01"))
-                sub.api_key = generate_subscription_jwt(sub)
-                sub.save()
-
-        # ✅ if it's a cart checkout
-        elif metadata.get("cart_id"):
-            cart_id = metadata["cart_id"]
-            cart = Cart.objects.filter(id=cart_id, user__id=user_id).first()
-            if cart:
-                cart.checked_out = True
-                cart.save()
+    if not isinstance(event, dict) or not event.get("id"):
+        return HttpResponse(status=400)
+
+    await sync_to_async(_record_and_dispatch)(event)
 
     return HttpResponse(status=200)
 
 
+def _record_and_dispatch(event):
+    recorded = record_event(event)
+    if recorded is not None:
+        dispatch(recorded)
+
 
 def stripe_success(request):
     return render(request, "shop/stripe_success.html")
@@ -213,22 +342,71 @@ def stripe_cancel(request):
 @login_required
 def add_to_cart(request, product_id):
     product = get_object_or_404(Product, id=product_id)
-    cart, _ = Cart.objects.get_or_create(user=request.user, checked_out=False)
-    item, created = CartItem.objects.get_or_create(cart=cart, product=product)
-    if not created:
-        item.quantity += 1
-        item.save()
+    add_item(get_open_cart(request.user), product.id)
     return redirect("view_cart")
 
 
 @login_required
 def view_cart(request):
     cart = Cart.objects.filter(user=request.user, checked_out=False).first()
-    items = cart.items.select_related("product").all() if cart else []
-    total = cart.total if cart else 0
+    items = cart_lines(cart)
+    total = sum(item.subtotal for item in items)
     return render(request, "shop/cart.html", {"cart": cart, "items": items, "total": total})
 
 
+def _cart_json(cart):
+    items = cart_lines(cart)
+    lines = [
+        {
+            "product_id": item.product_id,
+            "name": item.product.name,
+            "price": str(item.product.price),
+            "quantity": item.quantity,
+            "subtotal": str(item.subtotal),
+        }
+        for item in items
+    ]
+    total = sum((item.subtotal for item in items), Decimal("0.00"))
+    return {"cart_id": cart.id if cart else None, "items": lines, "total": str(total)}
+
+
+@login_required
+def cart_api(request):
+    """
+    GET: the open cart as JSON.
+    POST/PUT {"items": [{"product_id": 1, "quantity": 3}, ...]}: set quantities in bulk
+    (0 removes a line); lines not mentioned are left alone.
+    """
+    if request.method == "GET":
+        cart = Cart.objects.filter(user=request.user, checked_out=False).first()
+        return JsonResponse(_cart_json(cart))
+    if request.method not in ("POST", "PUT"):
+        return HttpResponse(status=405)
+
+    try:
+        data = json.loads(request.body.decode("utf-8"))
+        quantities = {}
+        for line in data["items"]:
+            product_id, qty = line["product_id"], line["quantity"]
+            # int() would silently truncate 1.9 or accept "2" and true
+            for value in (product_id, qty):
+                if not isinstance(value, int) or isinstance(value, bool):
+                    raise TypeError(value)
+            quantities[product_id] = qty
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse({"error": "Expected {\"items\": [{\"product_id\": ..., \"quantity\": ...}]}"}, status=400)
+    if any(qty < 0 for qty in quantities.values()):
+        return JsonResponse({"error": "Quantities must not be negative"}, status=400)
+    known = set(Product.objects.filter(id__in=quantities).values_list("id", flat=True))
+    unknown = sorted(set(quantities) - known)
+    if unknown:
+        return JsonResponse({"error": f"Unknown products: {unknown}"}, status=400)
+
+    cart = get_open_cart(request.user)
+    set_quantities(cart, quantities)
+    return JsonResponse(_cart_json(cart))
+
+
 
 @login_required
 def remove_from_cart(request, item_id):
@@ -251,7 +429,7 @@ def simulate_subscription(request):
         months = 240
 
     end_date = timezone.now() + timedelta(days=30 * months)
-    monthly_price = _monthly_price_for_tier(tier)
+    monthly_price = monthly_price_for_tier(tier)
     total_price = (monthly_price * Decimal(months)).quantize(Decimal("0.01"))
 
     sub = Subscription.objects.create(
@@ -277,40 +455,59 @@ def cancel_subscription(request, sub_id):
     sub.save()
     return redirect("dashboard")
 
-@login_required
-def create_cart_checkout_session(request):
-    """
-    Create a Stripe Checkout session for all items in the user's cart.
-    """
-    cart = Cart.objects.filter(user=request.user, checked_out=False).first()
-    if not cart or not cart.items.exists():
-        return JsonResponse({"error": "Cart is empty"}, status=400)
+def _prepare_cart_checkout(user):
+    """Line items for the user's open cart, with its stock reserved: (cart, line_items, reserved_until)."""
+    cart = Cart.objects.filter(user=user, checked_out=False).first()
+    items = cart_lines(cart)
+    if not items:
+        return None, [], None
 
     # Build line items from cart
     line_items = []
-    for item in cart.items.select_related("product").all():
+    for item in items:
         line_items.append({
             "price_data": {
                 "currency": "usd",
                 "product_data": {
                     "name": item.product.name,
                 },
-                "unit_amount": int(item.product.price * 100),  # Stripe expects cents
+                "unit_amount": item.product.price_cents,  # Stripe expects cents
             },
             "quantity": item.quantity,
         })
 
+    # hold the stock first; the Stripe session expires when the hold does
+    return cart, line_items, reserve_cart(cart)
+
+
+@login_required
+async def create_cart_checkout_session(request):
+    """
+    Create a Stripe Checkout session for all items in the user's cart.
+    """
+    user = await request.auser()
     try:
-        checkout_session = stripe.checkout.Session.create(
+        cart, line_items, reserved_until = await sync_to_async(_prepare_cart_checkout)(user)
+    except InsufficientStock as e:
+        return JsonResponse({"error": "Some items are out of stock", "product_ids": e.product_ids}, status=409)
+    if cart is None:
+        return JsonResponse({"error": "Cart is empty"}, status=400)
+
+    try:
+        checkout_session = await payments.create_checkout_session(
+            pooled=isinstance(request, ASGIRequest),
             payment_method_types=["card"],
             mode="payment",
             line_items=line_items,
             success_url=request.build_absolute_uri("/cart-success/") + "?session_id={CHECKOUT_SESSION_ID}",
             cancel_url=request.build_absolute_uri("/cart-cancel/"),
-            metadata={"user_id": str(request.user.id), "cart_id": str(cart.id)},
+            metadata={"user_id": str(user.id), "cart_id": str(cart.id)},
+            expires_at=int(reserved_until.timestamp()),
         )
     except Exception as e:
-        return JsonResponse({"error": str(e)}, status=500)
+        await sync_to_async(release_cart)(cart.id)
+        status = 503 if isinstance(e, payments.PaymentsBusy) else 500
+        return JsonResponse({"error": str(e)}, status=status)
 
     return JsonResponse({"sessionId": checkout_session.id})
 
@@ -328,7 +525,9 @@ def cart_cancel(request):
 
 @login_required
 def my_orders(request):
-    orders = Cart.objects.filter(user=request.user, checked_out=True).order_by("-created_at")
-    return render(request, "shop/orders.html", {"orders": orders})
+    orders = Cart.objects.order_history(request.user)
+    paginator = Paginator(orders, getattr(settings, "ORDERS_PER_PAGE", 10))
+    page = paginator.get_page(request.GET.get("page"))
+    return render(request, "shop/orders.html", {"orders": page.object_list, "page": page})
 
 
@@ -0,0 +1,167 @@
+"""
+Stripe webhook processing.
+
+The webhook view only verifies the event and records it in the StripeEvent ledger; the
+unique event_id turns Stripe's retries into no-ops. The actual work runs in process_event(),
+dispatched according to settings.STRIPE_WEBHOOK_QUEUE:
+
+* ``"thread"`` (default): an in-process worker pool picks the event up after commit.
+* ``"db"``: nothing is dispatched; ``manage.py process_stripe_events`` drains pending rows.
+* ``"sync"``: processed inside the request (tests / local debugging).
+
+Whatever the backend, pending and failed rows can always be re-driven by the command.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from .dashboard import invalidate_summary
+from .inventory import commit_cart, release_cart
+from .jwt_utils import generate_subscription_jwt
+from .models import Cart, StripeEvent, Subscription
+from .pricing import subscription_price
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def record_event(event):
+    """
+    Store a verified event in the ledger. Returns the new StripeEvent, or None if this
+    event id was already recorded (a retry or duplicate delivery).
+    """
+    try:
+        with transaction.atomic():
+            return StripeEvent.objects.create(
+                event_id=event["id"], type=event.get("type", ""), payload=event,
+            )
+    except IntegrityError:
+        return None
+
+
+def dispatch(stripe_event):
+    backend = getattr(settings, "STRIPE_WEBHOOK_QUEUE", "thread")
+    if backend == "sync":
+        process_event(stripe_event.pk)
+    elif backend == "thread":
+        transaction.on_commit(lambda: _get_executor().submit(_process_in_worker, stripe_event.pk))
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "STRIPE_WEBHOOK_WORKERS", 2),
+                thread_name_prefix="stripe-webhook",
+            )
+        return _executor
+
+
+def _process_in_worker(pk):
+    close_old_connections()
+    try:
+        process_event(pk)
+    finally:
+        close_old_connections()
+
+
+def process_event(pk):
+    """Apply one ledger event exactly once. Safe to call repeatedly and concurrently."""
+    try:
+        with transaction.atomic():
+            event = StripeEvent.objects.select_for_update().get(pk=pk)
+            if event.status == "processed":
+                return
+            handler = EVENT_HANDLERS.get(event.type)
+            if handler is not None:
+                handler(event.payload["data"]["object"])
+            event.status = "processed"
+            event.attempts += 1
+            event.processed_at = timezone.now()
+            event.last_error = ""
+            event.save(update_fields=["status", "attempts", "processed_at", "last_error"])
+    except Exception as e:
+        logger.exception("Stripe event %s failed", pk)
+        StripeEvent.objects.filter(pk=pk).exclude(status="processed").update(
+            status="failed", attempts=F("attempts") + 1, last_error=str(e),
+        )
+
+
+def process_pending_events(limit=100):
+    """Process up to ``limit`` pending (or retryable failed) events, oldest first."""
+    pks = list(
+        StripeEvent.objects.filter(
+            Q(status="pending") | Q(status="failed", attempts__lt=MAX_ATTEMPTS)
+        ).order_by("received_at", "id").values_list("pk", flat=True)[:limit]
+    )
+    for pk in pks:
+        process_event(pk)
+    return len(pks)
+
+
+# ------------------------------
+# Event handlers (run inside process_event's transaction)
+# ------------------------------
+
+def handle_checkout_completed(session):
+    metadata = session.get("metadata", {}) or {}
+    if metadata.get("tier"):
+        _activate_subscription(session.get("id"), metadata)
+    elif metadata.get("cart_id"):
+        if Cart.objects.filter(id=metadata["cart_id"], user__id=metadata.get("user_id")).update(checked_out=True):
+            commit_cart(metadata["cart_id"])
+            invalidate_summary(metadata.get("user_id"))
+
+
+def handle_checkout_expired(session):
+    metadata = session.get("metadata", {}) or {}
+    if metadata.get("cart_id"):
+        release_cart(metadata["cart_id"])
+
+
+def _activate_subscription(checkout_id, metadata):
+    user_id = metadata.get("user_id")
+    tier = metadata.get("tier", "basic")
+    months = int(metadata.get("months", 1))
+
+    # one locked lookup: the subscription created for this session, else the user's latest pending one
+    match = Q(stripe_checkout_session=checkout_id)
+    if user_id:
+        match |= Q(user__id=user_id, tier=tier, active=False)
+    sub = (
+        Subscription.objects.select_for_update()
+        .select_related("user")
+        .filter(match)
+        .order_by(
+            Case(When(stripe_checkout_session=checkout_id, then=Value(0)), default=Value(1), output_field=IntegerField()),
+            "-start_date",
+        )
+        .first()
+    )
+    if sub is None or (sub.active and sub.stripe_checkout_session == checkout_id):
+        return
+
+    sub.active = True
+    sub.stripe_checkout_session = sub.stripe_checkout_session or checkout_id
+    sub.months = months
+    sub.end_date = timezone.now() + timedelta(days=30 * months)
+    sub.price = subscription_price(sub.tier, months)
+    sub.api_key = generate_subscription_jwt(sub)
+    sub.save()
+
+
+EVENT_HANDLERS = {
+    "checkout.session.completed": handle_checkout_completed,
+    "checkout.session.expired": handle_checkout_expired,
+}